@@ -1,9 +1,17 @@
 from agents import Agent, Tool
 
+from build_context import load_compiled_prompt
+from schema_pruner import SCHEMA_PRUNING_ENABLED
+
 def create_sql_agent() -> Agent:
     
-    with open('_systemprompt_sql_agent.txt', 'r', encoding='utf-8') as f:
-        SYSTEM_PROMPT_SQL_AGENT = f.read()
+    # Statischer Prompt + Datenbank-Kontext, vorab kompiliert durch build_context.py.
+    # Mit Schema-Pruning enthält der System-Prompt nur den statischen Teil, der gekürzte Kontext kommt mit der Frage.
+    compiled_prompt = load_compiled_prompt()
+    if SCHEMA_PRUNING_ENABLED:
+        SYSTEM_PROMPT_SQL_AGENT = compiled_prompt["static_prefix"].rstrip("\n")
+    else:
+        SYSTEM_PROMPT_SQL_AGENT = compiled_prompt["instructions"]
 
     sql_agent = Agent(
         name="Principal AI Data Analyst",
@@ -12,4 +20,4 @@ def create_sql_agent() -> Agent:
         instructions=SYSTEM_PROMPT_SQL_AGENT
     )
     
-    return sql_agent
\ No newline at end of file
+    return sql_agent
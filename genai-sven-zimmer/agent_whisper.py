@@ -1,26 +1,101 @@
+import asyncio
 import os
+import threading
+
+import httpx
 import openai
 
+from audio_preprocessing import preprocess_audio
+from scheduler import PrioritySemaphore
+from tracing import span
+
+WHISPER_PROMPT = "AdventureBikes, Mountain Bikes, City Bikes, Race Bikes, Trekking Bikes, Kid Bikes, Umsatz, Verkaufsmenge, T-SQL, Deutschland, Schweiz, Frankreich"
+WHISPER_MAX_CONCURRENCY = int(os.getenv("WHISPER_MAX_CONCURRENCY", "4"))
+WHISPER_MAX_CONNECTIONS = int(os.getenv("WHISPER_MAX_CONNECTIONS", "10"))
+
+_whisper_client: openai.AsyncClient | None = None
+_whisper_client_lock = threading.Lock()
+whisper_limiter = PrioritySemaphore("whisper", WHISPER_MAX_CONCURRENCY)
+
+def get_whisper_client() -> openai.AsyncClient:
+    """
+    Liefert den gemeinsamen OpenAI-Client mit Connection-Pool (wird beim ersten Aufruf erstellt).
+    Über OPENAI_BASE_URL lässt sich ein lokaler Stub-Endpunkt für Tests einbinden.
+
+    :return: Der wiederverwendbare AsyncClient.
+    """
+    global _whisper_client
+    if _whisper_client is None:
+        with _whisper_client_lock:
+            if _whisper_client is None:
+                _whisper_client = openai.AsyncClient(
+                    api_key=os.getenv("OPENAI_API_KEY"),
+                    http_client=openai.DefaultAsyncHttpxClient(
+                        limits=httpx.Limits(max_connections=WHISPER_MAX_CONNECTIONS, max_keepalive_connections=WHISPER_MAX_CONNECTIONS)
+                    ),
+                )
+    return _whisper_client
+
+async def _transcribe_chunk(client: openai.AsyncClient, whisper_model: str, file: tuple[str, bytes] | object) -> str:
+    """
+    Transkribiert einen Abschnitt; die Anzahl gleichzeitiger Uploads ist durch WHISPER_MAX_CONCURRENCY begrenzt.
+
+    :param client: Der gemeinsame OpenAI-Client.
+    :param whisper_model: Das Whisper-Modell.
+    :param file: Der Abschnitt als (Dateiname, WAV-Bytes) oder eine geöffnete Datei.
+    :return: Der erkannte Text.
+    """
+    async with whisper_limiter.slot():
+        transcript = await client.audio.transcriptions.create(
+            model=whisper_model,
+            file=file,
+            language="de",
+            prompt=WHISPER_PROMPT
+        )
+    return transcript.text.strip()
+
 async def transcribe_audio(audio_filepath: str) -> str:
     api_key = os.getenv("OPENAI_API_KEY")
     if not api_key:
         return "FEHLER: OPENAI_API_KEY nicht gefunden. (.env)"
 
     whisper_model = os.getenv("OPENAI_WHISPER_MODEL", "whisper-1")
-    print(f"Verwende Whisper-Modell: {whisper_model}")
 
-    try:
-        client = openai.AsyncClient(api_key=api_key)
+    with span("transcription", model=whisper_model) as transcription_span:
+        try:
+            # Innerhalb von try, damit eine fehlende oder unlesbare Aufnahme eine FEHLER-Meldung liefert
+            transcription_span.set(payload_bytes=os.path.getsize(audio_filepath))
+            client = get_whisper_client()
 
-        with open(audio_filepath, "rb") as audio_file:
-            transcript = await client.audio.transcriptions.create(
-                model=whisper_model,
-                file=audio_file,
-                language="de",
-                prompt="AdventureBikes, Mountain Bikes, City Bikes, Race Bikes, Trekking Bikes, Kid Bikes, Umsatz, Verkaufsmenge, T-SQL, Deutschland, Schweiz, Frankreich"
+            # Vorverarbeitung ist CPU-Arbeit und läuft daher außerhalb der Event-Loop
+            preprocessed = await asyncio.to_thread(preprocess_audio, audio_filepath)
+            if preprocessed is None:
+                # Kein PCM-WAV (z.B. komprimiertes Format): Originaldatei unverändert hochladen
+                with open(audio_filepath, "rb") as audio_file:
+                    text = await _transcribe_chunk(client, whisper_model, audio_file)
+                transcription_span.set(chunks=1, preprocessed=False, chars=len(text))
+                return text
+
+            chunks, audio_seconds = preprocessed
+            transcription_span.set(
+                chunks=len(chunks),
+                preprocessed=True,
+                audio_seconds=round(audio_seconds, 2),
+                upload_bytes=sum(len(chunk) for chunk in chunks),
             )
-        return transcript.text
+            if not chunks:
+                transcription_span.status = "error"
+                return "FEHLER: In der Aufnahme wurde keine Sprache erkannt."
+
+            texts = await asyncio.gather(*(
+                _transcribe_chunk(client, whisper_model, (f"chunk_{index}.wav", chunk))
+                for index, chunk in enumerate(chunks)
+            ))
+            text = " ".join(text for text in texts if text)
+            transcription_span.set(chars=len(text))
+            return text
 
-    except Exception as e:
-        print(f"FEHLER bei der Audio-Transkription: {str(e)}")
-        return f"FEHLER bei der Audio-Transkription: {str(e)}"
\ No newline at end of file
+        except Exception as e:
+            print(f"FEHLER bei der Audio-Transkription: {str(e)}")
+            transcription_span.status = "error"
+            return f"FEHLER bei der Audio-Transkription: {str(e)}"
@@ -0,0 +1,127 @@
+# analysis_planner.py
+import os
+
+import pandas as pd
+
+from intent_parser import _sql_list, parse_filters
+from result_encoder import encode_result, format_number
+from statistics_engine import MONTH_COLUMN, ZSCORE_THRESHOLD, _numeric_frame, correlations, group_shares, monthly_growth, zscore_outliers
+
+# Statt einer breiten Rohdaten-Abfrage mehrere kleine Aggregat-Abfragen, die parallel laufen
+ANALYSIS_PLAN_ENABLED = os.getenv("ANALYSIS_PLAN_ENABLED", "true").lower() in ("1", "true", "yes")
+
+# Dimensionen des Analyseplans (Bezeichnung, Spalte in DataSet_Monthly_Sales)
+PLAN_DIMENSIONS = [
+    ("Monat", MONTH_COLUMN),
+    ("Produktkategorie", "Product_Category"),
+    ("Land", "Sales_Country"),
+    ("Vertriebskanal", "Sales_Channel"),
+]
+FILTER_COLUMNS = {"countries": "Sales_Country", "categories": "Product_Category", "channels": "Sales_Channel"}
+PLAN_METRIC = "Revenue_EUR"
+
+
+class PlannedQuery:
+    """Eine Teilabfrage des Analyseplans: eine Kennzahl-Aggregation je Dimension."""
+
+    def __init__(self, name: str, column: str, sql: str):
+        self.name = name
+        self.column = column
+        self.sql = sql
+
+
+def describe_filters(filters: dict) -> str:
+    """
+    Beschreibt die erkannten Filter für den Analyse-Agenten.
+
+    :param filters: Das Ergebnis von parse_filters().
+    :return: Die Filter als Text, z.B. "Sales_Country = Germany; Calendar_Year = 2024".
+    """
+    parts = [f"{column} = {', '.join(filters[key])}" for key, column in FILTER_COLUMNS.items() if filters[key]]
+    if filters["year"] is not None:
+        parts.append(f"Calendar_Year = {filters['year']}")
+    return "; ".join(parts) if parts else "keine (gesamter Datenbestand)"
+
+
+def build_analysis_plan(user_question: str) -> tuple[list[PlannedQuery] | None, dict]:
+    """
+    Erstellt aus der Analysefrage einen Plan fokussierter Aggregat-Abfragen (nach Monat, Kategorie, Land
+    und Kanal). Erkannte Filter gelten für alle Teilabfragen; eine Dimension, die durch einen Filter auf
+    genau einen Wert festgelegt ist, entfällt. Enthält die Frage Einschränkungen, die der Plan nicht
+    abbilden kann (Regionen, Produktlinien, Quartale, relative Zeiträume ...), gibt es keinen Plan.
+
+    :param user_question: Die Analysefrage.
+    :return: Ein Tupel aus den geplanten Abfragen (None, wenn die Frage an den SQL-Agenten gehen muss)
+             und den erkannten Filtern.
+    """
+    filters = parse_filters(user_question)
+    if not filters["covered"]:
+        return None, filters
+    conditions = []
+    fixed_columns = set()
+    for key, column in FILTER_COLUMNS.items():
+        if filters[key]:
+            conditions.append(f"dms.{column} {_sql_list(filters[key])}")
+            if len(filters[key]) == 1:
+                fixed_columns.add(column)
+    if filters["year"] is not None:
+        conditions.append(f"dms.Calendar_Year = '{filters['year']}'")
+
+    plan = []
+    for name, column in PLAN_DIMENSIONS:
+        if column in fixed_columns:
+            continue
+        sql_lines = [
+            "SELECT",
+            f"    dms.{column},",
+            f"    SUM(dms.Revenue_EUR) AS {PLAN_METRIC},",
+            "    SUM(dms.Sales_Amount) AS Sales_Amount",
+            "FROM\n    dbo.DataSet_Monthly_Sales AS dms",
+        ]
+        if conditions:
+            sql_lines.append("WHERE\n    " + "\n    AND ".join(conditions))
+        sql_lines.append(f"GROUP BY\n    dms.{column}")
+        order_by = f"dms.{column}" if column == MONTH_COLUMN else "SUM(dms.Revenue_EUR) DESC"
+        sql_lines.append(f"ORDER BY\n    {order_by}")
+        plan.append(PlannedQuery(name, column, "\n".join(sql_lines) + ";"))
+    return plan, filters
+
+
+def merge_plan_results(plan: list[PlannedQuery], results: list[pd.DataFrame | None], filters: dict, token_budget: int) -> tuple[str, str]:
+    """
+    Führt die Ergebnisse der Teilabfragen zu einer strukturierten Eingabe für den Analyse-Agenten zusammen.
+
+    :param plan: Die geplanten Abfragen.
+    :param results: Die Ergebnisse in Reihenfolge des Plans (None bei Fehlern oder leeren Ergebnissen).
+    :param filters: Die erkannten Filter.
+    :param token_budget: Token-Budget für die Darstellung aller Teilergebnisse zusammen.
+    :return: Ein Tupel aus den statistischen Kennzahlen und den Teilergebnissen als Text.
+    """
+    available = [(query, result) for query, result in zip(plan, results) if result is not None]
+    sections = [f"Filter: {describe_filters(filters)}\nTeilabfragen: {', '.join(query.name for query, _ in available)}\n"]
+    data_blocks = []
+
+    # Gesamtsummen aus der ersten Teilabfrage (alle Teilabfragen teilen dieselben Filter)
+    totals = _numeric_frame(available[0][1]).sum()
+    sections.append("Gesamtsummen:\n" + "\n".join(f"{column}: {format_number(value)}" for column, value in totals.items()) + "\n")
+
+    for query, result in available:
+        numeric_df = _numeric_frame(result)
+        if query.column == MONTH_COLUMN:
+            growth = monthly_growth(result, numeric_df, PLAN_METRIC)
+            if growth:
+                sections.append(f"Monatsverlauf von {PLAN_METRIC} mit Wachstum zum Vormonat (MoM) und Vorjahresmonat (YoY):\n{growth}")
+            correlation_matrix = correlations(numeric_df)
+            if correlation_matrix:
+                sections.append(f"Korrelationsmatrix der Monatswerte (Pearson):\n{correlation_matrix}")
+            outliers = zscore_outliers(result, numeric_df, PLAN_METRIC)
+            if outliers:
+                sections.append(f"Ausreißer-Monate bei {PLAN_METRIC} (|z| > {ZSCORE_THRESHOLD:g}):\n{outliers}")
+            else:
+                sections.append(f"Keine Ausreißer-Monate bei {PLAN_METRIC} (|z| > {ZSCORE_THRESHOLD:g}) gefunden.\n")
+        else:
+            shares = group_shares(result, numeric_df, PLAN_METRIC)
+            if shares:
+                sections.append(shares)
+        data_blocks.append(f"{query.name} ({len(result)} Zeilen):\n{encode_result(result, max(token_budget // len(available), 1))}")
+    return "\n".join(sections), "\n".join(data_blocks)
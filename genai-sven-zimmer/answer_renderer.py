@@ -0,0 +1,150 @@
+# answer_renderer.py
+import os
+import re
+
+import pandas as pd
+
+from build_context import MONTH_NAMES
+from result_encoder import _is_total_label, get_numeric_columns
+
+LOCAL_RENDERER_ENABLED = os.getenv("LOCAL_RENDERER_ENABLED", "true").lower() in ("1", "true", "yes")
+# Größere Tabellen gehen an den Interpreter-Agenten, der sie zusammenfasst
+RENDERER_MAX_ROWS = int(os.getenv("RENDERER_MAX_ROWS", "25"))
+RENDERER_MAX_METRICS = 3
+
+CURRENCY_COLUMN = re.compile(r"eur|revenue|umsatz|erl[oö]s|price|preis|betrag", re.IGNORECASE)
+QUANTITY_COLUMN = re.compile(r"amount|menge|st(ue|ü)ck|anzahl|count|quantity|units", re.IGNORECASE)
+# Spalten, die auch bei numerischem Typ eine Beschriftung sind (z.B. YEAR(...) AS Jahr)
+LABEL_COLUMN = re.compile(r"year|jahr|month|monat|quart|date|datum|^id_", re.IGNORECASE)
+MONTH_VALUE = re.compile(r"^(\d{4})[.-](\d{2})$")
+
+METRIC_LABELS = {
+    "Revenue_EUR": "Umsatz",
+    "Gesamtumsatz_EUR": "Gesamtumsatz",
+    "Sales_Amount": "Verkaufsmenge",
+    "Gesamtstueckzahl": "Stückzahl",
+    "TotalRevenue": "Gesamtumsatz",
+    "TotalSalesAmount": "Verkaufsmenge",
+}
+DIMENSION_LABELS = {
+    "Sales_Country": "Land",
+    "Global_Region": "Region",
+    "Sales_Region": "Vertriebsregion",
+    "Sales_Channel": "Vertriebskanal",
+    "Product_Category": "Produktkategorie",
+    "Product_Line": "Produktlinie",
+    "Material_Description": "Produkt",
+    "Calendar_Year": "Jahr",
+    "Calendar_Month_ISO": "Monat",
+}
+
+
+def format_german_number(value: float, decimals: int = 0) -> str:
+    """
+    Formatiert eine Zahl im deutschen Format (Tausenderpunkt, Dezimalkomma).
+
+    :param value: Die Zahl.
+    :param decimals: Die Anzahl der Nachkommastellen.
+    :return: Die formatierte Zahl, z.B. '3.665.846.833,00'.
+    """
+    return f"{value:,.{decimals}f}".replace(",", "\x00").replace(".", ",").replace("\x00", ".")
+
+
+def format_metric(column: str, value: float) -> str:
+    """
+    Formatiert einen Kennzahlwert passend zur Spalte: Währung in EUR, Mengen als Stück, sonst als Zahl.
+
+    :param column: Der Spaltenname.
+    :param value: Der Wert.
+    :return: Der formatierte Wert mit Einheit.
+    """
+    if pd.isna(value):
+        return "keine Daten"
+    if CURRENCY_COLUMN.search(column):
+        return f"{format_german_number(value, 2)} EUR"
+    if QUANTITY_COLUMN.search(column):
+        return f"{format_german_number(value)} Stück"
+    return format_german_number(value, 0 if float(value).is_integer() else 2)
+
+
+def _metric_label(column: str) -> str:
+    """
+    Liefert die deutsche Bezeichnung einer Kennzahl-Spalte.
+
+    :param column: Der Spaltenname.
+    :return: Die Bezeichnung, z.B. 'Gesamtumsatz'.
+    """
+    return METRIC_LABELS.get(column, re.sub(r"_EUR$", "", column).replace("_", " "))
+
+
+def _format_label(value) -> str:
+    """
+    Formatiert den Wert einer Beschriftungsspalte (Monate 'YYYY.MM' als deutscher Monatsname).
+
+    :param value: Der Wert.
+    :return: Die Beschriftung.
+    """
+    text = str(value).strip()
+    match = MONTH_VALUE.match(text)
+    if match and 1 <= int(match.group(2)) <= 12:
+        return f"{MONTH_NAMES[int(match.group(2)) - 1]} {match.group(1)}"
+    return text
+
+
+def render_answer(user_question: str, db_result: pd.DataFrame) -> str | None:
+    """
+    Formuliert die Antwort für einfache Ergebnisformen lokal und ohne LLM: leere Ergebnisse, Fehler-SQL,
+    einzelne Kennzahlen und kleine Tabellen mit einer Beschriftungsspalte (inklusive ROLLUP-Gesamtzeile).
+
+    :param user_question: Die ursprüngliche Benutzerfrage.
+    :param db_result: Das Ergebnis der Datenbankabfrage.
+    :return: Die fertige Antwort oder None, wenn das Ergebnis an den Interpreter-Agenten gehen muss.
+    """
+    if not LOCAL_RENDERER_ENABLED or db_result.attrs.get("truncated"):
+        return None
+    if db_result.empty or (len(db_result) == 1 and db_result.iloc[0].isna().all()):
+        return f"Für Ihre Frage „{user_question}“ wurden keine Daten gefunden, die den Kriterien entsprechen."
+
+    # Fehler-SQL des SQL-Agenten (SELECT 'FEHLER: ...' AS Error)
+    first_value = db_result.iat[0, 0]
+    if len(db_result) == 1 and len(db_result.columns) == 1 and isinstance(first_value, str) and first_value.startswith("FEHLER"):
+        message = first_value.removeprefix("FEHLER:").strip()
+        return f"Ihre Frage konnte nicht beantwortet werden: {message}\nBitte formulieren Sie die Frage um oder wählen Sie einen der gültigen Werte."
+
+    numeric_columns = [column for column in get_numeric_columns(db_result) if not LABEL_COLUMN.search(str(column))]
+    label_columns = [column for column in db_result.columns if column not in numeric_columns]
+    if not numeric_columns or len(numeric_columns) > RENDERER_MAX_METRICS or len(label_columns) > 1:
+        return None
+    if len(db_result) > RENDERER_MAX_ROWS:
+        return None
+    values = db_result[numeric_columns].apply(pd.to_numeric, errors="coerce")
+
+    # Einzelwert(e): eine Zeile ohne Beschriftung
+    if not label_columns:
+        if len(db_result) != 1:
+            return None
+        row = values.iloc[0]
+        if len(numeric_columns) == 1:
+            return f"{_metric_label(numeric_columns[0])}: {format_metric(numeric_columns[0], row.iloc[0])}"
+        return "\n".join(f"- {_metric_label(column)}: {format_metric(column, row[column])}" for column in numeric_columns)
+
+    # Kleine Tabelle: eine Beschriftungsspalte und bis zu RENDERER_MAX_METRICS Kennzahlen
+    label_column = label_columns[0]
+    lines = []
+    total_line = None
+    for index, label in enumerate(db_result[label_column]):
+        metrics_text = " | ".join(
+            (f"{_metric_label(column)}: " if len(numeric_columns) > 1 else "") + format_metric(column, values[column].iat[index])
+            for column in numeric_columns
+        )
+        if _is_total_label(label) and len(db_result) > 1:
+            total_line = f"**{_format_label(label) if not pd.isna(label) else 'Gesamt'}:** {metrics_text}"
+        else:
+            lines.append(f"- {_format_label(label)}: {metrics_text}")
+
+    dimension = DIMENSION_LABELS.get(label_column, str(label_column).replace("_", " "))
+    metric_names = " und ".join(_metric_label(column) for column in numeric_columns)
+    answer = f"{metric_names} nach {dimension}:\n" + "\n".join(lines)
+    if total_line is not None:
+        answer += f"\n\n{total_line}"
+    return answer
@@ -1,14 +1,44 @@
 import gradio as gr
-from agents import Runner
+import uvicorn
+from fastapi import FastAPI
+from fastapi.responses import PlainTextResponse
+from agents import Agent, Runner
 from dotenv import load_dotenv
+from openai.types.responses import ResponseTextDeltaEvent
 import pandas as pd
+import asyncio
 import os
-
-from database_request import DatabaseRequest
+import time
+from typing import AsyncIterator
+
+from database_request import (
+    async_database_request,
+    get_db_flight_stats,
+    get_pool_stats,
+    get_result_cache_stats,
+    start_engine_warmup,
+    start_replica_refresh,
+)
 from agent_whisper import transcribe_audio
 from agent_sql import create_sql_agent
 from agent_interpreter import create_interpreter_agent
 from agent_analysis import create_analysis_agent 
+from sql_cache import SqlCache, normalize_question
+from single_flight import SingleFlight
+from scheduler import MODE_PRIORITIES, PrioritySemaphore, QueueFullError, current_priority
+from build_context import COMPILED_PROMPT_FILE, load_compiled_prompt
+from schema_pruner import SCHEMA_PRUNING_ENABLED, SchemaPruner
+from sql_guard import CheckedQuery, SqlGuard, parse_dimension_values
+from result_encoder import encode_result, estimate_tokens
+from answer_renderer import render_answer
+from statistics_engine import compute_statistics
+from analysis_planner import ANALYSIS_PLAN_ENABLED, PlannedQuery, build_analysis_plan, merge_plan_results
+from followup_planner import FollowupPlan, plan_followup
+from session_state import SESSION_TTL_SECONDS, ResultSink, SessionResults, result_sink
+from chart_builder import build_chart, chart_cache
+from result_table import EXPORT_FORMATS, async_export_result, get_result_page
+from intent_parser import INTENT_CONFIDENCE_THRESHOLD, parse_question
+from tracing import metrics, new_trace, span
 
 custom_css = """
 /* --- Globaler Stil & Hintergrund --- */
@@ -90,140 +120,590 @@ sql_generator_agent = create_sql_agent()
 interpreter_agent = create_interpreter_agent()
 analysis_agent = create_analysis_agent() 
 
+# --- Datenbankverbindung im Hintergrund aufbauen (blockiert den Start nicht) ---
+start_engine_warmup()
+start_replica_refresh()
+
+# Token-Budget für die Rohdaten-Stichprobe im Analyse-Modus (die Kennzahlen werden lokal berechnet)
+ANALYSIS_SAMPLE_TOKEN_BUDGET = int(os.getenv("ANALYSIS_SAMPLE_TOKEN_BUDGET", "800"))
+
+# --- Kompilierter SQL-Agenten-Prompt (bei veralteten Quellen neu erzeugt, siehe build_context.py) ---
+compiled_prompt = load_compiled_prompt()
+
+# --- SQL-Cache (überlebt Neustarts, siehe sql_cache.py) ---
+sql_cache = SqlCache(prompt_file=COMPILED_PROMPT_FILE)
+
+# --- Bündelung gleichzeitiger identischer Anfragen (Pipeline und SQL-Generierung) ---
+pipeline_flight = SingleFlight("pipeline")
+sql_flight = SingleFlight("sql_generation")
+
+# --- Zugangskontrolle: begrenzte Anzahl laufender Pipelines, begrenzte Warteschlange, LLM-Limit ---
+PIPELINE_MAX_CONCURRENCY = int(os.getenv("PIPELINE_MAX_CONCURRENCY", "8"))
+PIPELINE_MAX_QUEUE = int(os.getenv("PIPELINE_MAX_QUEUE", "16"))
+PIPELINE_MAX_WAIT_SECONDS = float(os.getenv("PIPELINE_MAX_WAIT_SECONDS", "30"))
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "6"))
+BUSY_MESSAGE = "FEHLER: Das System ist gerade ausgelastet. Bitte senden Sie die Anfrage in einigen Sekunden erneut."
+QUEUED_MESSAGE = "⏳ Viele gleichzeitige Anfragen – Ihre Anfrage wartet auf einen freien Platz ..."
+
+pipeline_admission = PrioritySemaphore(
+    "pipeline", PIPELINE_MAX_CONCURRENCY, max_queued=PIPELINE_MAX_QUEUE, max_wait_seconds=PIPELINE_MAX_WAIT_SECONDS
+)
+llm_limiter = PrioritySemaphore("llm", LLM_MAX_CONCURRENCY)
+
+# --- Kennzahlen für /metrics, die beim Abruf gelesen werden ---
+metrics.register_gauge("genai_sql_cache_hits", "Treffer im SQL-Cache seit dem Start.", lambda: sql_cache.stats()["hits"])
+metrics.register_gauge("genai_sql_cache_misses", "Fehlschläge im SQL-Cache seit dem Start.", lambda: sql_cache.stats()["misses"])
+metrics.register_gauge("genai_result_cache_hits", "Treffer im Ergebnis-Cache seit dem Start.", lambda: get_result_cache_stats()["hits"])
+metrics.register_gauge("genai_result_cache_bytes", "Belegte Bytes im Ergebnis-Cache.", lambda: get_result_cache_stats()["bytes"])
+metrics.register_gauge("genai_chart_cache_hits", "Treffer im Diagramm-Cache seit dem Start.", lambda: chart_cache.stats()["hits"])
+metrics.register_gauge("genai_pipeline_coalesced", "Anfragen, die sich eine laufende Pipeline geteilt haben.", lambda: pipeline_flight.stats()["coalesced"])
+metrics.register_gauge("genai_sql_generation_coalesced", "SQL-Generierungen, die sich eine laufende Generierung geteilt haben.", lambda: sql_flight.stats()["coalesced"])
+metrics.register_gauge("genai_db_execution_coalesced", "Datenbankabfragen, die sich eine laufende Ausführung geteilt haben.", lambda: get_db_flight_stats()["coalesced"])
+metrics.register_gauge("genai_db_pool_checkouts", "Verbindungs-Checkouts aus dem Pool seit dem Start.", lambda: get_pool_stats()["checkouts"])
+metrics.register_gauge("genai_db_pool_max_wait_seconds", "Längste Wartezeit beim Verbindungs-Checkout.", lambda: get_pool_stats()["max_wait_seconds"])
+
+# --- Schema-Pruning: nur der zur Frage passende Datenbank-Kontext geht an den SQL-Agenten ---
+schema_pruner = SchemaPruner(compiled_prompt["context_sections"]) if SCHEMA_PRUNING_ENABLED else None
+
+# --- SQL-Prüfung vor der Ausführung (Schema und gültige Filterwerte aus dem kompilierten Prompt, siehe build_context.py) ---
+sql_guard = SqlGuard(compiled_prompt.get("table_columns"), parse_dimension_values(compiled_prompt["context_sections"]))
+# Anzahl der Korrekturversuche des SQL-Agenten, wenn die lokale Prüfung den generierten Code ablehnt
+SQL_REPAIR_MAX_ATTEMPTS = int(os.getenv("SQL_REPAIR_MAX_ATTEMPTS", "2"))
+
+
+async def generate_sql(agent_prompt: str, user_question: str, mode: str) -> str:
+    """
+    Liefert den SQL-Code für eine Frage. Gleichzeitige Aufrufe für dieselbe (normalisierte) Frage
+    und denselben Modus teilen sich eine Generierung.
+
+    :param agent_prompt: Der Auftrag für den SQL-Generator-Agenten (ohne Datenbank-Kontext).
+    :param user_question: Die ursprüngliche Benutzerfrage.
+    :param mode: Der gewählte Modus.
+    :return: Der generierte oder gecachte SQL-Code.
+    """
+    return await sql_flight.run(
+        (mode, normalize_question(user_question)),
+        lambda: _generate_sql(agent_prompt, user_question, mode),
+    )
+
+
+async def _generate_sql(agent_prompt: str, user_question: str, mode: str) -> str:
+    """
+    Erzeugt den SQL-Code für eine Frage. Reihenfolge: lokaler Intent-Parser (nur Datenbank-Abfrage),
+    SQL-Cache und erst zuletzt der SQL-Generator-Agent.
+
+    :param agent_prompt: Der Auftrag für den SQL-Generator-Agenten (ohne Datenbank-Kontext).
+    :param user_question: Die ursprüngliche Benutzerfrage (Basis für Cache-Schlüssel und Schema-Pruning).
+    :param mode: Der gewählte Modus (Teil des Cache-Schlüssels).
+    :return: Der generierte oder gecachte SQL-Code.
+    """
+    with span("sql_generation", mode=mode) as sql_span:
+        if mode == "Datenbank-Abfrage":
+            parsed_sql, confidence = parse_question(user_question)
+            if parsed_sql is not None and confidence >= INTENT_CONFIDENCE_THRESHOLD:
+                sql_span.set(source="intent_parser", confidence=confidence)
+                return parsed_sql
+
+        cached_sql = sql_cache.get(user_question, mode)
+        if cached_sql is not None:
+            sql_span.set(source="sql_cache")
+            return cached_sql
+
+        if schema_pruner is not None:
+            agent_prompt = schema_pruner.build_agent_input(agent_prompt, user_question)
+        agent_input = agent_prompt
+        tokens = 0
+        for attempt in range(SQL_REPAIR_MAX_ATTEMPTS + 1):
+            async with llm_limiter.slot():
+                generated_sql_output = await Runner.run(sql_generator_agent, agent_input)
+            generated_sql = generated_sql_output.final_output.strip()
+            tokens += estimate_tokens(agent_input) + estimate_tokens(generated_sql)
+
+            # Lokale Prüfung vor jeder Ausführung; der genaue Fehler geht zur Korrektur an den Agenten zurück
+            checked = sql_guard.check(generated_sql)
+            if checked.error is None or attempt == SQL_REPAIR_MAX_ATTEMPTS:
+                break
+            print(f"SQL-Prüfung fehlgeschlagen (Versuch {attempt + 1}): {checked.error}")
+            agent_input = (
+                f"{agent_prompt}\n\n<vorheriger_sql>{generated_sql}</vorheriger_sql>"
+                f"<pruefungsfehler>{checked.error}</pruefungsfehler>\n"
+                "Der vorherige SQL-Code ist ungültig. Korrigiere ihn anhand des Prüfungsfehlers und gib nur den korrigierten T-SQL-Code aus."
+            )
+        sql_span.set(source="agent", tokens=tokens, repair_attempts=attempt, valid=checked.error is None)
+
+        # Nur Anweisungen, die die lokale Prüfung bestehen, werden zwischengespeichert
+        if checked.error is None:
+            sql_cache.put(user_question, mode, generated_sql)
+        return generated_sql
+
+
+def validate_sql(generated_sql: str) -> CheckedQuery:
+    """
+    Prüft den generierten SQL-Code statisch (siehe sql_guard.py): nur einzelne SELECT-Anweisungen,
+    bekannte Tabellen und Spalten, keine kartesischen Produkte. Abfragen ohne Aggregation und ohne
+    Limit erhalten ein TOP n.
+
+    :param generated_sql: Der generierte SQL-Code.
+    :return: Das Prüfergebnis mit dem auszuführenden SQL-Code oder dem Ablehnungsgrund.
+    """
+    with span("validation", sql_chars=len(generated_sql)) as validation_span:
+        checked = sql_guard.check(generated_sql)
+        if checked.error is not None:
+            print(f"SQL-Prüfung hat die Abfrage abgelehnt: {checked.error}")
+            validation_span.status = "error"
+            validation_span.set(reason=checked.error)
+        elif checked.rewrites:
+            validation_span.set(rewrites=checked.rewrites)
+        return checked
+
+
+def apply_row_limit(db_result: pd.DataFrame, row_limit: int | None) -> pd.DataFrame:
+    """
+    Markiert ein Ergebnis als gekürzt, wenn es das von der SQL-Prüfung gesetzte Zeilenlimit erreicht.
+
+    :param db_result: Das Ergebnis der Datenbankabfrage.
+    :param row_limit: Das Zeilenlimit aus der SQL-Prüfung (None = keins gesetzt).
+    :return: Das (ggf. markierte) Ergebnis.
+    """
+    if row_limit is not None and len(db_result) >= row_limit and not db_result.attrs.get("truncated"):
+        db_result.attrs["truncated"] = True
+        db_result.attrs["truncation_reason"] = f"Zeilenlimit von {row_limit} aus der SQL-Prüfung erreicht"
+    return db_result
+
+
+def encode_result_traced(db_result: pd.DataFrame, token_budget: int | None = None) -> str:
+    """
+    Kodiert das Datenbankergebnis für den Agenten-Prompt und misst dabei die Stufe "result_encoding".
+
+    :param db_result: Das Ergebnis der Datenbankabfrage.
+    :param token_budget: Optionales Token-Budget (Standard siehe result_encoder.py).
+    :return: Die kompakte Textdarstellung des Ergebnisses.
+    """
+    with span("result_encoding", rows=len(db_result)) as encoding_span:
+        encoded = encode_result(db_result) if token_budget is None else encode_result(db_result, token_budget)
+        encoding_span.set(payload_bytes=len(encoded.encode("utf-8")), tokens=estimate_tokens(encoded))
+        return encoded
+
+
+def truncation_note(db_result: pd.DataFrame) -> str:
+    """
+    Erzeugt einen Hinweis für die Agenten, falls das Datenbankergebnis gekürzt wurde.
+
+    :param db_result: Das Ergebnis der Datenbankabfrage.
+    :return: Ein <hinweis>-Block oder ein leerer String.
+    """
+    if not db_result.attrs.get("truncated"):
+        return ""
+    return f"<hinweis>Das Datenbankergebnis wurde gekürzt ({db_result.attrs.get('truncation_reason')}) und ist unvollständig.</hinweis>"
+
 
 async def transcribe_and_update_textbox(audio_filepath: str):
     if not audio_filepath:
         return ""
     
-    print(f"\n--- Starte Transkription für Audiodatei: {audio_filepath} ---")
+    new_trace()
     transcribed_text = await transcribe_audio(audio_filepath)
-    print(f"Transkript in Textbox geschrieben: '{transcribed_text}'")
 
     if transcribed_text.startswith("FEHLER:"):
         return transcribed_text
     
     return transcribed_text
 
-async def start_simple_request(user_question: str) -> tuple[dict, str, str]:
+async def stream_agent_answer(agent: Agent, agent_prompt: str) -> AsyncIterator[str]:
+    """
+    Führt einen Agenten im Streaming-Modus aus und liefert den bisher erzeugten Antworttext nach jedem Token.
+
+    :param agent: Der aufzurufende Agent (Interpreter oder Analyse).
+    :param agent_prompt: Der Eingabe-Prompt für den Agenten.
+    :return: Ein asynchroner Iterator über den jeweils kumulierten Antworttext.
+    """
+    # Die Wartezeit auf einen LLM-Platz wird separat als queue_wait_llm gemessen
+    async with llm_limiter.slot():
+        with span("interpretation", agent=agent.name, input_tokens=estimate_tokens(agent_prompt)) as interpretation_span:
+            streamed_run = Runner.run_streamed(agent, agent_prompt)
+            answer = ""
+            async for event in streamed_run.stream_events():
+                if event.type == "raw_response_event" and isinstance(event.data, ResponseTextDeltaEvent):
+                    if not answer:
+                        first_token_seconds = time.perf_counter() - interpretation_span.started_at
+                        metrics.observe_duration("interpretation_first_token", first_token_seconds)
+                        interpretation_span.set(first_token_ms=round(first_token_seconds * 1000, 1))
+                    answer += event.data.delta
+                    interpretation_span.set(tokens=estimate_tokens(answer))
+                    yield answer
+
+async def start_simple_request(user_question: str) -> AsyncIterator[tuple[dict, str, str]]:
     """
     Nimmt eine Benutzerfrage, generiert SQL, führt es aus und generiert eine finale Antwort.
-    Gibt Updates für das Gradio Interface zurück (sichtbare Spalte, SQL-Code, finale Antwort).
+    Liefert schrittweise Updates für das Gradio Interface (sichtbare Spalte, SQL-Code, finale Antwort):
+    zuerst den SQL-Code, danach die Antwort Token für Token.
     """
     generated_sql = ""
 
     # Die Validierungslogik bleibt hier, da sie für beide Modi nützlich ist
     if not user_question:
-        return gr.update(visible=False), "", "Bitte geben Sie zuerst eine Frage ein oder nehmen Sie eine auf."
+        yield gr.update(visible=False), "", "Bitte geben Sie zuerst eine Frage ein oder nehmen Sie eine auf."
+        return
 
     if not os.getenv("OPENAI_API_KEY"):
         error_message = "FEHLER: OPENAI_API_KEY nicht gefunden. (.env)"
-        return gr.update(visible=False), "", error_message
-
-    print(f"\n--- Verarbeitung Ihrer Frage gestartet (Modus: Datenbank-Abfrage) ---\nBenutzerfrage: '{user_question}'")
+        yield gr.update(visible=False), "", error_message
+        return
 
     try:
         # 1. SQL-Code generieren
-        generated_sql_output = await Runner.run(sql_generator_agent, user_question)
-        generated_sql = generated_sql_output.final_output.strip()
+        generated_sql = await generate_sql(user_question, user_question, "Datenbank-Abfrage")
 
-        if not generated_sql.upper().startswith("SELECT"):
-            error_message = f"FEHLER: Ungültige oder nicht erlaubte SQL-Anweisung generiert."
+        checked_query = validate_sql(generated_sql)
+        if checked_query.error is not None:
+            error_message = f"FEHLER: Ungültige oder nicht erlaubte SQL-Anweisung generiert. {checked_query.error}"
             print(f"{error_message}\nAgenten-Output war:\n{generated_sql}")
-            return gr.update(visible=True), generated_sql, error_message
+            yield gr.update(visible=True), generated_sql, error_message
+            return
+        generated_sql = checked_query.sql
 
     except Exception as e:
         error_message = f"FEHLER beim Generieren der SQL-Abfrage: {str(e)}"
-        return gr.update(visible=bool(generated_sql)), generated_sql, error_message
+        yield gr.update(visible=bool(generated_sql)), generated_sql, error_message
+        return
 
-    print(f"\n### Generierter SQL-Code:\n```sql\n{generated_sql}\n```")
+    yield gr.update(visible=True), generated_sql, "⏳ Datenbankabfrage läuft..."
 
     # 2. Datenbankabfrage durchführen
-    db_result = DatabaseRequest(generated_sql)
+    db_result = await async_database_request(generated_sql)
 
     if not isinstance(db_result, pd.DataFrame):
         error_message = f"FEHLER bei der Datenbankabfrage: {str(db_result)}"
-        return gr.update(visible=True), generated_sql, error_message
+        yield gr.update(visible=True), generated_sql, error_message
+        return
+    db_result = apply_row_limit(db_result, checked_query.row_limit)
+
+    # Ergebnis für Nachfragen in der Sitzung ablegen (siehe handle_submit)
+    sink = result_sink.get()
+    if sink is not None:
+        sink.put(generated_sql, db_result, checked_query.unlimited_sql)
 
     # 3. Finale Antwort generieren
-    df_csv_string = db_result.to_csv(index=False)
-    interpreter_agent_inputprompt = f"""<original_frage>{user_question}</original_frage><datenbank_ergebnis>{df_csv_string}</datenbank_ergebnis>"""
+    async for update in answer_from_result(user_question, generated_sql, db_result):
+        yield update
+
+
+async def answer_from_result(user_question: str, generated_sql: str, db_result: pd.DataFrame) -> AsyncIterator[tuple[dict, str, str]]:
+    """
+    Formuliert die Antwort zu einem Datenbankergebnis: einfache Ergebnisse lokal, sonst über den
+    Interpreter-Agenten (gestreamt).
+
+    :param user_question: Die (vollständige) Benutzerfrage.
+    :param generated_sql: Der angezeigte SQL-Code.
+    :param db_result: Das Ergebnis der Datenbankabfrage.
+    :return: Ein asynchroner Iterator über die Updates für das Gradio Interface.
+    """
+    # 3a. Einfache Ergebnisse (Einzelwert, kleine Tabelle, keine Daten) lokal formulieren – ohne LLM-Aufruf
+    with span("interpretation", agent="local_renderer", rows=len(db_result)) as rendering_span:
+        local_answer = render_answer(user_question, db_result)
+        if local_answer is None:
+            rendering_span.status = "skipped"
+    if local_answer is not None:
+        yield gr.update(visible=True), generated_sql, local_answer
+        return
+
+    # 3b. Finale Antwort durch den Interpreter-Agenten generieren (gestreamt)
+    df_csv_string = encode_result_traced(db_result)
+    interpreter_agent_inputprompt = f"""<original_frage>{user_question}</original_frage><datenbank_ergebnis>{df_csv_string}</datenbank_ergebnis>{truncation_note(db_result)}"""
     
-    print(f"\n--- Übergabe an Antwort-Agenten ---")
+    yield gr.update(visible=True), generated_sql, "⏳ Antwort wird formuliert..."
+    final_answer = ""
     try:
-        interpreter_agent_output = await Runner.run(interpreter_agent, interpreter_agent_inputprompt)
-        final_answer = interpreter_agent_output.final_output.strip()
+        async for partial_answer in stream_agent_answer(interpreter_agent, interpreter_agent_inputprompt):
+            final_answer = partial_answer
+            yield gr.update(visible=True), generated_sql, final_answer
     except Exception as e:
         error_message = f"FEHLER beim Generieren der finalen Antwort: {str(e)}"
-        return gr.update(visible=True), generated_sql, error_message
+        yield gr.update(visible=True), generated_sql, error_message
+        return
+
+    final_answer = final_answer.strip()
+    yield gr.update(visible=True), generated_sql, final_answer
+
+
+async def answer_followup(followup: FollowupPlan) -> AsyncIterator[tuple[dict, str, str]]:
+    """
+    Beantwortet eine Nachfrage lokal aus dem letzten Ergebnis der Sitzung (Filter, Gruppierung, Sortierung,
+    Begrenzung) – ohne SQL-Generierung und ohne Datenbankabfrage.
+
+    :param followup: Der lokal ausführbare Plan der Nachfrage.
+    :return: Ein asynchroner Iterator über die Updates für das Gradio Interface.
+    """
+    with span("followup", rows=len(followup.previous.frame)) as followup_span:
+        refined_result = followup.apply()
+        followup_span.set(result_rows=len(refined_result))
+    generated_sql = followup.describe()
+
+    sink = result_sink.get()
+    if sink is not None:
+        sink.put(generated_sql, refined_result)
+    async for update in answer_from_result(followup.question, generated_sql, refined_result):
+        yield update
+
 
-    print(f"Finale Antwort: {final_answer[:60]}...")
-    return gr.update(visible=True), generated_sql, final_answer
+async def run_analysis_plan(plan: list[PlannedQuery]) -> list[pd.DataFrame | None]:
+    """
+    Führt alle Teilabfragen eines Analyseplans gleichzeitig aus (begrenzt durch das Datenbank-Limit).
 
-async def start_analysis(user_question: str) -> tuple[dict, str, str]:
+    :param plan: Die geplanten Abfragen.
+    :return: Die Ergebnisse in Reihenfolge des Plans (None bei Fehlern oder leeren Ergebnissen).
+    """
+    async def run_query(query: PlannedQuery) -> pd.DataFrame | None:
+        checked_query = validate_sql(query.sql)
+        if checked_query.error is not None:
+            print(f"Teilabfrage '{query.name}' abgelehnt: {checked_query.error}")
+            return None
+        db_result = await async_database_request(checked_query.sql)
+        if not isinstance(db_result, pd.DataFrame) or db_result.empty:
+            print(f"Teilabfrage '{query.name}' ohne Ergebnis: {db_result if not isinstance(db_result, pd.DataFrame) else 'keine Zeilen'}")
+            return None
+        return apply_row_limit(db_result, checked_query.row_limit)
+
+    with span("analysis_plan", queries=len(plan)) as plan_span:
+        results = await asyncio.gather(*(run_query(query) for query in plan))
+        plan_span.set(successful=sum(result is not None for result in results))
+    return list(results)
+
+
+async def start_analysis(user_question: str) -> AsyncIterator[tuple[dict, str, str]]:
     """
-    Führt den statistischen Analyse-Workflow durch:
-    1. SQL generieren, um Daten zu beschaffen
-    2. Datenbankabfrage durchführen
-    3. Analyse-Agenten mit den Daten aufrufen
+    Führt den statistischen Analyse-Workflow durch und liefert schrittweise Updates:
+    1. Analyseplan erstellen (Aggregat-Abfragen je Monat, Kategorie, Land und Kanal; ohne Plan: SQL-Agent)
+    2. Datenbankabfragen parallel durchführen
+    3. Analyse-Agenten mit den zusammengeführten Daten aufrufen (Bericht wird gestreamt)
     """
     generated_sql = ""
 
     if not user_question:
-        return gr.update(visible=False), "", "Bitte geben Sie zuerst eine Frage für die Analyse ein."
+        yield gr.update(visible=False), "", "Bitte geben Sie zuerst eine Frage für die Analyse ein."
+        return
 
     if not os.getenv("OPENAI_API_KEY"):
         error_message = "FEHLER: OPENAI_API_KEY nicht gefunden. (.env)"
-        return gr.update(visible=False), "", error_message
+        yield gr.update(visible=False), "", error_message
+        return
     
-    print(f"\n--- Verarbeitung Ihrer Frage gestartet (Modus: Statistische Analyse) ---\nBenutzerfrage: '{user_question}'")
-
-    # Schritt 1: SQL generieren, um eine breite Datenbasis zu erhalten
+    # Schritt 1+2: Analyseplan aus fokussierten Aggregat-Abfragen, die parallel laufen;
+    # deckt der Plan die Frage nicht vollständig ab, erstellt der SQL-Agent die Abfrage
+    plan, filters = build_analysis_plan(user_question) if ANALYSIS_PLAN_ENABLED else (None, None)
+    if plan is not None:
+        generated_sql = "\n\n".join(query.sql for query in plan)
+        yield gr.update(visible=True), generated_sql, f"⏳ {len(plan)} Teilabfragen laufen parallel..."
+        plan_results = await run_analysis_plan(plan)
+        if all(result is None for result in plan_results):
+            error_message = "FEHLER bei den Datenbankabfragen für die Analyse oder keine Daten gefunden. Versuchen Sie, Ihre Frage anders zu formulieren."
+            yield gr.update(visible=True), generated_sql, error_message
+            return
+
+        # Schritt 3: Teilergebnisse zusammenführen und Kennzahlen lokal berechnen
+        with span("statistics", rows=sum(len(result) for result in plan_results if result is not None)) as statistics_span:
+            statistics_summary, df_csv_string = merge_plan_results(plan, plan_results, filters, ANALYSIS_SAMPLE_TOKEN_BUDGET)
+            statistics_span.set(payload_bytes=len(statistics_summary.encode("utf-8")), tokens=estimate_tokens(statistics_summary))
+        notes = "".join(truncation_note(result) for result in plan_results if result is not None)
+        analysis_prompt = f"""<original_frage>{user_question}</original_frage><statistische_kennzahlen>{statistics_summary}</statistische_kennzahlen><datenbank_ergebnis_csv>{df_csv_string}</datenbank_ergebnis_csv>{notes}"""
+    else:
+        # Schritt 1: SQL generieren, um eine breite Datenbasis zu erhalten
+        try:
+            sql_prompt = f"Erstelle eine breite SQL-Abfrage, die alle relevanten Daten für die folgende Analysefrage liefert: '{user_question}'. Wähle alle Spalten aus, die nützlich sein könnten, aber beschränke die Zeilen sinnvoll, wenn möglich."
+            generated_sql = await generate_sql(sql_prompt, user_question, "Statistische Analyse")
+
+            checked_query = validate_sql(generated_sql)
+            if checked_query.error is not None:
+                error_message = f"FEHLER: Der SQL-Agent hat für die Analyse eine ungültige Anweisung generiert. {checked_query.error}"
+                yield gr.update(visible=True), generated_sql, error_message
+                return
+            generated_sql = checked_query.sql
+
+        except Exception as e:
+            error_message = f"FEHLER beim Generieren der SQL-Abfrage für die Analyse: {str(e)}"
+            yield gr.update(visible=bool(generated_sql)), generated_sql, error_message
+            return
+
+        yield gr.update(visible=True), generated_sql, "⏳ Datenbankabfrage läuft..."
+
+        # Schritt 2: Datenbankabfrage durchführen
+        db_result = await async_database_request(generated_sql)
+
+        if not isinstance(db_result, pd.DataFrame) or db_result.empty:
+            error_message = "FEHLER bei der Datenbankabfrage für die Analyse oder keine Daten gefunden. Versuchen Sie, Ihre Frage anders zu formulieren."
+            yield gr.update(visible=True), generated_sql, error_message
+            return
+        db_result = apply_row_limit(db_result, checked_query.row_limit)
+
+        # Schritt 3: Kennzahlen lokal berechnen und Analyse-Agent aufrufen
+        with span("statistics", rows=len(db_result)) as statistics_span:
+            statistics_summary = compute_statistics(db_result)
+            statistics_span.set(payload_bytes=len(statistics_summary.encode("utf-8")), tokens=estimate_tokens(statistics_summary))
+        df_csv_string = encode_result_traced(db_result, ANALYSIS_SAMPLE_TOKEN_BUDGET)
+        analysis_prompt = f"""<original_frage>{user_question}</original_frage><statistische_kennzahlen>{statistics_summary}</statistische_kennzahlen><datenbank_ergebnis_csv>{df_csv_string}</datenbank_ergebnis_csv>{truncation_note(db_result)}"""
+
+    yield gr.update(visible=True), generated_sql, "⏳ Analysebericht wird erstellt..."
+    final_answer = ""
     try:
-        sql_prompt = f"Erstelle eine breite SQL-Abfrage, die alle relevanten Daten für die folgende Analysefrage liefert: '{user_question}'. Wähle alle Spalten aus, die nützlich sein könnten, aber beschränke die Zeilen sinnvoll, wenn möglich."
-        generated_sql_output = await Runner.run(sql_generator_agent, sql_prompt)
-        generated_sql = generated_sql_output.final_output.strip()
-
-        if not generated_sql.upper().startswith("SELECT"):
-            error_message = f"FEHLER: Der SQL-Agent hat für die Analyse eine ungültige Anweisung generiert."
-            return gr.update(visible=True), generated_sql, error_message
-
+        async for partial_answer in stream_agent_answer(analysis_agent, analysis_prompt):
+            final_answer = partial_answer
+            yield gr.update(visible=True), generated_sql, final_answer
     except Exception as e:
-        error_message = f"FEHLER beim Generieren der SQL-Abfrage für die Analyse: {str(e)}"
-        return gr.update(visible=bool(generated_sql)), generated_sql, error_message
+        error_message = f"FEHLER während der statistischen Analyse: {str(e)}"
+        yield gr.update(visible=True), generated_sql, error_message
+        return
+    
+    final_answer = final_answer.strip()
+    yield gr.update(visible=True), generated_sql, final_answer
 
-    print(f"\n### Generierter SQL-Code zur Datenbeschaffung:\n```sql\n{generated_sql}\n```")
 
-    # Schritt 2: Datenbankabfrage durchführen
-    db_result = DatabaseRequest(generated_sql)
+async def run_admitted(pipeline_function, user_question: str, mode: str) -> AsyncIterator[tuple[dict, str, str]]:
+    """
+    Führt eine Pipeline erst aus, wenn die Zugangskontrolle einen Platz vergibt. Wartende Anfragen werden nach
+    Modus priorisiert (Datenbank-Abfrage vor Statistischer Analyse); ist die Warteschlange voll oder dauert das
+    Warten zu lange, kommt sofort eine Ausgelastet-Meldung statt eines späten Timeouts.
+
+    :param pipeline_function: start_simple_request oder start_analysis.
+    :param user_question: Die Benutzerfrage.
+    :param mode: Der gewählte Modus (bestimmt die Priorität in allen Warteschlangen).
+    :return: Ein asynchroner Iterator über die Updates der Pipeline.
+    """
+    current_priority.set(MODE_PRIORITIES[mode])
+    if not pipeline_admission.has_capacity():
+        yield gr.update(visible=False), "", QUEUED_MESSAGE
+    try:
+        await pipeline_admission.acquire()
+    except QueueFullError as e:
+        print(f"Anfrage abgewiesen: {e}")
+        yield gr.update(visible=False), "", BUSY_MESSAGE
+        return
+    try:
+        async for update in pipeline_function(user_question):
+            yield update
+    finally:
+        pipeline_admission.release()
 
-    if not isinstance(db_result, pd.DataFrame) or db_result.empty:
-        error_message = "FEHLER bei der Datenbankabfrage für die Analyse oder keine Daten gefunden. Versuchen Sie, Ihre Frage anders zu formulieren."
-        return gr.update(visible=True), generated_sql, error_message
 
-    # Schritt 3: Analyse-Agent aufrufen
-    df_csv_string = db_result.to_csv(index=False)
-    analysis_prompt = f"""<original_frage>{user_question}</original_frage><datenbank_ergebnis_csv>{df_csv_string}</datenbank_ergebnis_csv>"""
+async def run_shared_pipeline(
+    pipeline_function, user_question: str, mode: str
+) -> AsyncIterator[tuple[tuple[dict, str, str], ResultSink]]:
+    """
+    Führt eine Pipeline für alle gebündelten, identischen Anfragen aus (siehe pipeline_flight). Die Ablage des
+    Ergebnisses gehört dem gemeinsamen Pipeline-Task und wird mit jedem Update weitergereicht, damit jede Anfrage
+    SQL-Code und Ergebnis in ihre eigene Sitzung übernehmen kann.
+
+    :param pipeline_function: start_simple_request oder start_analysis.
+    :param user_question: Die Benutzerfrage.
+    :param mode: Der gewählte Modus.
+    :return: Ein asynchroner Iterator über Tupel aus Update und gemeinsamer Ergebnis-Ablage.
+    """
+    sink = ResultSink()
+    result_sink.set(sink)
+    async for update in run_admitted(pipeline_function, user_question, mode):
+        yield update, sink
 
-    print(f"\n--- Übergabe an den Junior AI Data Analysten ---")
-    try:
-        analysis_agent_output = await Runner.run(analysis_agent, analysis_prompt)
-        final_answer = analysis_agent_output.final_output.strip()
-    except Exception as e:
-        error_message = f"FEHLER während der statistischen Analyse: {str(e)}"
-        return gr.update(visible=True), generated_sql, error_message
-    
-    print(f"Analysebericht generiert: {final_answer[:60]}...")
-    return gr.update(visible=True), generated_sql, final_answer
 
+async def build_chart_traced(sql_query: str, db_result: pd.DataFrame):
+    """
+    Erzeugt das Diagramm zu einem Ergebnis in einem Worker-Thread und misst dabei die Stufe "chart".
 
-# Wrapper-Funktion, die den Modus prüft und die passende Funktion aufruft
-async def handle_submit(mode: str, user_question: str) -> tuple[dict, str, str]:
+    :param sql_query: Der SQL-Code des Ergebnisses.
+    :param db_result: Das Ergebnis der Datenbankabfrage.
+    :return: Die Diagrammdaten für gr.Plot oder None.
+    """
+    with span("chart", rows=len(db_result)) as chart_span:
+        try:
+            chart = await asyncio.to_thread(build_chart, sql_query, db_result)
+        except Exception as e:
+            print(f"Diagramm konnte nicht erstellt werden: {e}")
+            chart_span.status = "error"
+            return None
+        chart_span.set(rendered=chart is not None)
+        return chart
+
+
+# Wrapper-Funktion, die den Modus prüft und die Updates der passenden Funktion weiterreicht
+async def handle_submit(
+    mode: str, user_question: str, session_results: SessionResults | None = None
+) -> AsyncIterator[tuple[dict, str, str, dict, SessionResults]]:
+    if session_results is None:
+        session_results = SessionResults()
     if mode == "Datenbank-Abfrage":
-        return await start_simple_request(user_question)
+        pipeline_function = start_simple_request
     elif mode == "Statistische Analyse":
-        return await start_analysis(user_question)
+        pipeline_function = start_analysis
     else:
-        return gr.update(visible=False), "", "FEHLER: Unbekannter Modus ausgewählt."
+        yield gr.update(visible=False), "", "FEHLER: Unbekannter Modus ausgewählt.", gr.update(visible=False), session_results
+        return
+
+    # Nachfragen ("und nur für Mountain Bikes?") beziehen sich auf das letzte Ergebnis der Sitzung
+    followup = plan_followup(user_question, session_results.latest()) if mode == "Datenbank-Abfrage" and user_question else None
+    question = followup.question if followup is not None else user_question
+
+    new_trace()
+    with span("request", mode=mode) as request_span:
+        final_text = ""
+        session_results.shown = None
+        sink = ResultSink()
+        if followup is not None and followup.local:
+            request_span.set(followup="local")
+            result_sink.set(sink)
+            updates = ((update, sink) async for update in answer_followup(followup))
+        else:
+            # Gleichzeitige identische Anfragen teilen sich eine Pipeline-Ausführung und deren Updates;
+            # die Ergebnis-Ablage kommt mit jedem Update mit, damit jede Sitzung das Ergebnis erhält
+            updates = pipeline_flight.stream(
+                (mode, normalize_question(question)),
+                lambda: run_shared_pipeline(pipeline_function, question, mode),
+            )
+        # Das Diagramm des vorherigen Ergebnisses ausblenden und das neue zeigen, sobald das Ergebnis vorliegt
+        chart_update = gr.update(visible=False, value=None)
+        chart_built = False
+        async for (visible, generated_sql, final_text), sink in updates:
+            if not chart_built and sink.frame is not None:
+                chart_built = True
+                chart = await build_chart_traced(sink.sql, sink.frame)
+                if chart is not None:
+                    chart_update = gr.update(visible=True, value=chart)
+            yield visible, generated_sql, final_text, chart_update, session_results
+            chart_update = gr.update()
+        if sink.frame is not None and not final_text.startswith("FEHLER"):
+            session_results.add(question, sink.sql, sink.frame, sink.export_sql)
+        if final_text == BUSY_MESSAGE:
+            request_span.status = "rejected"
+        elif final_text.startswith("FEHLER"):
+            request_span.status = "error"
+
+
+def show_result_page(session_results: SessionResults | None, page: int) -> tuple[dict, pd.DataFrame, str, int]:
+    """
+    Zeigt eine Seite der Ergebnistabelle zur jüngsten Anfrage (Blättern erfolgt serverseitig).
+
+    :param session_results: Die Ergebnisse der Sitzung.
+    :param page: Die gewünschte Seite (0-basiert).
+    :return: Sichtbarkeit des Tabellenbereichs, Zeilen der Seite, Seitenhinweis und aktuelle Seite.
+    """
+    entry = session_results.shown if session_results is not None else None
+    page_frame, page_info, page = get_result_page(entry, page)
+    return gr.update(visible=entry is not None), page_frame, page_info, page
+
+
+async def export_shown_result(session_results: SessionResults | None, format_label: str) -> tuple[dict, str]:
+    """
+    Exportiert das Ergebnis der jüngsten Anfrage als Datei zum Herunterladen.
+
+    :param session_results: Die Ergebnisse der Sitzung.
+    :param format_label: Das gewählte Format ("CSV" oder "Parquet").
+    :return: Die Datei für gr.File und ein Statushinweis.
+    """
+    entry = session_results.shown if session_results is not None else None
+    if entry is None:
+        return gr.update(value=None, visible=False), "FEHLER: Kein Ergebnis zum Exportieren vorhanden."
+    new_trace()
+    file_path = await async_export_result(entry, EXPORT_FORMATS[format_label])
+    if file_path.startswith("FEHLER"):
+        return gr.update(value=None, visible=False), file_path
+    return gr.update(value=file_path, visible=True), f"✅ Export bereit: {os.path.basename(file_path)}"
 
 
 # ----------------------- Gradio Interface -----------------------
@@ -288,35 +768,99 @@ with gr.Blocks(
     # Senden-Button
     submit_button = gr.Button("🚀 Anfrage senden", variant="primary", elem_id="submit_button") 
     
-    # Finale Antwort-Box
-    final_answer_display = gr.Textbox(
-        label="Ergebnis", 
-        lines=10,
-        interactive=False,
-        show_copy_button=True,
-        elem_id="final_answer_display"
-    )
+    # Finale Antwort-Box und (optional) Diagramm zum Ergebnis
+    with gr.Row():
+        final_answer_display = gr.Textbox(
+            label="Ergebnis", 
+            lines=10,
+            interactive=False,
+            show_copy_button=True,
+            scale=2,
+            elem_id="final_answer_display"
+        )
+        chart_display = gr.Plot(label="Diagramm", visible=False, scale=3, elem_id="chart_display")
+
+    # Vollständiges Ergebnis als Tabelle (seitenweise) und Export; erscheint nach einer Datenbank-Abfrage
+    with gr.Accordion("📋 Ergebnistabelle und Export", open=False, visible=False, elem_id="result_table") as result_table_panel:
+        result_grid = gr.Dataframe(interactive=False, wrap=True, elem_id="result_grid")
+        with gr.Row():
+            previous_page_button = gr.Button("◀ Zurück", size="sm")
+            page_info_display = gr.Markdown()
+            next_page_button = gr.Button("Weiter ▶", size="sm")
+        with gr.Row():
+            export_format_selector = gr.Radio(list(EXPORT_FORMATS), value="CSV", label="Exportformat")
+            export_button = gr.Button("⬇️ Exportieren", size="sm")
+        export_status_display = gr.Markdown()
+        export_file = gr.File(label="Download", visible=False, interactive=False)
 
     # Footer
     gr.Markdown(
-        "*⏱️ Die Verarbeitung dauert typischerweise 10-25 Sekunden.*"
+        "*⏱️ Der SQL-Code erscheint nach wenigen Sekunden, die Antwort wird anschließend live angezeigt.*"
     )
 
+    # Letzte Ergebnisse dieser Sitzung für Nachfragen (je Browser-Tab, mit Speicherlimit)
+    session_results_state = gr.State(SessionResults, time_to_live=SESSION_TTL_SECONDS)
+    result_page_state = gr.State(0)
+
     # --- EVENT-HANDLER ---
     
     # 1. Audio-Aufnahme verarbeiten (unverändert)
+    # Kein Gradio-Limit je Event (Standard: 1): die Begrenzung übernehmen Zugangskontrolle und Stufen-Limits
     audio_input.stop_recording(
         fn=transcribe_and_update_textbox,
         inputs=audio_input,
-        outputs=question_input
+        outputs=question_input,
+        concurrency_limit=None
     )
     
     # 2. Text-Eingabe verarbeiten
     submit_button.click(
         fn=handle_submit,
-        inputs=[analysis_mode_selector, question_input],
-        outputs=[sql_output_column, sql_code_display, final_answer_display]
+        inputs=[analysis_mode_selector, question_input, session_results_state],
+        outputs=[sql_output_column, sql_code_display, final_answer_display, chart_display, session_results_state],
+        concurrency_limit=None
+    ).then(
+        fn=lambda session_results: (*show_result_page(session_results, 0), "", gr.update(value=None, visible=False)),
+        inputs=[session_results_state],
+        outputs=[result_table_panel, result_grid, page_info_display, result_page_state, export_status_display, export_file],
     )
 
+    # 3. Ergebnistabelle blättern und exportieren
+    previous_page_button.click(
+        fn=lambda session_results, page: show_result_page(session_results, page - 1),
+        inputs=[session_results_state, result_page_state],
+        outputs=[result_table_panel, result_grid, page_info_display, result_page_state],
+    )
+    next_page_button.click(
+        fn=lambda session_results, page: show_result_page(session_results, page + 1),
+        inputs=[session_results_state, result_page_state],
+        outputs=[result_table_panel, result_grid, page_info_display, result_page_state],
+    )
+    export_button.click(
+        fn=export_shown_result,
+        inputs=[session_results_state, export_format_selector],
+        outputs=[export_file, export_status_display],
+        concurrency_limit=None
+    )
+
+def create_server() -> FastAPI:
+    """
+    Erstellt den Webserver: Gradio-Oberfläche unter "/" und Prometheus-Metriken unter "/metrics".
+
+    :return: Die FastAPI-Anwendung.
+    """
+    server = FastAPI()
+
+    @server.get("/metrics", response_class=PlainTextResponse)
+    def metrics_endpoint() -> PlainTextResponse:
+        return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
+    return gr.mount_gradio_app(server, demo, path="/")
+
+
 if __name__ == "__main__":
-    demo.launch(share=False)
\ No newline at end of file
+    uvicorn.run(
+        create_server(),
+        host=os.getenv("GRADIO_SERVER_NAME", "127.0.0.1"),
+        port=int(os.getenv("GRADIO_SERVER_PORT", "7860")),
+    )
\ No newline at end of file
@@ -0,0 +1,182 @@
+# audio_preprocessing.py
+import io
+import os
+import wave
+
+import numpy as np
+
+TARGET_SAMPLE_RATE = int(os.getenv("WHISPER_SAMPLE_RATE", "16000"))
+SILENCE_THRESHOLD_DB = float(os.getenv("WHISPER_SILENCE_THRESHOLD_DB", "-40"))
+# Aufnahmen über dieser Länge werden an Sprechpausen geteilt und parallel transkribiert
+CHUNK_SECONDS = float(os.getenv("WHISPER_CHUNK_SECONDS", "30"))
+FRAME_MS = 20
+SILENCE_PADDING_MS = 200
+# Bereich vor der Chunk-Grenze, in dem nach der leisesten Stelle gesucht wird
+SPLIT_SEARCH_SECONDS = 5.0
+FIR_TAPS = 101
+
+
+def read_wav(file_path: str) -> tuple[np.ndarray, int]:
+    """
+    Dekodiert eine PCM-WAV-Datei (8, 16, 24 oder 32 Bit).
+
+    :param file_path: Der Pfad zur WAV-Datei.
+    :return: Die Samples als float32-Array der Form (Samples, Kanäle) im Bereich [-1, 1] und die Abtastrate.
+    """
+    with wave.open(file_path, "rb") as wav_file:
+        channels = wav_file.getnchannels()
+        sample_width = wav_file.getsampwidth()
+        sample_rate = wav_file.getframerate()
+        raw = wav_file.readframes(wav_file.getnframes())
+
+    if sample_width == 1:
+        samples = (np.frombuffer(raw, dtype=np.uint8).astype(np.float32) - 128) / 128
+    elif sample_width == 2:
+        samples = np.frombuffer(raw, dtype="<i2").astype(np.float32) / 32768
+    elif sample_width == 3:
+        # 24 Bit: drei Bytes je Sample auf int32 erweitern (Vorzeichen über Linksverschiebung)
+        bytes_ = np.frombuffer(raw, dtype=np.uint8).reshape(-1, 3).astype(np.int32)
+        samples = ((bytes_[:, 0] << 8 | bytes_[:, 1] << 16 | bytes_[:, 2] << 24) >> 8).astype(np.float32) / 8388608
+    elif sample_width == 4:
+        samples = np.frombuffer(raw, dtype="<i4").astype(np.float32) / 2147483648
+    else:
+        raise ValueError(f"Nicht unterstützte Sample-Breite: {sample_width} Bytes")
+    return samples.reshape(-1, channels), sample_rate
+
+
+def to_mono(samples: np.ndarray) -> np.ndarray:
+    """
+    Mischt alle Kanäle zu einem Mono-Signal herunter.
+
+    :param samples: Die Samples der Form (Samples, Kanäle).
+    :return: Das Mono-Signal als eindimensionales Array.
+    """
+    return samples.mean(axis=1) if samples.ndim == 2 else samples
+
+
+def resample(samples: np.ndarray, sample_rate: int, target_rate: int = TARGET_SAMPLE_RATE) -> np.ndarray:
+    """
+    Rechnet ein Mono-Signal auf die Zielabtastrate um. Beim Heruntertasten wird vorher
+    mit einem gefensterten Sinc-Tiefpass gefiltert, um Aliasing zu vermeiden.
+
+    :param samples: Das Mono-Signal.
+    :param sample_rate: Die ursprüngliche Abtastrate.
+    :param target_rate: Die Zielabtastrate.
+    :return: Das umgerechnete Signal.
+    """
+    if sample_rate == target_rate or len(samples) == 0:
+        return samples
+    if target_rate < sample_rate:
+        cutoff = 0.5 * target_rate / sample_rate
+        taps = np.arange(FIR_TAPS) - (FIR_TAPS - 1) / 2
+        fir = 2 * cutoff * np.sinc(2 * cutoff * taps) * np.hamming(FIR_TAPS)
+        samples = np.convolve(samples, fir / fir.sum(), mode="same")
+
+    duration = len(samples) / sample_rate
+    target_times = np.arange(int(duration * target_rate)) / target_rate
+    source_times = np.arange(len(samples)) / sample_rate
+    return np.interp(target_times, source_times, samples).astype(np.float32)
+
+
+def frame_levels_db(samples: np.ndarray, sample_rate: int) -> np.ndarray:
+    """
+    Berechnet den RMS-Pegel je Frame (FRAME_MS) in dBFS.
+
+    :param samples: Das Mono-Signal.
+    :param sample_rate: Die Abtastrate.
+    :return: Der Pegel je Frame.
+    """
+    frame_length = max(int(sample_rate * FRAME_MS / 1000), 1)
+    frame_count = len(samples) // frame_length
+    if frame_count == 0:
+        return np.empty(0)
+    frames = samples[:frame_count * frame_length].reshape(frame_count, frame_length)
+    rms = np.sqrt(np.mean(frames.astype(np.float64) ** 2, axis=1))
+    return 20 * np.log10(np.maximum(rms, 1e-10))
+
+
+def trim_silence(samples: np.ndarray, sample_rate: int, threshold_db: float = SILENCE_THRESHOLD_DB) -> np.ndarray:
+    """
+    Entfernt Stille am Anfang und Ende (mit SILENCE_PADDING_MS Rand, damit Silben nicht abgeschnitten werden).
+
+    :param samples: Das Mono-Signal.
+    :param sample_rate: Die Abtastrate.
+    :param threshold_db: Pegel in dBFS, unter dem ein Frame als Stille gilt.
+    :return: Das gekürzte Signal (leer, wenn die ganze Aufnahme still ist).
+    """
+    levels = frame_levels_db(samples, sample_rate)
+    voiced = np.flatnonzero(levels > threshold_db)
+    if len(voiced) == 0:
+        return samples[:0]
+    frame_length = max(int(sample_rate * FRAME_MS / 1000), 1)
+    padding = int(sample_rate * SILENCE_PADDING_MS / 1000)
+    start = max(voiced[0] * frame_length - padding, 0)
+    end = min((voiced[-1] + 1) * frame_length + padding, len(samples))
+    return samples[start:end]
+
+
+def split_at_silence(samples: np.ndarray, sample_rate: int, chunk_seconds: float = CHUNK_SECONDS) -> list[np.ndarray]:
+    """
+    Teilt ein langes Signal in Abschnitte von höchstens chunk_seconds. Geschnitten wird an der leisesten
+    Stelle in den letzten SPLIT_SEARCH_SECONDS vor der Grenze, damit keine Wörter zerteilt werden.
+
+    :param samples: Das Mono-Signal.
+    :param sample_rate: Die Abtastrate.
+    :param chunk_seconds: Die maximale Abschnittslänge in Sekunden.
+    :return: Die Abschnitte in zeitlicher Reihenfolge.
+    """
+    max_length = int(chunk_seconds * sample_rate)
+    if len(samples) <= max_length:
+        return [samples]
+
+    frame_length = max(int(sample_rate * FRAME_MS / 1000), 1)
+    levels = frame_levels_db(samples, sample_rate)
+    search_frames = max(int(SPLIT_SEARCH_SECONDS * 1000 / FRAME_MS), 1)
+    chunks = []
+    start = 0
+    while len(samples) - start > max_length:
+        last_frame = (start + max_length) // frame_length
+        first_frame = max(last_frame - search_frames, start // frame_length + 1)
+        quietest_frame = first_frame + int(np.argmin(levels[first_frame:last_frame]))
+        cut = quietest_frame * frame_length + frame_length // 2
+        chunks.append(samples[start:cut])
+        start = cut
+    chunks.append(samples[start:])
+    return chunks
+
+
+def encode_wav(samples: np.ndarray, sample_rate: int = TARGET_SAMPLE_RATE) -> bytes:
+    """
+    Kodiert ein Mono-Signal als 16-Bit-PCM-WAV im Speicher.
+
+    :param samples: Das Mono-Signal im Bereich [-1, 1].
+    :param sample_rate: Die Abtastrate.
+    :return: Der Inhalt der WAV-Datei.
+    """
+    pcm = (np.clip(samples, -1.0, 1.0) * 32767).astype("<i2")
+    buffer = io.BytesIO()
+    with wave.open(buffer, "wb") as wav_file:
+        wav_file.setnchannels(1)
+        wav_file.setsampwidth(2)
+        wav_file.setframerate(sample_rate)
+        wav_file.writeframes(pcm.tobytes())
+    return buffer.getvalue()
+
+
+def preprocess_audio(file_path: str) -> tuple[list[bytes], float] | None:
+    """
+    Bereitet eine Aufnahme für Whisper auf: Mono, 16 kHz, Stille an den Rändern entfernt,
+    lange Aufnahmen an Sprechpausen geteilt.
+
+    :param file_path: Der Pfad zur Aufnahme.
+    :return: Die Abschnitte als WAV-Bytes und die Länge nach dem Kürzen in Sekunden,
+             oder None, wenn die Datei kein dekodierbares PCM-WAV ist.
+    """
+    try:
+        samples, sample_rate = read_wav(file_path)
+    except (wave.Error, ValueError, EOFError):
+        return None
+    mono = resample(to_mono(samples), sample_rate)
+    trimmed = trim_silence(mono, TARGET_SAMPLE_RATE)
+    chunks = split_at_silence(trimmed, TARGET_SAMPLE_RATE) if len(trimmed) else []
+    return [encode_wav(chunk) for chunk in chunks], len(trimmed) / TARGET_SAMPLE_RATE
@@ -0,0 +1,525 @@
+# benchmark.py
+"""
+Offline-Benchmark der Pipelines aus app.py (Datenbank-Abfrage, Statistische Analyse, Spracheingabe).
+
+OpenAI (Agenten und Whisper) wird durch deterministische Stubs mit konfigurierbarer Latenzverteilung ersetzt,
+MSSQL durch eine generierte SQLite-Fixture mit dem AdventureBikes-Schema. Gemessen werden p50/p95/p99 je Stufe,
+Durchsatz bei N gleichzeitigen Nutzern und Spitzen-Speicherverbrauch.
+
+Aufruf: python benchmark.py   (Konfiguration über BENCH_*-Umgebungsvariablen, siehe unten)
+"""
+import asyncio
+import contextlib
+import json
+import math
+import os
+import random
+import resource
+import sqlite3
+import sys
+import time
+import tracemalloc
+import wave
+from collections import defaultdict
+from types import SimpleNamespace
+
+import numpy as np
+import pandas as pd
+from openai.types.responses import ResponseTextDeltaEvent
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import Engine
+from sqlalchemy.pool import QueuePool
+
+# Stubs statt echter Zugangsdaten: Ohne Schlüssel würden die Pipelines sofort abbrechen
+os.environ.setdefault("OPENAI_API_KEY", "benchmark-stub")
+
+import database_request
+from build_context import FALLBACK_CONTEXT_FILE, load_fallback_sections
+from intent_parser import CHANNEL_SYNONYMS, COUNTRY_SYNONYMS
+from local_replica import to_sqlite_sql
+from schema_pruner import CATALOG_LINE, QUOTED_VALUE
+
+BENCH_USERS = [int(users) for users in os.getenv("BENCH_USERS", "1,4,16").split(",")]
+BENCH_REQUESTS_PER_USER = int(os.getenv("BENCH_REQUESTS_PER_USER", "5"))
+BENCH_MONTHLY_ROWS = int(os.getenv("BENCH_MONTHLY_ROWS", "50000"))
+BENCH_DAILY_ROWS = int(os.getenv("BENCH_DAILY_ROWS", "200000"))
+BENCH_SEED = int(os.getenv("BENCH_SEED", "42"))
+BENCH_LLM_MEDIAN_MS = float(os.getenv("BENCH_LLM_MEDIAN_MS", "800"))
+BENCH_LLM_P95_MS = float(os.getenv("BENCH_LLM_P95_MS", "2000"))
+BENCH_TOKEN_MS = float(os.getenv("BENCH_TOKEN_MS", "15"))
+BENCH_WHISPER_MEDIAN_MS = float(os.getenv("BENCH_WHISPER_MEDIAN_MS", "600"))
+BENCH_WHISPER_P95_MS = float(os.getenv("BENCH_WHISPER_P95_MS", "1500"))
+# Standardmäßig ohne SQL-/Ergebnis-Cache, damit jede Anfrage alle Stufen durchläuft
+BENCH_WARM_CACHES = os.getenv("BENCH_WARM_CACHES", "false").lower() in ("1", "true", "yes")
+BENCH_FIXTURE_DIR = os.getenv("BENCH_FIXTURE_DIR", ".cache")
+BENCH_OUTPUT = os.getenv("BENCH_OUTPUT", "benchmark_results.json")
+BENCH_BASELINE = os.getenv("BENCH_BASELINE", "")
+BENCH_REGRESSION_TOLERANCE = float(os.getenv("BENCH_REGRESSION_TOLERANCE", "0.2"))
+
+# Fragen mit dem SQL, das der SQL-Agent-Stub dafür liefert (SQLite-kompatibel, TOP wird übersetzt)
+BENCHMARK_QUESTIONS = [
+    (
+        "Datenbank-Abfrage",
+        "Wie hoch war der Umsatz pro Land im Jahr 2024?",
+        "SELECT dms.Sales_Country, SUM(dms.Revenue_EUR) AS Gesamtumsatz_EUR FROM dbo.DataSet_Monthly_Sales AS dms "
+        "WHERE dms.Calendar_Year = '2024' GROUP BY dms.Sales_Country ORDER BY Gesamtumsatz_EUR DESC;",
+    ),
+    (
+        "Datenbank-Abfrage",
+        "Zeige den monatlichen Umsatz je Produktkategorie für 2024.",
+        "SELECT dms.Calendar_Month_ISO, p.Product_Category, SUM(dms.Revenue_EUR) AS Gesamtumsatz_EUR "
+        "FROM dbo.DataSet_Monthly_Sales AS dms JOIN dbo.Dim_Product AS p ON dms.Material_Number = p.Material_Number "
+        "WHERE dms.Calendar_Year = '2024' GROUP BY dms.Calendar_Month_ISO, p.Product_Category "
+        "ORDER BY dms.Calendar_Month_ISO, p.Product_Category;",
+    ),
+    (
+        "Datenbank-Abfrage",
+        "Welche 10 Produkte hatten die höchste Verkaufsmenge?",
+        "SELECT TOP 10 p.Material_Description, SUM(dms.Sales_Amount) AS Gesamtstueckzahl "
+        "FROM dbo.DataSet_Monthly_Sales AS dms JOIN dbo.Dim_Product AS p ON dms.Material_Number = p.Material_Number "
+        "GROUP BY p.Material_Description ORDER BY Gesamtstueckzahl DESC;",
+    ),
+    (
+        "Datenbank-Abfrage",
+        "Wie viele Fahrräder wurden pro Tag im Juni 2025 verkauft?",
+        "SELECT fds.ID_Order_Date, SUM(fds.Sales_Amount) AS Gesamtstueckzahl FROM dbo.Facts_Daily_Sales AS fds "
+        "WHERE fds.ID_Order_Date BETWEEN '2025-06-01' AND '2025-06-30' GROUP BY fds.ID_Order_Date ORDER BY fds.ID_Order_Date;",
+    ),
+    (
+        "Statistische Analyse",
+        "Analysiere die Verkäufe von Mountain Bikes.",
+        "SELECT dms.Calendar_Month_ISO, dms.Sales_Country, dms.Sales_Channel, SUM(dms.Revenue_EUR) AS Revenue_EUR, "
+        "SUM(dms.Sales_Amount) AS Sales_Amount FROM dbo.DataSet_Monthly_Sales AS dms "
+        "WHERE dms.Product_Category = 'Mountain Bikes' GROUP BY dms.Calendar_Month_ISO, dms.Sales_Country, dms.Sales_Channel "
+        "ORDER BY dms.Calendar_Month_ISO;",
+    ),
+]
+STUB_ANSWER = (
+    "Der Gesamtumsatz lag im betrachteten Zeitraum bei 12.345.678,90 EUR. Deutschland war der umsatzstärkste Markt, "
+    "gefolgt von der Schweiz und Frankreich. Die Verkaufsmenge stieg gegenüber dem Vorjahr um 4,2 %."
+)
+GLOBAL_REGIONS = {"United States": "North America"}
+
+
+class LatencyModel:
+    """Log-normalverteilte Latenz, parametrisiert über Median und 95. Perzentil (deterministisch per Seed)."""
+
+    def __init__(self, median_ms: float, p95_ms: float, seed: int):
+        self.mu = math.log(median_ms / 1000)
+        # Das 95. Perzentil der Normalverteilung liegt bei 1,645 Standardabweichungen
+        self.sigma = max(math.log(p95_ms / median_ms), 0.0) / 1.645
+        self._random = random.Random(seed)
+
+    def sample(self) -> float:
+        """
+        Zieht eine Latenz.
+
+        :return: Die Latenz in Sekunden.
+        """
+        return self._random.lognormvariate(self.mu, self.sigma)
+
+
+class StubRunner:
+    """Ersetzt agents.Runner: liefert für den SQL-Agenten das hinterlegte SQL und streamt eine feste Antwort."""
+
+    def __init__(self, latency: LatencyModel, token_seconds: float):
+        self.latency = latency
+        self.token_seconds = token_seconds
+
+    async def run(self, agent, agent_input: str) -> SimpleNamespace:
+        """
+        Simuliert Runner.run (wird nur für den SQL-Agenten verwendet).
+
+        :param agent: Der aufgerufene Agent.
+        :param agent_input: Die Agenten-Eingabe (enthält die Benutzerfrage).
+        :return: Ein Ergebnisobjekt mit final_output.
+        """
+        await asyncio.sleep(self.latency.sample())
+        for _, question, sql_query in BENCHMARK_QUESTIONS:
+            if question in agent_input:
+                return SimpleNamespace(final_output=sql_query)
+        return SimpleNamespace(final_output="SELECT 'FEHLER: Unbekannte Benchmark-Frage' AS Fehlermeldung;")
+
+    def run_streamed(self, agent, agent_input: str) -> SimpleNamespace:
+        """
+        Simuliert Runner.run_streamed: erst die Latenz bis zum ersten Token, danach ein Wort je token_seconds.
+
+        :param agent: Der aufgerufene Agent.
+        :param agent_input: Die Agenten-Eingabe.
+        :return: Ein Objekt mit der Methode stream_events().
+        """
+        async def stream_events():
+            await asyncio.sleep(self.latency.sample())
+            for word in STUB_ANSWER.split(" "):
+                delta = ResponseTextDeltaEvent.model_construct(delta=word + " ", type="response.output_text.delta")
+                yield SimpleNamespace(type="raw_response_event", data=delta)
+                await asyncio.sleep(self.token_seconds)
+
+        return SimpleNamespace(stream_events=stream_events)
+
+
+class StubWhisperClient:
+    """Ersetzt den gemeinsamen OpenAI-Client aus agent_whisper für die Transkription."""
+
+    def __init__(self, latency: LatencyModel):
+        async def create(**kwargs) -> SimpleNamespace:
+            await asyncio.sleep(latency.sample())
+            return SimpleNamespace(text=BENCHMARK_QUESTIONS[0][1])
+
+        self.audio = SimpleNamespace(transcriptions=SimpleNamespace(create=create))
+
+
+class DisabledSqlCache:
+    """SQL-Cache ohne Treffer, damit jede Anfrage den (simulierten) SQL-Agenten durchläuft."""
+
+    def get(self, question: str, mode: str) -> None:
+        return None
+
+    def put(self, question: str, mode: str, sql_query: str) -> None:
+        return None
+
+    def stats(self) -> dict:
+        return {}
+
+
+def create_fixture(file_path: str, monthly_rows: int, daily_rows: int, seed: int) -> None:
+    """
+    Erzeugt eine SQLite-Datenbank mit dem AdventureBikes-Schema und zufälligen, reproduzierbaren Verkaufsdaten.
+
+    :param file_path: Der Zielpfad der Fixture.
+    :param monthly_rows: Anzahl der Zeilen in DataSet_Monthly_Sales.
+    :param daily_rows: Anzahl der Zeilen in Facts_Daily_Sales.
+    :param seed: Seed des Zufallsgenerators.
+    """
+    rng = np.random.default_rng(seed)
+
+    # Produktkatalog aus dem gepflegten Datenbank-Kontext
+    products = []
+    for line in load_fallback_sections(FALLBACK_CONTEXT_FILE)["3.3"].splitlines():
+        match = CATALOG_LINE.match(line)
+        if match:
+            for description in QUOTED_VALUE.findall(match.group(2)):
+                products.append((match.group(1), description.replace('""', '"')))
+    dim_product = pd.DataFrame({
+        "ID_Product": np.arange(1, len(products) + 1),
+        "Material_Number": [f"M-{index:05d}" for index in range(1, len(products) + 1)],
+        "Material_Description": [description for _, description in products],
+        "Product_Category": [category for category, _ in products],
+        "Product_Line": "Bicycles",
+    })
+
+    countries = sorted(set(COUNTRY_SYNONYMS.values()))
+    dim_sales_office = pd.DataFrame({
+        "ID_Sales_Office": np.arange(1, len(countries) + 1),
+        "Sales_Country": countries,
+        "Global_Region": [GLOBAL_REGIONS.get(country, "Europe") for country in countries],
+        "Sales_Region": [GLOBAL_REGIONS.get(country, "Europe") for country in countries],
+    })
+    channels = sorted(set(CHANNEL_SYNONYMS.values()))
+    dim_sales_channel = pd.DataFrame({"ID_Sales_Channel": np.arange(1, len(channels) + 1), "Sales_Channel": channels})
+    months = pd.period_range("2020-01", "2025-05", freq="M")
+    dim_calendar = pd.DataFrame({
+        "Calendar_Month_ISO": months.strftime("%Y.%m"),
+        "Calendar_Year": months.strftime("%Y"),
+    })
+    dim_currency = pd.DataFrame({"Currency": ["EUR", "CHF", "GBP", "USD"], "Rate_To_EUR": [1.0, 1.04, 1.17, 0.92]})
+
+    # Monatsdaten: zufällige Kombinationen aus Monat, Produkt, Land und Kanal
+    month_index = rng.integers(0, len(months), monthly_rows)
+    product_index = rng.integers(0, len(dim_product), monthly_rows)
+    country_index = rng.integers(0, len(countries), monthly_rows)
+    sales_amount = rng.integers(1, 200, monthly_rows)
+    unit_price = rng.uniform(250, 2500, len(dim_product)).round(2)
+    monthly_sales = pd.DataFrame({
+        "Calendar_Year": dim_calendar["Calendar_Year"].to_numpy()[month_index],
+        "Calendar_Month_ISO": dim_calendar["Calendar_Month_ISO"].to_numpy()[month_index],
+        "Sales_Country": dim_sales_office["Sales_Country"].to_numpy()[country_index],
+        "Global_Region": dim_sales_office["Global_Region"].to_numpy()[country_index],
+        "Sales_Channel": np.asarray(channels)[rng.integers(0, len(channels), monthly_rows)],
+        "Product_Category": dim_product["Product_Category"].to_numpy()[product_index],
+        "Material_Number": dim_product["Material_Number"].to_numpy()[product_index],
+        "Revenue_EUR": (sales_amount * unit_price[product_index]).round(2),
+        "Sales_Amount": sales_amount,
+    })
+
+    days = pd.date_range("2020-01-04", "2025-06-15", freq="D")
+    daily_sales = pd.DataFrame({
+        "ID_Order_Date": days.strftime("%Y-%m-%d").to_numpy()[rng.integers(0, len(days), daily_rows)],
+        "Sales_Amount": rng.integers(1, 20, daily_rows),
+        "ID_Product": rng.integers(1, len(dim_product) + 1, daily_rows),
+    })
+
+    directory = os.path.dirname(file_path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    temp_path = f"{file_path}.tmp"
+    if os.path.exists(temp_path):
+        os.remove(temp_path)
+    with sqlite3.connect(temp_path) as connection:
+        tables = {
+            "DataSet_Monthly_Sales": monthly_sales,
+            "Facts_Daily_Sales": daily_sales,
+            "Dim_Product": dim_product,
+            "Dim_Sales_Office": dim_sales_office,
+            "Dim_Sales_Channel": dim_sales_channel,
+            "Dim_Calendar": dim_calendar,
+            "Dim_Currency": dim_currency,
+        }
+        for table_name, df in tables.items():
+            df.to_sql(table_name, connection, index=False, chunksize=20000)
+        connection.execute("CREATE INDEX ix_monthly_month ON DataSet_Monthly_Sales (Calendar_Month_ISO)")
+        connection.execute("CREATE INDEX ix_daily_date ON Facts_Daily_Sales (ID_Order_Date)")
+    os.replace(temp_path, file_path)
+
+
+def create_fixture_engine(file_path: str) -> Engine:
+    """
+    Erstellt eine SQLAlchemy-Engine auf die Fixture. Die Datei wird als Schema "dbo" eingebunden
+    und T-SQL-Besonderheiten (TOP, ISNULL) werden vor der Ausführung übersetzt.
+
+    :param file_path: Der Pfad der Fixture.
+    :return: Die Engine.
+    """
+    engine = create_engine(
+        "sqlite://",
+        poolclass=QueuePool,
+        pool_size=database_request.DB_POOL_SIZE,
+        max_overflow=database_request.DB_MAX_OVERFLOW,
+        connect_args={"check_same_thread": False},
+    )
+
+    @event.listens_for(engine, "connect")
+    def _attach_fixture(dbapi_connection, connection_record):
+        dbapi_connection.execute("ATTACH DATABASE ? AS dbo", (file_path,))
+
+    @event.listens_for(engine, "before_cursor_execute", retval=True)
+    def _translate_tsql(connection, cursor, statement, parameters, context, executemany):
+        return to_sqlite_sql(statement), parameters
+
+    return engine
+
+
+def create_audio_fixture(file_path: str, seconds: float = 3.0, sample_rate: int = 16000) -> None:
+    """
+    Erzeugt eine kurze WAV-Datei (Sinuston) als Eingabe für die Transkriptionsstufe.
+
+    :param file_path: Der Zielpfad.
+    :param seconds: Die Länge der Aufnahme.
+    :param sample_rate: Die Abtastrate.
+    """
+    samples = (np.sin(np.linspace(0, 440 * 2 * np.pi * seconds, int(sample_rate * seconds))) * 8000).astype(np.int16)
+    with wave.open(file_path, "wb") as wav_file:
+        wav_file.setnchannels(1)
+        wav_file.setsampwidth(2)
+        wav_file.setframerate(sample_rate)
+        wav_file.writeframes(samples.tobytes())
+
+
+class StageTimer:
+    """Sammelt die Dauer jeder Pipeline-Stufe über alle Anfragen."""
+
+    def __init__(self):
+        self.durations: dict[str, list[float]] = defaultdict(list)
+
+    def record(self, stage: str, seconds: float) -> None:
+        self.durations[stage].append(seconds)
+
+    def wrap(self, stage: str, function):
+        """
+        Umhüllt eine async-Funktion und misst deren Laufzeit.
+
+        :param stage: Der Name der Stufe.
+        :param function: Die zu messende Coroutine-Funktion.
+        :return: Die gemessene Funktion.
+        """
+        async def timed(*args, **kwargs):
+            started_at = time.perf_counter()
+            try:
+                return await function(*args, **kwargs)
+            finally:
+                self.record(stage, time.perf_counter() - started_at)
+        return timed
+
+    def wrap_stream(self, function):
+        """
+        Umhüllt stream_agent_answer und misst Zeit bis zum ersten Token sowie Gesamtdauer der Antwort.
+
+        :param function: Die Generator-Funktion.
+        :return: Die gemessene Generator-Funktion.
+        """
+        async def timed(*args, **kwargs):
+            started_at = time.perf_counter()
+            first_token = True
+            async for partial_answer in function(*args, **kwargs):
+                if first_token:
+                    self.record("answer_first_token", time.perf_counter() - started_at)
+                    first_token = False
+                yield partial_answer
+            self.record("answer_stream", time.perf_counter() - started_at)
+        return timed
+
+    def summary(self) -> dict[str, dict[str, float]]:
+        """
+        Berechnet p50/p95/p99 (in Millisekunden) je Stufe.
+
+        :return: Zuordnung Stufe -> Kennzahlen.
+        """
+        result = {}
+        for stage, durations in sorted(self.durations.items()):
+            values = np.asarray(durations) * 1000
+            result[stage] = {
+                "count": len(values),
+                "p50_ms": round(float(np.percentile(values, 50)), 1),
+                "p95_ms": round(float(np.percentile(values, 95)), 1),
+                "p99_ms": round(float(np.percentile(values, 99)), 1),
+            }
+        return result
+
+
+async def _simulate_user(app_module, user_index: int, audio_path: str, timer: StageTimer) -> int:
+    """
+    Simuliert einen Nutzer, der nacheinander BENCH_REQUESTS_PER_USER Anfragen stellt (Spracheingabe + Pipeline).
+
+    :param app_module: Das importierte app-Modul.
+    :param user_index: Die Nummer des Nutzers (bestimmt die Fragenreihenfolge).
+    :param audio_path: Der Pfad der Audio-Fixture.
+    :param timer: Der Stufen-Timer.
+    :return: Die Anzahl erfolgreicher Anfragen.
+    """
+    successful = 0
+    for request_index in range(BENCH_REQUESTS_PER_USER):
+        mode, question, _ = BENCHMARK_QUESTIONS[(user_index + request_index) % len(BENCHMARK_QUESTIONS)]
+        started_at = time.perf_counter()
+        await app_module.transcribe_and_update_textbox(audio_path)
+        final_text = ""
+        async for _, _, text, _, _ in app_module.handle_submit(mode, question):
+            final_text = text
+        timer.record("end_to_end", time.perf_counter() - started_at)
+        if not final_text.startswith("FEHLER"):
+            successful += 1
+    return successful
+
+
+async def run_load(app_module, users: int, audio_path: str, timer: StageTimer) -> dict:
+    """
+    Führt die Last mit einer festen Anzahl gleichzeitiger Nutzer aus.
+
+    :param app_module: Das importierte app-Modul.
+    :param users: Anzahl gleichzeitiger Nutzer.
+    :param audio_path: Der Pfad der Audio-Fixture.
+    :param timer: Der Stufen-Timer.
+    :return: Durchsatz-Kennzahlen.
+    """
+    started_at = time.perf_counter()
+    results = await asyncio.gather(*(_simulate_user(app_module, index, audio_path, timer) for index in range(users)))
+    elapsed = time.perf_counter() - started_at
+    total = users * BENCH_REQUESTS_PER_USER
+    return {
+        "users": users,
+        "requests": total,
+        "successful": sum(results),
+        "seconds": round(elapsed, 2),
+        "requests_per_second": round(total / elapsed, 2),
+    }
+
+
+def compare_with_baseline(report: dict, baseline_path: str) -> list[str]:
+    """
+    Vergleicht die p95-Werte mit einem früheren Lauf.
+
+    :param report: Der aktuelle Bericht.
+    :param baseline_path: Der Pfad zum Bericht des Referenzlaufs.
+    :return: Die Beschreibungen aller Regressionen über BENCH_REGRESSION_TOLERANCE.
+    """
+    with open(baseline_path, "r", encoding="utf-8") as f:
+        baseline = json.load(f)
+    regressions = []
+    for users, stages in report["stages"].items():
+        for stage, metrics in stages.items():
+            reference = baseline.get("stages", {}).get(users, {}).get(stage)
+            if reference and metrics["p95_ms"] > reference["p95_ms"] * (1 + BENCH_REGRESSION_TOLERANCE):
+                regressions.append(f"{stage} bei {users} Nutzern: p95 {reference['p95_ms']} ms -> {metrics['p95_ms']} ms")
+    return regressions
+
+
+async def main() -> int:
+    fixture_path = os.path.join(BENCH_FIXTURE_DIR, f"benchmark_{BENCH_MONTHLY_ROWS}_{BENCH_DAILY_ROWS}_{BENCH_SEED}.sqlite")
+    if not os.path.exists(fixture_path):
+        print(f"--- Erzeuge SQLite-Fixture '{fixture_path}'...")
+        create_fixture(fixture_path, BENCH_MONTHLY_ROWS, BENCH_DAILY_ROWS, BENCH_SEED)
+    audio_path = os.path.join(BENCH_FIXTURE_DIR, "benchmark_audio.wav")
+    create_audio_fixture(audio_path)
+
+    # Engine vor dem Import von app.py setzen, damit der Warmup-Thread keine MSSQL-Verbindung aufbaut
+    database_request._db_engine = create_fixture_engine(fixture_path)
+    with contextlib.redirect_stdout(open(os.devnull, "w")):
+        import agent_whisper
+        import app
+
+    llm_latency = LatencyModel(BENCH_LLM_MEDIAN_MS, BENCH_LLM_P95_MS, BENCH_SEED)
+    whisper_latency = LatencyModel(BENCH_WHISPER_MEDIAN_MS, BENCH_WHISPER_P95_MS, BENCH_SEED + 1)
+    app.Runner = StubRunner(llm_latency, BENCH_TOKEN_MS / 1000)
+    whisper_client = StubWhisperClient(whisper_latency)
+    agent_whisper.get_whisper_client = lambda: whisper_client
+    # Der Intent-Parser erzeugt WITH ROLLUP, das SQLite nicht ausführen kann -> immer über den SQL-Agenten
+    app.INTENT_CONFIDENCE_THRESHOLD = math.inf
+    if not BENCH_WARM_CACHES:
+        app.sql_cache = DisabledSqlCache()
+        database_request._result_cache.max_bytes = 0
+
+    report = {"config": {key: value for key, value in globals().items() if key.startswith("BENCH_")}, "stages": {}, "throughput": []}
+    tracemalloc.start()
+    for users in BENCH_USERS:
+        timer = StageTimer()
+        original_functions = {
+            "transcribe_audio": app.transcribe_audio,
+            "generate_sql": app.generate_sql,
+            "async_database_request": app.async_database_request,
+            "stream_agent_answer": app.stream_agent_answer,
+        }
+        app.transcribe_audio = timer.wrap("whisper", original_functions["transcribe_audio"])
+        app.generate_sql = timer.wrap("sql_generation", original_functions["generate_sql"])
+        app.async_database_request = timer.wrap("database", original_functions["async_database_request"])
+        app.stream_agent_answer = timer.wrap_stream(original_functions["stream_agent_answer"])
+        try:
+            with contextlib.redirect_stdout(open(os.devnull, "w")):
+                throughput = await run_load(app, users, audio_path, timer)
+        finally:
+            for name, function in original_functions.items():
+                setattr(app, name, function)
+        report["stages"][str(users)] = timer.summary()
+        report["throughput"].append(throughput)
+
+    _, peak_bytes = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    # ru_maxrss ist unter Linux in KB, unter macOS in Bytes angegeben
+    max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    report["memory"] = {
+        "python_peak_mb": round(peak_bytes / (1024 * 1024), 1),
+        "max_rss_mb": round(max_rss / (1024 * 1024) if sys.platform == "darwin" else max_rss / 1024, 1),
+    }
+
+    print("\n================ BENCHMARK-ERGEBNIS ================")
+    for throughput in report["throughput"]:
+        users = str(throughput["users"])
+        print(f"\n{users} gleichzeitige Nutzer: {throughput['requests_per_second']} Anfragen/s "
+              f"({throughput['successful']}/{throughput['requests']} erfolgreich in {throughput['seconds']} s)")
+        print(pd.DataFrame(report["stages"][users]).T.to_string())
+    print(f"\nSpeicher: Python-Spitze {report['memory']['python_peak_mb']} MB, Max. RSS {report['memory']['max_rss_mb']} MB")
+
+    with open(BENCH_OUTPUT, "w", encoding="utf-8") as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    print(f"\n✅ Ergebnisse in '{BENCH_OUTPUT}' gespeichert.")
+
+    if BENCH_BASELINE:
+        regressions = compare_with_baseline(report, BENCH_BASELINE)
+        for regression in regressions:
+            print(f"❌ Regression: {regression}")
+        if regressions:
+            return 1
+        print(f"✅ Keine Regression gegenüber '{BENCH_BASELINE}' (Toleranz {BENCH_REGRESSION_TOLERANCE:.0%}).")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(asyncio.run(main()))
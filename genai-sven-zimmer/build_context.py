@@ -0,0 +1,269 @@
+# build_context.py
+import hashlib
+import json
+import os
+import re
+from datetime import datetime
+
+from intent_parser import CURRENT_DATE
+
+STATIC_PROMPT_FILE = "_systemprompt_sql_agent.txt"
+FALLBACK_CONTEXT_FILE = "_context_sql_agent.txt"
+GENERATED_CONTEXT_FILE = "database_context.json"
+COMPILED_PROMPT_FILE = os.getenv("COMPILED_PROMPT_FILE", "_compiled_sql_agent_prompt.json")
+# Bei Änderungen am Aufbau des Artefakts erhöhen, damit bestehende Artefakte neu erzeugt werden
+COMPILED_FORMAT_VERSION = 2
+
+MONTH_NAMES = [
+    "Januar", "Februar", "März", "April", "Mai", "Juni",
+    "Juli", "August", "September", "Oktober", "November", "Dezember",
+]
+# Tabellen-Aliase aus Abschnitt 4.3 des SQL-Prompts
+COLUMN_ALIASES = {
+    "Product_Category": "p",
+    "Product_Line": "p",
+    "Sales_Country": "dms",
+    "Global_Region": "dms",
+    "Sales_Channel": "dms",
+}
+SECTION_HEADING = re.compile(r"^#### (\d+\.\d+) .*$", re.MULTILINE)
+
+
+def _format_month(month_iso: str) -> str:
+    """
+    Formatiert einen Monat im Format 'YYYY.MM' als deutschen Monatsnamen.
+
+    :param month_iso: Der Monat, z.B. '2025.05'.
+    :return: Der Monat als Text, z.B. 'Mai 2025'.
+    """
+    year, month = month_iso.split(".")
+    return f"{MONTH_NAMES[int(month) - 1]} {year}"
+
+
+def _format_date(date_iso: str) -> str:
+    """
+    Formatiert ein Datum im Format 'YYYY-MM-DD' als deutsches Datum.
+
+    :param date_iso: Das Datum, z.B. '2020-01-04'.
+    :return: Das Datum als Text, z.B. '04. Januar 2020'.
+    """
+    parsed = datetime.strptime(date_iso, "%Y-%m-%d")
+    return f"{parsed.day:02d}. {MONTH_NAMES[parsed.month - 1]} {parsed.year}"
+
+
+def _quote(value: str) -> str:
+    """
+    Setzt einen Produktnamen in doppelte Anführungszeichen (eingebettete Anführungszeichen werden verdoppelt).
+
+    :param value: Der Produktname.
+    :return: Der zitierte Produktname.
+    """
+    return '"' + str(value).replace('"', '""') + '"'
+
+
+def load_fallback_sections(file_path: str = FALLBACK_CONTEXT_FILE) -> dict[str, str]:
+    """
+    Liest den manuell gepflegten Datenbank-Kontext und zerlegt ihn in seine Abschnitte.
+
+    :param file_path: Der Pfad zur Kontextdatei.
+    :return: Zuordnung Abschnittsnummer (z.B. '3.1') -> Abschnittstext inklusive Überschrift.
+    """
+    with open(file_path, "r", encoding="utf-8") as f:
+        content = f.read()
+    headings = list(SECTION_HEADING.finditer(content))
+    sections = {}
+    for index, heading in enumerate(headings):
+        end = headings[index + 1].start() if index + 1 < len(headings) else len(content)
+        sections[heading.group(1)] = content[heading.start():end].strip() + "\n"
+    return sections
+
+
+def render_time_frame(date_ranges: dict) -> str:
+    """
+    Erzeugt Abschnitt 3.1 (Zeitrahmen) aus den generierten Datenzeiträumen.
+
+    :param date_ranges: Die Zeiträume aus database_context.json.
+    :return: Der Abschnittstext.
+    """
+    last_month_index = CURRENT_DATE.year * 12 + CURRENT_DATE.month - 2
+    last_month = f"{MONTH_NAMES[last_month_index % 12]} {last_month_index // 12}"
+    return (
+        "#### 3.1 Zeitrahmen\n"
+        f"- **Monatsdaten:** {_format_month(date_ranges['min_month'])} bis {_format_month(date_ranges['max_month'])} (`DataSet_Monthly_Sales`)\n"
+        f"- **Tagesdaten:** {_format_date(date_ranges['min_date'])} bis {_format_date(date_ranges['max_date'])} (`Facts_Daily_Sales`)\n"
+        f"- **Aktuelles Datum für relative Anfragen:** `{CURRENT_DATE.isoformat()}`. "
+        f"\"Letztes Jahr\" ist {CURRENT_DATE.year - 1}, \"dieses Jahr\" ist {CURRENT_DATE.year}, \"letzter Monat\" ist {last_month}.\n"
+    )
+
+
+def render_dimensions(categorical_values: dict) -> str:
+    """
+    Erzeugt Abschnitt 3.2 (Gültige Dimensionen & Werte) aus den generierten Spaltenwerten.
+
+    :param categorical_values: Die Spaltenwerte je Tabelle aus database_context.json.
+    :return: Der Abschnittstext.
+    """
+    values_by_column = {}
+    for columns in categorical_values.values():
+        for column, values in columns.items():
+            values_by_column.setdefault(column, values)
+
+    section = "#### 3.2 Gültige Dimensionen & Werte\n"
+    for column, alias in COLUMN_ALIASES.items():
+        if column in values_by_column:
+            quoted_values = ", ".join(f"'{value}'" for value in values_by_column[column])
+            section += f"- **`{alias}.{column}`:** {quoted_values}\n"
+    return section
+
+
+def render_product_catalog(product_catalog: dict) -> str:
+    """
+    Erzeugt Abschnitt 3.3 (Produktkatalog) aus dem generierten Katalog.
+
+    :param product_catalog: Zuordnung Product_Category -> Material_Descriptions.
+    :return: Der Abschnittstext.
+    """
+    section = "#### 3.3 Produktkatalog\n"
+    for category, products in product_catalog.items():
+        section += f"- **{category}:** {', '.join(_quote(product) for product in products)}\n"
+    return section
+
+
+def build_context_sections() -> dict[str, str]:
+    """
+    Stellt die Abschnitte des Datenbank-Kontexts zusammen. Zeitrahmen, Dimensionen und Produktkatalog
+    stammen aus database_context.json (falls vorhanden), das Schema immer aus der gepflegten Kontextdatei.
+
+    :return: Geordnete Zuordnung Abschnittsnummer -> Abschnittstext.
+    """
+    sections = load_fallback_sections()
+    if not os.path.exists(GENERATED_CONTEXT_FILE):
+        print(f"Hinweis: '{GENERATED_CONTEXT_FILE}' nicht gefunden, verwende den gepflegten Kontext aus '{FALLBACK_CONTEXT_FILE}'.")
+        return sections
+
+    with open(GENERATED_CONTEXT_FILE, "r", encoding="utf-8") as f:
+        generated = json.load(f)
+    if generated.get("date_ranges"):
+        sections["3.1"] = render_time_frame(generated["date_ranges"])
+    if generated.get("categorical_values"):
+        sections["3.2"] = render_dimensions(generated["categorical_values"])
+    if generated.get("product_catalog"):
+        sections["3.3"] = render_product_catalog(generated["product_catalog"])
+    return dict(sorted(sections.items()))
+
+
+def load_table_columns() -> dict[str, list[str]] | None:
+    """
+    Lädt die Spalten je Tabelle aus database_context.json für die SQL-Prüfung (sql_guard.py).
+    Der gepflegte Schema-Auszug (3.4) ist unvollständig und eignet sich dafür nicht.
+
+    :return: Zuordnung Tabellenname -> Spaltennamen oder None, wenn kein generierter Kontext vorliegt.
+    """
+    if not os.path.exists(GENERATED_CONTEXT_FILE):
+        return None
+    with open(GENERATED_CONTEXT_FILE, "r", encoding="utf-8") as f:
+        return json.load(f).get("table_columns")
+
+
+def _hash_source_file(file_path: str) -> str | None:
+    """
+    Berechnet den SHA-256-Hash einer Quelldatei des Prompts.
+
+    :param file_path: Der Pfad der Datei.
+    :return: Der Hash oder None, wenn die Datei fehlt.
+    """
+    if not os.path.exists(file_path):
+        return None
+    with open(file_path, "rb") as f:
+        return hashlib.sha256(f.read()).hexdigest()
+
+
+def source_fingerprint() -> dict:
+    """
+    Beschreibt die Eingaben des kompilierten Prompts: Hashes der Quelldateien, das Bezugsdatum
+    für relative Anfragen und die Formatversion des Artefakts.
+
+    :return: Der Fingerabdruck als Dictionary.
+    """
+    return {
+        "format_version": COMPILED_FORMAT_VERSION,
+        "current_date": CURRENT_DATE.isoformat(),
+        "files": {
+            file_path: _hash_source_file(file_path)
+            for file_path in (STATIC_PROMPT_FILE, FALLBACK_CONTEXT_FILE, GENERATED_CONTEXT_FILE)
+        },
+    }
+
+
+def build_compiled_prompt() -> dict:
+    """
+    Kompiliert den System-Prompt des SQL-Agenten: statischer Teil zuerst (byte-stabil, damit das
+    Prompt-Caching des Modells greift), danach der Datenbank-Kontext.
+
+    :return: Das Artefakt mit Version, Erstellungszeitpunkt, Fingerabdruck der Quellen, statischem Präfix,
+             Kontextabschnitten, Instruktionen und den Spalten je Tabelle.
+    """
+    with open(STATIC_PROMPT_FILE, "r", encoding="utf-8") as f:
+        static_prefix = f.read().rstrip("\n") + "\n\n"
+    context_sections = build_context_sections()
+    instructions = static_prefix + "### DATABASE CONTEXT\n\n" + "\n".join(context_sections.values())
+    return {
+        "version": hashlib.sha256(instructions.encode("utf-8")).hexdigest()[:16],
+        "built_at": datetime.now().isoformat(timespec="seconds"),
+        "sources": source_fingerprint(),
+        "static_prefix": static_prefix,
+        "context_sections": context_sections,
+        "instructions": instructions,
+        "table_columns": load_table_columns(),
+    }
+
+
+def write_compiled_prompt(compiled: dict, file_path: str = COMPILED_PROMPT_FILE) -> None:
+    """
+    Schreibt das kompilierte Prompt-Artefakt atomar auf die Festplatte.
+
+    :param compiled: Das Artefakt aus build_compiled_prompt().
+    :param file_path: Der Zielpfad.
+    """
+    temp_path = f"{file_path}.tmp"
+    with open(temp_path, "w", encoding="utf-8") as f:
+        json.dump(compiled, f, ensure_ascii=False, indent=2)
+    os.replace(temp_path, file_path)
+
+
+# Bereits geladene Artefakte je Pfad (einmal je Prozess)
+_loaded_prompts: dict[str, dict] = {}
+
+
+def load_compiled_prompt(file_path: str = COMPILED_PROMPT_FILE) -> dict:
+    """
+    Lädt das kompilierte Prompt-Artefakt einmal je Prozess. Fehlt es oder passt sein Fingerabdruck
+    nicht mehr zu den Quelldateien (Prompt, Kontext, Formatversion), wird es neu erzeugt und gespeichert.
+
+    :param file_path: Der Pfad zum Artefakt.
+    :return: Das Artefakt.
+    """
+    if file_path in _loaded_prompts:
+        return _loaded_prompts[file_path]
+
+    compiled = None
+    if os.path.exists(file_path):
+        with open(file_path, "r", encoding="utf-8") as f:
+            compiled = json.load(f)
+        if compiled.get("sources") != source_fingerprint():
+            print(f"Hinweis: '{file_path}' passt nicht mehr zu Prompt, Kontext oder Format und wird neu erzeugt.")
+            compiled = None
+    else:
+        print(f"Hinweis: '{file_path}' fehlt und wird jetzt erzeugt.")
+
+    if compiled is None:
+        compiled = build_compiled_prompt()
+        write_compiled_prompt(compiled, file_path)
+    _loaded_prompts[file_path] = compiled
+    return compiled
+
+
+if __name__ == "__main__":
+    compiled_prompt = build_compiled_prompt()
+    write_compiled_prompt(compiled_prompt)
+    print(f"✅ Kompilierter SQL-Agenten-Prompt (Version {compiled_prompt['version']}) in '{COMPILED_PROMPT_FILE}' gespeichert.")
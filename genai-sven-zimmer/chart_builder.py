@@ -0,0 +1,285 @@
+# chart_builder.py
+import hashlib
+import os
+import threading
+import time
+from collections import OrderedDict
+
+import altair as alt
+import numpy as np
+import pandas as pd
+from gradio.components.plot import PlotData
+
+from answer_renderer import CURRENCY_COLUMN, DIMENSION_LABELS, LABEL_COLUMN, METRIC_LABELS, _is_total_label
+from result_encoder import get_numeric_columns
+
+CHARTS_ENABLED = os.getenv("CHARTS_ENABLED", "true").lower() in ("1", "true", "yes")
+# Höchstens so viele Punkte je Linie gehen an den Browser
+CHART_MAX_POINTS = int(os.getenv("CHART_MAX_POINTS", "2000"))
+CHART_MAX_BARS = int(os.getenv("CHART_MAX_BARS", "30"))
+CHART_MAX_SERIES = 8
+CHART_CACHE_ENTRIES = int(os.getenv("CHART_CACHE_ENTRIES", "256"))
+CHART_CACHE_TTL_SECONDS = float(os.getenv("CHART_CACHE_TTL_SECONDS", "600"))
+# Vorauswahl je LTTB-Bucket beim MinMaxLTTB-Verfahren
+MINMAX_PRESELECTION_RATIO = 4
+
+TIME_COLUMNS = {"Calendar_Month_ISO": "%Y.%m", "ID_Order_Date": None}
+BAR_COLUMNS = ["Product_Category", "Sales_Country", "Sales_Channel", "Global_Region", "Sales_Region", "Material_Description", "Calendar_Year"]
+
+
+def minmax_indices(y: np.ndarray, n_out: int) -> np.ndarray:
+    """
+    Wählt je Bucket das Minimum und das Maximum (vektorisiert). Spitzen bleiben dadurch immer erhalten.
+
+    :param y: Die Werte (aufsteigend nach x sortiert).
+    :param n_out: Die gewünschte Anzahl an Punkten (gerade, mindestens 4).
+    :return: Die aufsteigend sortierten Indizes der ausgewählten Punkte inklusive erstem und letztem Punkt.
+    """
+    n = len(y)
+    bucket_count = max(n_out // 2 - 1, 1)
+    bucket_size = int(np.ceil((n - 2) / bucket_count))
+    # Innere Punkte auf gleich große Buckets auffüllen (NaN wird von nanargmin/nanargmax ignoriert)
+    inner = np.full(bucket_count * bucket_size, np.nan)
+    inner[: n - 2] = y[1:-1]
+    buckets = inner.reshape(bucket_count, bucket_size)
+    valid = ~np.isnan(buckets).all(axis=1)
+    offsets = np.arange(bucket_count)[valid] * bucket_size + 1
+    minima = np.nanargmin(buckets[valid], axis=1) + offsets
+    maxima = np.nanargmax(buckets[valid], axis=1) + offsets
+    return np.unique(np.concatenate(([0], minima, maxima, [n - 1])))
+
+
+def lttb_indices(x: np.ndarray, y: np.ndarray, n_out: int) -> np.ndarray:
+    """
+    Largest-Triangle-Three-Buckets: wählt je Bucket den Punkt, der mit dem zuvor gewählten Punkt und dem
+    Mittelwert des nächsten Buckets das größte Dreieck bildet. Die Flächen eines Buckets werden vektorisiert berechnet.
+
+    :param x: Die x-Werte (aufsteigend, numerisch).
+    :param y: Die y-Werte.
+    :param n_out: Die gewünschte Anzahl an Punkten (mindestens 3).
+    :return: Die aufsteigend sortierten Indizes der ausgewählten Punkte.
+    """
+    n = len(x)
+    edges = np.linspace(1, n - 1, n_out - 1).astype(int)
+    # Mittelwerte aller Buckets auf einmal (reduceat über die Bucket-Grenzen)
+    sizes = np.diff(edges)
+    average_x = np.add.reduceat(x[1:-1], edges[:-1] - 1) / sizes
+    average_y = np.add.reduceat(y[1:-1], edges[:-1] - 1) / sizes
+    average_x = np.append(average_x, x[-1])
+    average_y = np.append(average_y, y[-1])
+
+    selected = np.empty(n_out, dtype=int)
+    selected[0], selected[-1] = 0, n - 1
+    previous = 0
+    for bucket in range(n_out - 2):
+        start, end = edges[bucket], edges[bucket + 1]
+        areas = np.abs(
+            (x[previous] - average_x[bucket + 1]) * (y[start:end] - y[previous])
+            - (x[previous] - x[start:end]) * (average_y[bucket + 1] - y[previous])
+        )
+        previous = start + int(np.argmax(areas))
+        selected[bucket + 1] = previous
+    return selected
+
+
+def downsample(x: np.ndarray, y: np.ndarray, n_out: int = CHART_MAX_POINTS) -> np.ndarray:
+    """
+    Reduziert eine lange Zeitreihe auf höchstens n_out Punkte (MinMaxLTTB): zuerst eine vektorisierte
+    Min-Max-Vorauswahl, danach LTTB auf den vorausgewählten Punkten.
+
+    :param x: Die x-Werte (aufsteigend, numerisch).
+    :param y: Die y-Werte.
+    :param n_out: Die maximale Anzahl an Punkten.
+    :return: Die Indizes der ausgewählten Punkte.
+    """
+    n = len(x)
+    if n <= n_out or n_out < 4:
+        return np.arange(n)
+    y = np.nan_to_num(y.astype("float64"))
+    candidates = np.arange(n)
+    if n > n_out * MINMAX_PRESELECTION_RATIO:
+        candidates = minmax_indices(y, n_out * MINMAX_PRESELECTION_RATIO)
+    if len(candidates) <= n_out:
+        return candidates
+    return candidates[lttb_indices(x[candidates].astype("float64"), y[candidates], n_out)]
+
+
+def data_fingerprint(db_result: pd.DataFrame) -> str:
+    """
+    Berechnet einen Hash über Spalten und Werte eines Ergebnisses (vektorisiert). Ändert sich der Datenstand,
+    ändert sich der Hash, auch wenn der SQL-Code gleich bleibt.
+
+    :param db_result: Das Ergebnis der Datenbankabfrage.
+    :return: Der Hash als Hex-String.
+    """
+    digest = hashlib.sha256("|".join(map(str, db_result.columns)).encode("utf-8"))
+    digest.update(pd.util.hash_pandas_object(db_result, index=False).to_numpy().tobytes())
+    return digest.hexdigest()
+
+
+class ChartCache:
+    """
+    LRU-Cache für gerenderte Diagramm-Spezifikationen (Vega-Lite-JSON) je SQL-Code, Diagrammtyp und
+    Datenstand (siehe data_fingerprint), damit nach einer Datenänderung kein veraltetes Diagramm erscheint.
+    """
+
+    def __init__(self, max_entries: int = CHART_CACHE_ENTRIES, ttl_seconds: float = CHART_CACHE_TTL_SECONDS):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.hits = 0
+        self.misses = 0
+        self._entries: OrderedDict[str, tuple[str, float]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _key(sql_query: str, chart_type: str, data_hash: str) -> str:
+        # Kommentare gehören dazu: lokal verfeinerte Nachfragen unterscheiden sich nur darin
+        return hashlib.sha256(f"{chart_type}|{data_hash}|{sql_query.strip()}".encode("utf-8")).hexdigest()
+
+    def get(self, sql_query: str, chart_type: str, data_hash: str) -> str | None:
+        """
+        Liefert die gecachte Spezifikation, sofern sie jünger als ttl_seconds ist.
+
+        :param sql_query: Der SQL-Code des Ergebnisses.
+        :param chart_type: Der Diagrammtyp ('line' oder 'bar').
+        :param data_hash: Der Hash der Ergebnisdaten (data_fingerprint).
+        :return: Die Vega-Lite-Spezifikation als JSON oder None.
+        """
+        key = self._key(sql_query, chart_type, data_hash)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or time.monotonic() - entry[1] > self.ttl_seconds:
+                self._entries.pop(key, None)
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def put(self, sql_query: str, chart_type: str, data_hash: str, spec: str) -> None:
+        """
+        Speichert eine Spezifikation und verdrängt die ältesten Einträge.
+
+        :param sql_query: Der SQL-Code des Ergebnisses.
+        :param chart_type: Der Diagrammtyp.
+        :param data_hash: Der Hash der Ergebnisdaten (data_fingerprint).
+        :param spec: Die Vega-Lite-Spezifikation als JSON.
+        """
+        with self._lock:
+            self._entries[self._key(sql_query, chart_type, data_hash)] = (spec, time.monotonic())
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def stats(self) -> dict:
+        """
+        Gibt die aktuellen Cache-Kennzahlen zurück.
+
+        :return: Ein Dictionary mit Treffern, Fehlschlägen und Einträgen.
+        """
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses, "entries": len(self._entries)}
+
+
+chart_cache = ChartCache()
+
+
+def choose_chart(db_result: pd.DataFrame) -> tuple[str, str, list[str], str | None] | None:
+    """
+    Wählt den Diagrammtyp: Linie über Monat oder Tag, Balken je Kategorie, Land o.ä.
+
+    :param db_result: Das Ergebnis der Datenbankabfrage.
+    :return: Ein Tupel (Typ, x-Spalte, Kennzahl-Spalten, Farb-Spalte) oder None, wenn kein Diagramm passt.
+    """
+    metric_columns = [column for column in get_numeric_columns(db_result) if not LABEL_COLUMN.search(str(column))]
+    if not metric_columns or len(db_result) < 2:
+        return None
+    # Umsatz zuerst, damit Balkendiagramme die wichtigste Kennzahl zeigen
+    metric_columns.sort(key=lambda column: not CURRENCY_COLUMN.search(str(column)))
+    label_columns = [column for column in db_result.columns if column not in metric_columns]
+
+    time_column = next((column for column in TIME_COLUMNS if column in label_columns), None)
+    if time_column is not None:
+        other_labels = [column for column in label_columns if column != time_column]
+        if len(other_labels) > 1:
+            return None
+        color_column = other_labels[0] if other_labels else None
+        if color_column is not None and db_result[color_column].nunique() > CHART_MAX_SERIES:
+            return None
+        return "line", time_column, metric_columns if color_column is None else metric_columns[:1], color_column
+
+    if len(label_columns) == 1 and label_columns[0] in BAR_COLUMNS and len(db_result) <= CHART_MAX_BARS + 1:
+        return "bar", label_columns[0], metric_columns[:1], None
+    return None
+
+
+def _line_data(db_result: pd.DataFrame, time_column: str, metric_columns: list[str], color_column: str | None) -> pd.DataFrame:
+    """
+    Bereitet die Daten eines Liniendiagramms vor (Datumsachse, Langformat) und reduziert jede Linie
+    auf höchstens CHART_MAX_POINTS Punkte.
+
+    :return: Die Daten im Langformat mit den Spalten x, Kennzahl, Wert und optional Serie.
+    """
+    frame = db_result.copy()
+    frame["x"] = pd.to_datetime(frame[time_column].astype(str).str.strip(), format=TIME_COLUMNS[time_column], errors="coerce")
+    frame = frame[frame["x"].notna()]
+    frame[metric_columns] = frame[metric_columns].apply(pd.to_numeric, errors="coerce")
+    id_columns = ["x"] + ([color_column] if color_column is not None else [])
+    long_frame = frame.melt(id_vars=id_columns, value_vars=metric_columns, var_name="Kennzahl", value_name="Wert")
+    long_frame["Kennzahl"] = long_frame["Kennzahl"].map(lambda column: METRIC_LABELS.get(column, column))
+
+    series = []
+    for _, line in long_frame.groupby(["Kennzahl"] + id_columns[1:], sort=False):
+        line = line.sort_values("x")
+        indices = downsample(line["x"].to_numpy().astype("int64"), line["Wert"].to_numpy(), CHART_MAX_POINTS)
+        series.append(line.iloc[indices])
+    return pd.concat(series, ignore_index=True)
+
+
+def render_chart(db_result: pd.DataFrame, chart_type: str, x_column: str, metric_columns: list[str], color_column: str | None) -> str:
+    """
+    Erzeugt die Vega-Lite-Spezifikation eines Diagramms.
+
+    :return: Die Spezifikation als JSON.
+    """
+    if chart_type == "line":
+        data = _line_data(db_result, x_column, metric_columns, color_column)
+        color_field = color_column if color_column is not None else "Kennzahl"
+        chart = alt.Chart(data).mark_line().encode(
+            x=alt.X("x:T", title=DIMENSION_LABELS.get(x_column, "Datum")),
+            y=alt.Y("Wert:Q", title=METRIC_LABELS.get(metric_columns[0], metric_columns[0]) if len(metric_columns) == 1 else "Wert"),
+            color=alt.Color(f"{color_field}:N", title=DIMENSION_LABELS.get(color_field, color_field)),
+            tooltip=["x:T", "Kennzahl:N", alt.Tooltip("Wert:Q", format=",.2f")] + ([f"{color_column}:N"] if color_column else []),
+        )
+    else:
+        metric = metric_columns[0]
+        data = db_result[~db_result[x_column].map(_is_total_label)][[x_column, metric]].copy()
+        data[metric] = pd.to_numeric(data[metric], errors="coerce")
+        data[x_column] = data[x_column].astype(str).str.strip()
+        chart = alt.Chart(data).mark_bar().encode(
+            x=alt.X(f"{x_column}:N", title=DIMENSION_LABELS.get(x_column, x_column), sort=None),
+            y=alt.Y(f"{metric}:Q", title=METRIC_LABELS.get(metric, metric)),
+            tooltip=[f"{x_column}:N", alt.Tooltip(f"{metric}:Q", format=",.2f")],
+        )
+    return chart.properties(width="container", height=320).to_json()
+
+
+def build_chart(sql_query: str, db_result: pd.DataFrame) -> PlotData | None:
+    """
+    Liefert das Diagramm zu einem Ergebnis für gr.Plot – aus dem Cache oder neu gerendert.
+
+    :param sql_query: Der SQL-Code des Ergebnisses (Cache-Schlüssel zusammen mit dem Datenstand).
+    :param db_result: Das Ergebnis der Datenbankabfrage.
+    :return: Die Diagrammdaten oder None, wenn kein Diagramm passt.
+    """
+    if not CHARTS_ENABLED or db_result.attrs.get("truncated"):
+        return None
+    chart_choice = choose_chart(db_result)
+    if chart_choice is None:
+        return None
+    chart_type = chart_choice[0]
+    data_hash = data_fingerprint(db_result)
+    spec = chart_cache.get(sql_query, chart_type, data_hash)
+    if spec is None:
+        spec = render_chart(db_result, *chart_choice)
+        chart_cache.put(sql_query, chart_type, data_hash, spec)
+    return PlotData(type="altair", plot=spec)
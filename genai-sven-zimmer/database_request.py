@@ -1,23 +1,55 @@
 # database_request.py
+import asyncio
+import contextvars
+import functools
 import os
+import re
+import threading
+import time
 import urllib.parse
+from concurrent.futures import ThreadPoolExecutor
 import pandas as pd
 from dotenv import load_dotenv
-from sqlalchemy import create_engine, text
-from sqlalchemy.engine import Engine
+from sqlalchemy import create_engine, event, text
+from sqlalchemy.engine import Connection, CursorResult, Engine
 from sqlalchemy.exc import SQLAlchemyError
 
+from local_replica import LocalReplica
+from result_cache import ResultCache, canonicalize_sql
+from scheduler import PrioritySemaphore
+from single_flight import SingleFlight
+from tracing import span
+
+try:
+    import pyarrow  # noqa: F401 - optional, ermöglicht Arrow-basierte DataFrames
+    _HAS_PYARROW = True
+except ImportError:
+    _HAS_PYARROW = False
+
 load_dotenv()
 
+# --- Konfiguration des Connection Pools (über .env anpassbar) ---
+DB_DRIVER = os.getenv("DB_DRIVER", "/opt/homebrew/lib/libmsodbcsql.17.dylib")
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "5"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+DB_POOL_TIMEOUT_SECONDS = float(os.getenv("DB_POOL_TIMEOUT_SECONDS", "30"))
+DB_POOL_RECYCLE_SECONDS = int(os.getenv("DB_POOL_RECYCLE_SECONDS", "1800"))
+DB_STATEMENT_TIMEOUT_SECONDS = int(os.getenv("DB_STATEMENT_TIMEOUT_SECONDS", "60"))
+DB_ENGINE_RETRY_SECONDS = float(os.getenv("DB_ENGINE_RETRY_SECONDS", "30"))
+
 _db_engine: Engine | None = None
+_db_engine_failed_at: float | None = None
+_db_engine_lock = threading.Lock()
 
-def _get_db_engine() -> Engine | None:
+_pool_stats_lock = threading.Lock()
+_pool_stats = {"checkouts": 0, "total_wait_seconds": 0.0, "max_wait_seconds": 0.0}
+
+def _create_db_engine() -> Engine | None:
     try:
         server = os.getenv("DB_SERVER")
         database = os.getenv("DB_NAME")
         username = os.getenv("DB_USER")
         password = os.getenv("DB_PASSWORD")
-        driver_path = "/opt/homebrew/lib/libmsodbcsql.17.dylib"
 
         if not all([server, database, username, password]):
             print("FEHLER: Eine der Umgebungsvariablen (DB_SERVER, DB_NAME, DB_USER, DB_PASSWORD) fehlt oder ist leer.")
@@ -27,10 +59,23 @@ def _get_db_engine() -> Engine | None:
         
         connection_string = (
             f"mssql+pyodbc://{username}:{encoded_password}@{server}/{database}?"
-            f"driver={driver_path}"
+            f"driver={urllib.parse.quote_plus(DB_DRIVER)}"
         )
         
-        engine = create_engine(connection_string, connect_args={'autocommit': True})
+        engine = create_engine(
+            connection_string,
+            connect_args={'autocommit': True},
+            pool_size=DB_POOL_SIZE,
+            max_overflow=DB_MAX_OVERFLOW,
+            pool_timeout=DB_POOL_TIMEOUT_SECONDS,
+            pool_recycle=DB_POOL_RECYCLE_SECONDS,
+            pool_pre_ping=True,
+        )
+
+        @event.listens_for(engine, "connect")
+        def _set_statement_timeout(dbapi_connection, connection_record):
+            # pyodbc-Query-Timeout: Der Server bricht Anweisungen nach Ablauf ab
+            dbapi_connection.timeout = DB_STATEMENT_TIMEOUT_SECONDS
         
         with engine.connect() as connection:
             connection.execute(text("SELECT 1"))
@@ -39,46 +84,400 @@ def _get_db_engine() -> Engine | None:
         
     except Exception as e:
         print(f"\n❌ FEHLER BEI DB-VERBINDUNG (in database_request.py): {e}")
-        print("Überprüfen Sie Zugangsdaten in .env und den Treiberpfad.")
+        print("Überprüfen Sie Zugangsdaten in .env und den Treiberpfad (DB_DRIVER).")
         return None
 
-_db_engine = _get_db_engine()
+def get_db_engine() -> Engine | None:
+    """
+    Liefert die Datenbank-Engine und erstellt sie beim ersten Aufruf (lazy).
+    Nach einem fehlgeschlagenen Verbindungsaufbau wird frühestens nach DB_ENGINE_RETRY_SECONDS erneut versucht.
+
+    :return: Die SQLAlchemy-Engine oder None, wenn keine Verbindung möglich ist.
+    """
+    global _db_engine, _db_engine_failed_at
+    if _db_engine is not None:
+        return _db_engine
+
+    with _db_engine_lock:
+        if _db_engine is not None:
+            return _db_engine
+        if _db_engine_failed_at is not None and time.monotonic() - _db_engine_failed_at < DB_ENGINE_RETRY_SECONDS:
+            return None
+
+        _db_engine = _create_db_engine()
+        _db_engine_failed_at = None if _db_engine is not None else time.monotonic()
+        return _db_engine
+
+def start_engine_warmup() -> threading.Thread:
+    """
+    Baut die Datenbankverbindung im Hintergrund auf, damit der Start der App nicht auf das Netzwerk wartet.
 
-def DatabaseRequest(sql_query: str) -> pd.DataFrame | str:
-    print(f"\n--- DatabaseRequest Funktion aufgerufen ---")
-    print(f"Empfangener SQL-Code zur Ausführung:\n{sql_query}")
+    :return: Der gestartete Hintergrund-Thread.
+    """
+    warmup_thread = threading.Thread(target=get_db_engine, name="db-warmup", daemon=True)
+    warmup_thread.start()
+    return warmup_thread
+
+def _connect(engine: Engine) -> Connection:
+    """
+    Holt eine Verbindung aus dem Pool und misst die Wartezeit beim Checkout.
+
+    :param engine: Die Datenbank-Engine.
+    :return: Eine geöffnete Verbindung.
+    """
+    started_at = time.perf_counter()
+    connection = engine.connect()
+    wait_seconds = time.perf_counter() - started_at
+
+    with _pool_stats_lock:
+        _pool_stats["checkouts"] += 1
+        _pool_stats["total_wait_seconds"] += wait_seconds
+        _pool_stats["max_wait_seconds"] = max(_pool_stats["max_wait_seconds"], wait_seconds)
+    return connection
+
+def get_pool_stats() -> dict:
+    """
+    Gibt Kennzahlen zur Pool-Auslastung und zu den Checkout-Wartezeiten zurück.
+
+    :return: Ein Dictionary mit Pool-Größe, belegten Verbindungen, Overflow und Wartezeiten.
+    """
+    with _pool_stats_lock:
+        stats = dict(_pool_stats)
+    stats["avg_wait_seconds"] = stats["total_wait_seconds"] / stats["checkouts"] if stats["checkouts"] else 0.0
 
     if _db_engine is None:
-        error_msg = "FEHLER: Abfrage konnte aufgrund fehlender Datenbankverbindung nicht ausgeführt werden."
-        print(error_msg)
-        return error_msg
+        stats["engine_ready"] = False
+        return stats
 
-    if not sql_query.strip().upper().startswith("SELECT"):
-        error_msg = "FEHLER: Nur SELECT-Abfragen sind erlaubt. Abfrage blockiert."
-        print(error_msg)
-        return error_msg
+    pool = _db_engine.pool
+    stats["engine_ready"] = True
+    stats["pool_status"] = pool.status()
+    # Nur QueuePool bietet alle Kennzahlen als Methoden an
+    for attribute in ("size", "checkedout", "checkedin", "overflow"):
+        value = getattr(pool, attribute, None)
+        if callable(value):
+            stats[attribute] = value()
+    return stats
+
+WATERMARK_QUERY = """
+SELECT
+    (SELECT MAX(ID_Order_Date) FROM dbo.Facts_Daily_Sales) AS Max_Order_Date,
+    (SELECT MAX(Calendar_Month_ISO) FROM dbo.DataSet_Monthly_Sales) AS Max_Month_ISO;
+"""
+
+def _read_data_watermark() -> tuple | None:
+    """
+    Liest das Daten-Wasserzeichen (jüngstes Bestelldatum und jüngster Monat) aus der Datenbank.
+
+    :return: Ein Tupel (MAX(ID_Order_Date), MAX(Calendar_Month_ISO)) oder None ohne Datenbankverbindung.
+    """
+    engine = get_db_engine()
+    if engine is None:
+        return None
+    with _connect(engine) as connection:
+        row = connection.execute(text(WATERMARK_QUERY)).one()
+    return (str(row[0]), str(row[1]))
+
+_result_cache = ResultCache(_read_data_watermark)
+
+def get_result_cache_stats() -> dict:
+    """
+    Gibt die Kennzahlen des Ergebnis-Caches zurück.
+
+    :return: Ein Dictionary mit Treffern, Fehlschlägen, Einträgen und belegten Bytes.
+    """
+    return _result_cache.stats()
+
+# --- Gestreamtes Laden der Ergebnisse ---
+DB_FETCH_CHUNK_ROWS = int(os.getenv("DB_FETCH_CHUNK_ROWS", "5000"))
+DB_MAX_RESULT_ROWS = int(os.getenv("DB_MAX_RESULT_ROWS", "200000"))
+DB_MAX_RESULT_BYTES = int(os.getenv("DB_MAX_RESULT_BYTES", str(256 * 1024 * 1024)))
+
+def _fetch_dataframe(result: CursorResult, max_rows: int, max_bytes: int) -> pd.DataFrame:
+    """
+    Lädt ein Abfrageergebnis blockweise (fetchmany) und baut daraus spaltenbasierte DataFrames.
+    Sobald die Zeilen- oder Byte-Grenze erreicht ist, wird der Abruf abgebrochen.
+
+    :param result: Das Ergebnis von connection.execute().
+    :param max_rows: Maximale Anzahl an Zeilen.
+    :param max_bytes: Maximaler Speicherbedarf des DataFrames in Bytes.
+    :return: Ein DataFrame; df.attrs["truncated"] zeigt an, ob das Ergebnis gekürzt wurde.
+    """
+    columns = list(result.keys())
+    chunks: list[pd.DataFrame] = []
+    row_count = 0
+    byte_count = 0
+    truncation_reason = None
+
+    while True:
+        rows = result.fetchmany(min(DB_FETCH_CHUNK_ROWS, max_rows - row_count + 1))
+        if not rows:
+            break
+
+        if row_count + len(rows) > max_rows:
+            rows = rows[:max_rows - row_count]
+            truncation_reason = f"Zeilenlimit von {max_rows} erreicht"
+
+        chunk = pd.DataFrame.from_records(rows, columns=columns)
+        if _HAS_PYARROW:
+            chunk = chunk.convert_dtypes(dtype_backend="pyarrow")
+        chunks.append(chunk)
+        row_count += len(chunk)
+        byte_count += int(chunk.memory_usage(index=False, deep=True).sum())
+
+        if truncation_reason is None and byte_count > max_bytes:
+            truncation_reason = f"Speicherlimit von {max_bytes // (1024 * 1024)} MB erreicht"
+        if truncation_reason is not None:
+            # Restliche Zeilen werden nicht mehr vom Server abgeholt
+            result.close()
+            break
+
+    if chunks:
+        df = pd.concat(chunks, ignore_index=True) if len(chunks) > 1 else chunks[0]
+    else:
+        df = pd.DataFrame(columns=columns)
+
+    df.attrs["truncated"] = truncation_reason is not None
+    df.attrs["truncation_reason"] = truncation_reason
+    if truncation_reason is not None:
+        print(f"WARNUNG: Ergebnis nach {row_count} Zeilen gekürzt ({truncation_reason}).")
+    return df
+
+def _frame_bytes(df: pd.DataFrame) -> int:
+    """
+    Ermittelt den Speicherbedarf eines Ergebnisses für die Metriken.
+
+    :param df: Das Abfrageergebnis.
+    :return: Der Speicherbedarf in Bytes.
+    """
+    return int(df.memory_usage(index=False, deep=True).sum())
+
+# --- Optionales lokales Replikat (DataSet_Monthly_Sales + Dim_*) ---
+LOCAL_REPLICA_ENABLED = os.getenv("LOCAL_REPLICA_ENABLED", "false").lower() in ("1", "true", "yes")
+LOCAL_REPLICA_REFRESH_SECONDS = float(os.getenv("LOCAL_REPLICA_REFRESH_SECONDS", "3600"))
+
+_local_replica: LocalReplica | None = LocalReplica() if LOCAL_REPLICA_ENABLED else None
+
+def refresh_local_replica() -> bool:
+    """
+    Aktualisiert das lokale Replikat inkrementell aus der MSSQL-Datenbank.
 
+    :return: True bei erfolgreicher Aktualisierung, sonst False.
+    """
+    engine = get_db_engine()
+    if _local_replica is None or engine is None:
+        return False
     try:
-        with _db_engine.connect() as connection:
-            result = connection.execute(text(sql_query))
-            
-            if result.returns_rows:
-                df = pd.DataFrame(result.fetchall(), columns=result.keys())
-                print(f"\n--- Datenbankabfrage erfolgreich, DataFrame erstellt ---")
-                print(df)
-                return df
-            else:
-                success_msg = "Abfrage erfolgreich, aber keine Zeilen zurückgegeben."
-                print(success_msg)
-                return success_msg
-
-    except SQLAlchemyError as e:
-        error_msg = f"FEHLER: Datenbankfehler bei der SQL-Ausführung." # Konsolidierte Fehlermeldung
-        print(f"Detaillierter DB-Fehler (nur für Debugging): {str(e)}") # Detailliertes internes Logging
-        return error_msg
+        watermark = _read_data_watermark()
+        _local_replica.refresh(engine, watermark[0] if watermark else "")
+        return True
+    except Exception as e:
+        print(f"Replikat konnte nicht aktualisiert werden: {e}")
+        return False
+
+def start_replica_refresh() -> threading.Thread | None:
+    """
+    Startet einen Hintergrund-Thread, der das Replikat alle LOCAL_REPLICA_REFRESH_SECONDS Sekunden aktualisiert.
+
+    :return: Der gestartete Thread oder None, wenn das Replikat deaktiviert ist.
+    """
+    if _local_replica is None:
+        return None
+
+    def _refresh_loop() -> None:
+        while True:
+            refresh_local_replica()
+            time.sleep(LOCAL_REPLICA_REFRESH_SECONDS)
+
+    refresh_thread = threading.Thread(target=_refresh_loop, name="replica-refresh", daemon=True)
+    refresh_thread.start()
+    return refresh_thread
+
+def _query_local_replica(sql_query: str) -> pd.DataFrame | None:
+    """
+    Beantwortet eine Abfrage aus dem Replikat, wenn alle verwendeten Tabellen gespiegelt sind.
+
+    :param sql_query: Der auszuführende SQL-Code.
+    :return: Das Ergebnis als DataFrame oder None, wenn die Abfrage an den Server gehen muss.
+    """
+    if _local_replica is None or not _local_replica.can_serve(sql_query):
+        return None
+    try:
+        df = _local_replica.query(sql_query)
     except Exception as e:
-        error_msg = f"FEHLER: Ein unerwartetes Problem bei der SQL-Ausführung ist aufgetreten." # Konsolidierte Fehlermeldung
-        print(f"Detaillierter unerwarteter Fehler (nur für Debugging): {str(e)}") # Detailliertes internes Logging
+        print(f"Replikat konnte die Abfrage nicht ausführen, weiter mit MSSQL: {e}")
+        return None
+    df.attrs["truncated"] = False
+    df.attrs["truncation_reason"] = None
+    return df
+
+# --- Optionale Kostenprüfung über den geschätzten Ausführungsplan (nur MSSQL) ---
+# 0 = aus; sonst werden Abfragen mit höheren geschätzten Plankosten (StatementSubTreeCost) abgelehnt
+DB_MAX_PLAN_COST = float(os.getenv("DB_MAX_PLAN_COST", "0"))
+PLAN_COST = re.compile(r'StatementSubTreeCost="([0-9.Ee+-]+)"')
+
+def _estimate_plan_cost(engine: Engine, sql_query: str) -> float | None:
+    """
+    Ermittelt die geschätzten Kosten einer Abfrage über SHOWPLAN_XML, ohne sie auszuführen.
+
+    :param engine: Die Datenbank-Engine (MSSQL).
+    :param sql_query: Der zu prüfende SQL-Code.
+    :return: Die höchsten geschätzten Kosten im Plan oder None, wenn kein Plan ermittelt werden konnte.
+    """
+    with _connect(engine) as connection:
+        try:
+            connection.exec_driver_sql("SET SHOWPLAN_XML ON")
+            try:
+                plan_xml = "".join(str(row[0]) for row in connection.exec_driver_sql(sql_query).fetchall())
+            finally:
+                connection.exec_driver_sql("SET SHOWPLAN_XML OFF")
+        except SQLAlchemyError as e:
+            # Verbindung nicht mit eingeschaltetem SHOWPLAN in den Pool zurückgeben
+            connection.invalidate()
+            print(f"Ausführungsplan konnte nicht ermittelt werden: {e}")
+            return None
+    costs = [float(cost) for cost in PLAN_COST.findall(plan_xml)]
+    return max(costs) if costs else None
+
+def DatabaseRequest(
+    sql_query: str,
+    max_rows: int = DB_MAX_RESULT_ROWS,
+    max_bytes: int = DB_MAX_RESULT_BYTES,
+) -> pd.DataFrame | str:
+    with span("db_execution", sql_chars=len(sql_query)) as db_span:
+        if not sql_query.strip().upper().startswith("SELECT"):
+            error_msg = "FEHLER: Nur SELECT-Abfragen sind erlaubt. Abfrage blockiert."
+            print(error_msg)
+            db_span.status = "error"
+            return error_msg
+
+        replica_df = _query_local_replica(sql_query)
+        if replica_df is not None:
+            db_span.set(source="replica", rows=len(replica_df), payload_bytes=_frame_bytes(replica_df))
+            return replica_df
+
+        engine = get_db_engine()
+        if engine is None:
+            error_msg = "FEHLER: Abfrage konnte aufgrund fehlender Datenbankverbindung nicht ausgeführt werden."
+            print(error_msg)
+            db_span.status = "error"
+            return error_msg
+
+        cached_df = _result_cache.get(sql_query)
+        if cached_df is not None:
+            db_span.set(source="result_cache", rows=len(cached_df), payload_bytes=_frame_bytes(cached_df))
+            return cached_df
+        # Generation vor der Ausführung merken, damit ein zwischenzeitlich invalidiertes Ergebnis nicht gespeichert wird
+        cache_generation = _result_cache.generation
+
+        try:
+            if DB_MAX_PLAN_COST > 0 and engine.dialect.name == "mssql":
+                plan_cost = _estimate_plan_cost(engine, sql_query)
+                if plan_cost is not None:
+                    db_span.set(plan_cost=round(plan_cost, 2))
+                    if plan_cost > DB_MAX_PLAN_COST:
+                        error_msg = (
+                            f"FEHLER: Die Abfrage ist zu aufwendig (geschätzte Kosten {plan_cost:.0f}, erlaubt {DB_MAX_PLAN_COST:.0f}). "
+                            "Bitte schränken Sie Zeitraum oder Umfang der Frage ein."
+                        )
+                        print(error_msg)
+                        db_span.status = "rejected"
+                        return error_msg
+
+            with _connect(engine) as connection:
+                result = connection.execution_options(stream_results=True).execute(text(sql_query))
+
+                if result.returns_rows:
+                    df = _fetch_dataframe(result, max_rows, max_bytes)
+                    db_span.set(source="server", rows=len(df), payload_bytes=_frame_bytes(df), truncated=df.attrs["truncated"])
+                    _result_cache.put(sql_query, df, cache_generation)
+                    return df
+                else:
+                    success_msg = "Abfrage erfolgreich, aber keine Zeilen zurückgegeben."
+                    db_span.set(source="server", rows=0)
+                    return success_msg
+
+        except SQLAlchemyError as e:
+            error_msg = f"FEHLER: Datenbankfehler bei der SQL-Ausführung." # Konsolidierte Fehlermeldung
+            print(f"Detaillierter DB-Fehler (nur für Debugging): {str(e)}") # Detailliertes internes Logging
+            db_span.status = "error"
+            return error_msg
+        except Exception as e:
+            error_msg = f"FEHLER: Ein unerwartetes Problem bei der SQL-Ausführung ist aufgetreten." # Konsolidierte Fehlermeldung
+            print(f"Detaillierter unerwarteter Fehler (nur für Debugging): {str(e)}") # Detailliertes internes Logging
+            db_span.status = "error"
+            return error_msg
+
+# --- Asynchroner Ausführungspfad ---
+DB_MAX_CONCURRENCY = int(os.getenv("DB_MAX_CONCURRENCY", "4"))
+DB_QUERY_TIMEOUT_SECONDS = float(os.getenv("DB_QUERY_TIMEOUT_SECONDS", "60"))
+
+_db_executor = ThreadPoolExecutor(max_workers=DB_MAX_CONCURRENCY, thread_name_prefix="db-worker")
+# Wartende Abfragen werden nach Priorität der Anfrage bedient (Datenbank-Abfrage vor Statistischer Analyse)
+db_limiter = PrioritySemaphore("db", DB_MAX_CONCURRENCY)
+
+_db_flight = SingleFlight("db_execution")
+
+async def _run_database_request(sql_query: str, timeout_seconds: float) -> pd.DataFrame | str:
+    """
+    Führt DatabaseRequest in einem begrenzten Worker-Pool aus, ohne die Event-Loop zu blockieren.
+
+    :param sql_query: Der auszuführende SQL-Code.
+    :param timeout_seconds: Maximale Wartezeit auf das Ergebnis.
+    :return: Ein DataFrame mit dem Ergebnis oder eine Fehlermeldung als String.
+    """
+    loop = asyncio.get_running_loop()
+
+    await db_limiter.acquire()
+    try:
+        # Kontext (Trace-ID) an den Worker-Thread weitergeben
+        future = loop.run_in_executor(_db_executor, functools.partial(contextvars.copy_context().run, DatabaseRequest, sql_query))
+    except BaseException:
+        db_limiter.release()
+        raise
+    # Der Platz wird erst frei, wenn der Worker-Thread wirklich fertig ist – auch nach einem Timeout
+    # des Aufrufers. Die laufende Abfrage beendet dann das Statement-Timeout des Treibers.
+    future.add_done_callback(_release_db_slot)
+
+    try:
+        # shield: ein Timeout oder Abbruch des Aufrufers darf den Future nicht vorzeitig abschließen
+        return await asyncio.wait_for(asyncio.shield(future), timeout=timeout_seconds)
+    except asyncio.TimeoutError:
+        error_msg = f"FEHLER: Die Datenbankabfrage hat das Zeitlimit von {timeout_seconds:.0f} Sekunden überschritten."
+        print(error_msg)
         return error_msg
-    finally:
-        print(f"\n--- DatabaseRequest: Abfrage abgeschlossen ---")
\ No newline at end of file
+
+def _release_db_slot(future: asyncio.Future) -> None:
+    """
+    Gibt den Platz im db_limiter frei, sobald der Worker-Thread einer Abfrage fertig ist.
+
+    :param future: Der abgeschlossene Future des Worker-Threads.
+    """
+    db_limiter.release()
+    if not future.cancelled() and future.exception() is not None:
+        print(f"Datenbank-Worker mit Fehler beendet: {future.exception()}")
+
+async def async_database_request(sql_query: str, timeout_seconds: float | None = None) -> pd.DataFrame | str:
+    """
+    Führt eine Abfrage asynchron aus. Gleichzeitige Aufrufe mit demselben (kanonischen) SQL-Code
+    teilen sich eine einzige Ausführung.
+
+    :param sql_query: Der auszuführende SQL-Code.
+    :param timeout_seconds: Maximale Wartezeit auf das Ergebnis (Standard: DB_QUERY_TIMEOUT_SECONDS).
+    :return: Ein DataFrame mit dem Ergebnis oder eine Fehlermeldung als String.
+    """
+    timeout_seconds = timeout_seconds or DB_QUERY_TIMEOUT_SECONDS
+    result = await _db_flight.run(
+        canonicalize_sql(sql_query),
+        lambda: _run_database_request(sql_query, timeout_seconds),
+    )
+    # Jeder Aufrufer erhält eine eigene (flache) Kopie des gemeinsamen Ergebnisses
+    return result.copy(deep=False) if isinstance(result, pd.DataFrame) else result
+
+def get_db_flight_stats() -> dict:
+    """
+    Gibt die Kennzahlen der Bündelung identischer Datenbankabfragen zurück.
+
+    :return: Ein Dictionary mit Ausführungen, gebündelten Aufrufern und laufenden Abfragen.
+    """
+    return _db_flight.stats()
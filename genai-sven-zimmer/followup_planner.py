@@ -0,0 +1,245 @@
+# followup_planner.py
+import os
+import re
+
+import pandas as pd
+
+from answer_renderer import CURRENCY_COLUMN, LABEL_COLUMN, QUANTITY_COLUMN, _is_total_label
+from intent_parser import (
+    CATEGORY_SYNONYMS,
+    CHANNEL_SYNONYMS,
+    COUNTRY_SYNONYMS,
+    CURRENT_DATE,
+    GROUP_SYNONYMS,
+    METRIC_SYNONYMS,
+    RELATIVE_YEARS,
+    STOPWORDS,
+    _find_phrases,
+)
+from result_encoder import get_numeric_columns
+from session_state import StoredResult
+
+FOLLOWUP_ENABLED = os.getenv("FOLLOWUP_ENABLED", "true").lower() in ("1", "true", "yes")
+
+# Nachfragen beginnen typischerweise mit "und ...", "nur ...", "sortiere ..." und beziehen sich auf das letzte Ergebnis
+FOLLOWUP_START = re.compile(
+    r"^(und|nur|davon|ohne|aber|dann|jetzt|sortier\w*|ordne\w*|zeig\w* (mir )?nur|top|die top|die \d+|and|only|sort\w*)(?![\wäöüß])"
+)
+SORT_WORDS = re.compile(r"sortier\w*|ordne\w*|rangfolge|ranking|sort\w*|order")
+ASCENDING_WORDS = re.compile(r"aufsteigend|niedrigst\w*|kleinst\w*|wenigst\w*|schwächst\w*|ascending|lowest")
+DESCENDING_WORDS = re.compile(r"absteigend|höchst\w*|größt\w*|meist\w*|stärkst\w*|best\w*|descending|highest")
+TOP_N = re.compile(r"(?:top|ersten|die) *(\d{1,3})(?!\d)")
+GROUP_WORDS = re.compile(r"(?<![\wäöüß])(?:pro|je|nach|per|by) +([\wäöüß]+)")
+# Kennzahlen, die sich nicht durch Summieren neu gruppieren lassen
+NON_ADDITIVE_COLUMN = re.compile(r"avg|durchschnitt|mittel|anteil|share|quote|rate|prozent|percent", re.IGNORECASE)
+
+# Wörter einer Nachfrage, die keine neuen Daten verlangen
+FOLLOWUP_WORDS = {
+    "nur", "davon", "aber", "dann", "jetzt", "noch", "mal", "bitte", "sortiere", "sortieren", "sortiert", "ordne",
+    "ordnen", "auf", "absteigend", "aufsteigend", "top", "ersten", "only", "sort", "sorted", "order", "descending",
+    "ascending", "gruppiere", "gruppiert", "zusammengefasst", "zusammenfassen", "rangfolge", "ranking", "zeig",
+}
+FILTER_COLUMNS = {"countries": "Sales_Country", "categories": "Product_Category", "channels": "Sales_Channel"}
+LOCAL_SQL_HEADER = "-- Nachfrage lokal aus dem vorherigen Ergebnis beantwortet (keine neue Datenbankabfrage)"
+
+
+class FollowupPlan:
+    """
+    Eine Nachfrage zum letzten Ergebnis der Sitzung: entweder lokal als Filter, Gruppierung, Sortierung
+    und Begrenzung auf dem gespeicherten DataFrame ausführbar (local=True) oder nur per neuer SQL-Abfrage.
+    """
+
+    def __init__(self, question: str, previous: StoredResult):
+        # Vollständige Frage mit Bezug zur vorherigen Frage (für Antwort, SQL-Generierung und Sitzungsspeicher)
+        self.question = question
+        self.previous = previous
+        self.local = False
+        self.filters: dict[str, list[str]] = {}
+        self.year: int | None = None
+        self.group_column: str | None = None
+        self.sort_column: str | None = None
+        self.ascending = False
+        self.limit: int | None = None
+
+    def describe(self) -> str:
+        """
+        Beschreibt die lokalen Schritte als SQL-Kommentar für die Anzeige über dem ursprünglichen SQL-Code.
+
+        :return: Die Beschreibung als Kommentarzeilen.
+        """
+        steps = [f"Filter: {column} IN ({', '.join(values)})" for column, values in self.filters.items()]
+        if self.year is not None:
+            steps.append(f"Filter: Jahr {self.year}")
+        if self.group_column is not None:
+            steps.append(f"Gruppierung: {self.group_column}")
+        if self.sort_column is not None:
+            steps.append(f"Sortierung: {self.sort_column} {'aufsteigend' if self.ascending else 'absteigend'}")
+        if self.limit is not None:
+            steps.append(f"Begrenzung: erste {self.limit} Zeilen")
+        # Bei mehreren Nachfragen nacheinander bleiben die früheren lokalen Schritte erhalten
+        sql_lines = self.previous.sql.splitlines()
+        previous_steps = []
+        if sql_lines and sql_lines[0] == LOCAL_SQL_HEADER:
+            sql_lines = sql_lines[1:]
+            while sql_lines and sql_lines[0].startswith("-- "):
+                previous_steps.append(sql_lines.pop(0))
+        lines = [LOCAL_SQL_HEADER, *previous_steps, *(f"-- {step}" for step in steps), *sql_lines]
+        return "\n".join(lines)
+
+    def apply(self) -> pd.DataFrame:
+        """
+        Wendet Filter, Gruppierung, Sortierung und Begrenzung auf das gespeicherte Ergebnis an.
+        ROLLUP-Gesamtzeilen werden entfernt und bei Filter oder Gruppierung neu berechnet.
+
+        :return: Das verfeinerte Ergebnis.
+        """
+        frame = self.previous.frame
+        metric_columns = _metric_columns(frame)
+        label_columns = [column for column in frame.columns if column not in metric_columns]
+        result = frame.copy()
+        result[metric_columns] = result[metric_columns].apply(pd.to_numeric, errors="coerce")
+
+        has_total = bool(label_columns) and len(result) > 1 and result[label_columns[0]].map(_is_total_label).any()
+        if has_total:
+            result = result[~result[label_columns[0]].map(_is_total_label)]
+
+        for column, values in self.filters.items():
+            result = result[result[column].astype(str).str.strip().isin(values)]
+        if self.year is not None:
+            year_column = "Calendar_Year" if "Calendar_Year" in result.columns else "Calendar_Month_ISO"
+            result = result[result[year_column].astype(str).str.startswith(str(self.year))]
+        if self.group_column is not None:
+            result = result.groupby(self.group_column, as_index=False, sort=True)[metric_columns].sum()
+            label_columns = [self.group_column]
+        if self.sort_column is not None:
+            result = result.sort_values(self.sort_column, ascending=self.ascending, kind="stable")
+        if self.limit is not None:
+            result = result.head(self.limit)
+
+        # Gesamtzeile nur bei einer Beschriftungsspalte und summierbaren Kennzahlen neu bilden
+        if has_total and self.limit is None and len(label_columns) == 1 and len(result) > 1 and not any(
+            NON_ADDITIVE_COLUMN.search(str(column)) for column in metric_columns
+        ):
+            total_row = {label_columns[0]: "Gesamt", **result[metric_columns].sum().to_dict()}
+            result = pd.concat([result, pd.DataFrame([total_row])], ignore_index=True)
+        return result.reset_index(drop=True)
+
+
+def _metric_columns(frame: pd.DataFrame) -> list[str]:
+    """
+    Ermittelt die Kennzahl-Spalten eines Ergebnisses (numerisch und keine Beschriftung wie Jahr oder Monat).
+
+    :param frame: Das Ergebnis.
+    :return: Die Namen der Kennzahl-Spalten.
+    """
+    return [column for column in get_numeric_columns(frame) if not LABEL_COLUMN.search(str(column))]
+
+
+def _find_metric_column(metric: str, metric_columns: list[str]) -> str | None:
+    """
+    Sucht die Spalte zu einer genannten Kennzahl (Umsatz oder Menge).
+
+    :param metric: 'revenue' oder 'amount' (siehe intent_parser.METRIC_SYNONYMS).
+    :param metric_columns: Die Kennzahl-Spalten des Ergebnisses.
+    :return: Der Spaltenname oder None.
+    """
+    pattern = CURRENCY_COLUMN if metric == "revenue" else QUANTITY_COLUMN
+    return next((column for column in metric_columns if pattern.search(str(column))), None)
+
+
+def is_followup(question: str) -> bool:
+    """
+    Erkennt, ob sich eine Frage auf das vorherige Ergebnis bezieht (z.B. "und nur für Mountain Bikes?").
+
+    :param question: Die Benutzerfrage.
+    :return: True bei einer Nachfrage.
+    """
+    return bool(FOLLOWUP_START.match(question.lower().strip()))
+
+
+def plan_followup(question: str, previous: StoredResult | None) -> FollowupPlan | None:
+    """
+    Plant eine Nachfrage: lokal auf dem letzten Ergebnis, wenn alle benötigten Spalten und Werte vorhanden
+    sind und die Frage nur aus bekannten Filtern, Gruppierungen, Sortierungen und Begrenzungen besteht;
+    sonst per SQL mit der um die vorherige Frage ergänzten Frage.
+
+    :param question: Die Benutzerfrage.
+    :param previous: Das letzte Ergebnis der Sitzung.
+    :return: Der Plan oder None, wenn die Frage keine Nachfrage ist.
+    """
+    if not FOLLOWUP_ENABLED or previous is None or not is_followup(question):
+        return None
+    plan = FollowupPlan(f"{previous.question} – Nachfrage: {question.strip()}", previous)
+    frame = previous.frame
+    if frame.empty or frame.attrs.get("truncated"):
+        return plan
+    metric_columns = _metric_columns(frame)
+    if not metric_columns:
+        return plan
+
+    text = re.sub(r"\s+", " ", question.lower().strip().replace("-", " ").replace("?", " ").replace(",", " "))
+
+    # Filter: die Werte müssen im gespeicherten Ergebnis vorkommen, sonst fehlen die Daten
+    for key, synonyms in (("countries", COUNTRY_SYNONYMS), ("categories", CATEGORY_SYNONYMS), ("channels", CHANNEL_SYNONYMS)):
+        values, text = _find_phrases(text, synonyms)
+        if not values:
+            continue
+        column = FILTER_COLUMNS[key]
+        if column not in frame.columns or not set(values) <= set(frame[column].astype(str).str.strip()):
+            return plan
+        plan.filters[column] = values
+    relative_years, text = _find_phrases(text, RELATIVE_YEARS)
+    years = sorted(set(re.findall(r"\b(20\d{2})\b", text))) + [str(CURRENT_DATE.year + offset) for offset in relative_years]
+    text = re.sub(r"\b20\d{2}\b", " ", text)
+    if years:
+        year_column = next((column for column in ("Calendar_Year", "Calendar_Month_ISO") if column in frame.columns), None)
+        if len(set(years)) > 1 or year_column is None or not frame[year_column].astype(str).str.startswith(years[0]).any():
+            return plan
+        plan.year = int(years[0])
+
+    # Begrenzung und Sortierung
+    top_match = TOP_N.search(text)
+    if top_match:
+        plan.limit = int(top_match.group(1))
+        text = text.replace(top_match.group(0), " ")
+    metrics, text = _find_phrases(text, METRIC_SYNONYMS)
+    metric_column = None
+    for metric in metrics:
+        metric_column = _find_metric_column(metric, metric_columns)
+        if metric_column is None:
+            return plan
+    sort_requested = SORT_WORDS.search(text) or ASCENDING_WORDS.search(text) or DESCENDING_WORDS.search(text)
+
+    # Gruppierung ("pro Land") bzw. Sortierung nach einer Dimension ("sortiere nach Land")
+    dimension_column = None
+    for match in GROUP_WORDS.finditer(text):
+        column = GROUP_SYNONYMS.get(match.group(1))
+        if column is None:
+            continue
+        dimension_column = column.split(".")[1]
+        if dimension_column not in frame.columns:
+            return plan
+        text = text.replace(match.group(0), " ")
+
+    if sort_requested or plan.limit is not None:
+        plan.ascending = bool(ASCENDING_WORDS.search(text))
+        if dimension_column is not None and metric_column is None:
+            plan.sort_column = dimension_column
+            plan.ascending = not DESCENDING_WORDS.search(text)
+        else:
+            plan.sort_column = metric_column or _find_metric_column("revenue", metric_columns) or metric_columns[0]
+    elif dimension_column is not None:
+        label_columns = [column for column in frame.columns if column not in metric_columns]
+        if len(label_columns) < 2 or any(NON_ADDITIVE_COLUMN.search(str(column)) for column in metric_columns):
+            return plan
+        plan.group_column = dimension_column
+    text = ASCENDING_WORDS.sub(" ", DESCENDING_WORDS.sub(" ", SORT_WORDS.sub(" ", text)))
+
+    # Unbekannte Begriffe (z.B. "über 1000", "Marge") lassen sich nicht lokal beantworten
+    remaining_words = [word for word in re.findall(r"[\wäöüß]+", text) if word not in STOPWORDS and word not in FOLLOWUP_WORDS]
+    if remaining_words:
+        return plan
+    if not (plan.filters or plan.year is not None or plan.group_column or plan.sort_column or plan.limit):
+        return plan
+    plan.local = True
+    return plan
@@ -75,10 +75,14 @@
 #         print(f"\n✅ Das Schema wurde auch in der Datei '{file_name}' gespeichert.")
 
 # generate_full_context.py
+import hashlib
+import json
 import os
+import time
 import urllib.parse
+from concurrent.futures import ThreadPoolExecutor
 from dotenv import load_dotenv
-from sqlalchemy import create_engine, inspect, text
+from sqlalchemy import create_engine, text
 from sqlalchemy.engine import Engine
 import pandas as pd
 
@@ -116,118 +120,255 @@ def get_db_engine() -> Engine:
         print(f"\n❌ Fehler bei der Datenbankverbindung: {e}")
         exit()
 
-def generate_schema_script(engine: Engine, schema_name: str = 'dbo') -> str:
-    """Generiert CREATE TABLE-Anweisungen aus den Metadaten der Datenbank."""
+COLUMN_METADATA_QUERY = """
+SELECT
+    TABLE_NAME, COLUMN_NAME, DATA_TYPE, CHARACTER_MAXIMUM_LENGTH, NUMERIC_PRECISION, NUMERIC_SCALE
+FROM
+    INFORMATION_SCHEMA.COLUMNS
+WHERE
+    TABLE_SCHEMA = :schema_name
+ORDER BY
+    TABLE_NAME, ORDINAL_POSITION;
+"""
+
+# Typen, deren Länge bzw. Genauigkeit im Schema-Skript mit ausgegeben wird
+LENGTH_TYPES = {"char", "varchar", "nchar", "nvarchar", "binary", "varbinary"}
+PRECISION_TYPES = {"decimal", "numeric"}
+
+def _format_column_type(row: pd.Series) -> str:
+    """Formatiert den Datentyp einer Spalte aus INFORMATION_SCHEMA wie im bisherigen Schema-Skript (z.B. NVARCHAR(50))."""
+    data_type = row['DATA_TYPE'].lower()
+    if data_type in LENGTH_TYPES:
+        length = row['CHARACTER_MAXIMUM_LENGTH']
+        return f"{data_type.upper()}({'max' if length == -1 else int(length)})"
+    if data_type in PRECISION_TYPES:
+        return f"{data_type.upper()}({int(row['NUMERIC_PRECISION'])}, {int(row['NUMERIC_SCALE'])})"
+    return "INTEGER" if data_type == "int" else data_type.upper()
+
+def collect_column_metadata(engine: Engine, schema_name: str = 'dbo') -> pd.DataFrame:
+    """Liest die Spalten-Metadaten aller relevanten Tabellen (eine einzige INFORMATION_SCHEMA-Abfrage)."""
+    columns = pd.read_sql_query(text(COLUMN_METADATA_QUERY), engine, params={"schema_name": schema_name})
+    # Ignoriere Tabellen, die wir nicht für die Analyse benötigen
+    return columns[~columns['TABLE_NAME'].str.contains('Quota|Planning')].copy()
+
+def collect_table_columns(columns: pd.DataFrame) -> dict[str, list[str]]:
+    """Liefert die Spaltennamen je Tabelle für die SQL-Prüfung (sql_guard.py)."""
+    return {table_name: list(table_columns['COLUMN_NAME']) for table_name, table_columns in columns.groupby('TABLE_NAME', sort=True)}
+
+def generate_schema_script(engine: Engine, schema_name: str = 'dbo', columns: pd.DataFrame | None = None) -> str:
+    """Generiert CREATE TABLE-Anweisungen aus den Metadaten der Datenbank (optional aus bereits gelesenen Metadaten)."""
     print("\n--- Generiere Schema-Skript...")
-    inspector = inspect(engine)
-    tables = inspector.get_table_names(schema=schema_name)
+    if columns is None:
+        columns = collect_column_metadata(engine, schema_name)
+    columns = columns.copy()
+    columns['TYPE'] = columns.apply(_format_column_type, axis=1)
+
     full_schema_script = ""
-    for table_name in tables:
-        # Ignoriere Tabellen, die wir nicht für die Analyse benötigen
-        if 'Quota' in table_name or 'Planning' in table_name:
-            continue
-        script_part = f"CREATE TABLE [{schema_name}].[{table_name}] (\n"
-        columns = inspector.get_columns(table_name, schema=schema_name)
+    for table_name, table_columns in columns.groupby('TABLE_NAME', sort=True):
         column_definitions = []
-        for col in columns:
-            col_def = f"  [{col['name']}] {str(col['type'])}"
+        for column_name, column_type in zip(table_columns['COLUMN_NAME'], table_columns['TYPE']):
+            col_def = f"  [{column_name}] {column_type}"
             # Füge Kommentare für Datumsformate hinzu, falls bekannt
-            if 'date' in col['name'].lower() and 'DATE' in str(col['type']):
+            if 'date' in column_name.lower() and 'DATE' in column_type:
                  col_def += ", -- Format: 'YYYY-MM-DD'"
-            elif 'month_iso' in col['name'].lower():
+            elif 'month_iso' in column_name.lower():
                  col_def += ", -- Format: 'YYYY.MM'"
             column_definitions.append(col_def)
 
-        script_part += ",\n".join(column_definitions)
-        script_part += "\n);\n\n"
-        full_schema_script += script_part
+        full_schema_script += f"CREATE TABLE [{schema_name}].[{table_name}] (\n"
+        full_schema_script += ",\n".join(column_definitions)
+        full_schema_script += "\n);\n\n"
     return full_schema_script
 
-def analyze_categorical_data(engine: Engine) -> str:
+# Definiere hier die Spalten, die du analysieren möchtest
+COLUMNS_TO_ANALYZE = {
+    "Dim_Product": ["Product_Category", "Product_Line"],
+    "Dim_Sales_Office": ["Sales_Country", "Global_Region", "Sales_Region"],
+    "Dim_Sales_Channel": ["Sales_Channel"]
+}
+
+def _distinct_values_for_table(engine: Engine, table: str, columns: list[str]) -> pd.DataFrame:
+    """Ermittelt die eindeutigen Werte aller Spalten einer Tabelle in einer einzigen UNION-ALL-Abfrage."""
+    probes = [
+        f"SELECT '{column}' AS column_name, CAST([{column}] AS NVARCHAR(400)) AS value "
+        f"FROM dbo.[{table}] WHERE [{column}] IS NOT NULL GROUP BY [{column}]"
+        for column in columns
+    ]
+    return pd.read_sql_query(" UNION ALL ".join(probes), engine)
+
+def collect_categorical_values(engine: Engine) -> dict[str, dict[str, list[str]]]:
+    """Ermittelt die einzigartigen Werte der wichtigen kategorialen Spalten (eine Abfrage je Tabelle, parallel)."""
+    with ThreadPoolExecutor(max_workers=len(COLUMNS_TO_ANALYZE)) as executor:
+        futures = {
+            table: executor.submit(_distinct_values_for_table, engine, table, columns)
+            for table, columns in COLUMNS_TO_ANALYZE.items()
+        }
+
+    categorical_values = {}
+    for table, columns in COLUMNS_TO_ANALYZE.items():
+        try:
+            distinct_values = futures[table].result()
+        except Exception as e:
+            print(f"Konnte Tabelle {table} nicht analysieren: {e}")
+            continue
+        values_by_column = distinct_values.sort_values('value').groupby('column_name')['value'].agg(list)
+        categorical_values[table] = {column: list(values_by_column.get(column, [])) for column in columns}
+    return categorical_values
+
+def analyze_categorical_data(engine: Engine, categorical_values: dict | None = None) -> str:
     """Analysiert wichtige kategoriale Spalten und listet ihre einzigartigen Werte auf."""
     print("--- Analysiere kategoriale Daten...")
+    if categorical_values is None:
+        categorical_values = collect_categorical_values(engine)
+
     analysis = ""
-    # Definiere hier die Spalten, die du analysieren möchtest
-    columns_to_analyze = {
-        "Dim_Product": ["Product_Category", "Product_Line"],
-        "Dim_Sales_Office": ["Sales_Country", "Global_Region", "Sales_Region"],
-        "Dim_Sales_Channel": ["Sales_Channel"]
-    }
-    
-    for table, columns in columns_to_analyze.items():
-        for column in columns:
-            try:
-                df = pd.read_sql_query(f"SELECT DISTINCT [{column}] FROM dbo.[{table}] WHERE [{column}] IS NOT NULL ORDER BY [{column}];", engine)
-                values = df[column].tolist()
-                analysis += f"Einzigartige Werte für '{column}' in Tabelle '{table}':\n"
-                analysis += f"- {', '.join(map(str, values))}\n\n"
-            except Exception as e:
-                print(f"Konnte Spalte {column} in Tabelle {table} nicht analysieren: {e}")
-                
+    for table, columns in categorical_values.items():
+        for column, values in columns.items():
+            analysis += f"Einzigartige Werte für '{column}' in Tabelle '{table}':\n"
+            analysis += f"- {', '.join(map(str, values))}\n\n"
     return analysis
 
-def analyze_date_ranges(engine: Engine) -> str:
+DATE_RANGE_QUERY = """
+SELECT
+    (SELECT MIN(Calendar_Month_ISO) FROM dbo.DataSet_Monthly_Sales) AS min_month,
+    (SELECT MAX(Calendar_Month_ISO) FROM dbo.DataSet_Monthly_Sales) AS max_month,
+    (SELECT MIN(ID_Order_Date) FROM dbo.Facts_Daily_Sales) AS min_date,
+    (SELECT MAX(ID_Order_Date) FROM dbo.Facts_Daily_Sales) AS max_date;
+"""
+
+def collect_date_ranges(engine: Engine) -> dict[str, str]:
+    """Liest MIN- und MAX-Zeitraum der Verkaufstabellen in einer kombinierten Abfrage."""
+    ranges = pd.read_sql_query(DATE_RANGE_QUERY, engine).iloc[0]
+    return {
+        "min_month": str(ranges['min_month']),
+        "max_month": str(ranges['max_month']),
+        "min_date": pd.Timestamp(ranges['min_date']).strftime('%Y-%m-%d'),
+        "max_date": pd.Timestamp(ranges['max_date']).strftime('%Y-%m-%d'),
+    }
+
+def analyze_date_ranges(engine: Engine, date_ranges: dict | None = None) -> str:
     """Analysiert den MIN- und MAX-Zeitraum in den Verkaufstabellen."""
     print("--- Analysiere Datenzeiträume...")
     analysis = "DATENZEITRAUM:\n"
     try:
-        # Monatliche Daten
-        df_monthly = pd.read_sql_query("SELECT MIN(Calendar_Month_ISO) as min_month, MAX(Calendar_Month_ISO) as max_month FROM dbo.DataSet_Monthly_Sales;", engine)
-        min_month = df_monthly['min_month'].iloc[0]
-        max_month = df_monthly['max_month'].iloc[0]
-        analysis += f"- Monatliche Verkaufsdaten verfügbar von {min_month} bis {max_month}.\n"
+        if date_ranges is None:
+            date_ranges = collect_date_ranges(engine)
     except Exception as e:
-        analysis += f"- Konnte monatliche Zeiträume nicht analysieren: {e}\n"
+        return analysis + f"- Konnte Zeiträume nicht analysieren: {e}\n\n"
 
-    try:
-        # Tägliche Daten
-        df_daily = pd.read_sql_query("SELECT MIN(ID_Order_Date) as min_date, MAX(ID_Order_Date) as max_date FROM dbo.Facts_Daily_Sales;", engine)
-        min_date = df_daily['min_date'].iloc[0].strftime('%Y-%m-%d')
-        max_date = df_daily['max_date'].iloc[0].strftime('%Y-%m-%d')
-        analysis += f"- Tägliche Verkaufsdaten verfügbar von {min_date} bis {max_date}.\n"
-    except Exception as e:
-        analysis += f"- Konnte tägliche Zeiträume nicht analysieren: {e}\n"
-        
+    analysis += f"- Monatliche Verkaufsdaten verfügbar von {date_ranges['min_month']} bis {date_ranges['max_month']}.\n"
+    analysis += f"- Tägliche Verkaufsdaten verfügbar von {date_ranges['min_date']} bis {date_ranges['max_date']}.\n"
     return analysis + "\n"
 
-def generate_product_catalog(engine: Engine) -> str:
+PRODUCT_CATALOG_QUERY = """
+SELECT
+    Product_Category,
+    Material_Description
+FROM
+    dbo.Dim_Product
+WHERE
+    Product_Category IS NOT NULL AND Material_Description IS NOT NULL
+ORDER BY
+    Product_Category, Material_Description;
+"""
+
+def collect_product_catalog(engine: Engine) -> dict[str, list[str]]:
+    """Liest den Produktkatalog als Zuordnung Product_Category -> Material_Descriptions (vektorisiert per groupby)."""
+    df = pd.read_sql_query(PRODUCT_CATALOG_QUERY, engine)
+    catalog = df['Material_Description'].astype(str).groupby(df['Product_Category'], sort=True).agg(list)
+    return catalog.to_dict()
+
+def generate_product_catalog(engine: Engine, catalog: dict | None = None) -> str:
     """Erstellt einen strukturierten Produktkatalog aus der Dim_Product Tabelle."""
     print("--- Generiere Produktkatalog...")
     analysis = "PRODUKTKATALOG:\n"
     try:
-        query = """
-        SELECT
-            Product_Category,
-            Material_Description
-        FROM
-            dbo.Dim_Product
-        WHERE
-            Product_Category IS NOT NULL AND Material_Description IS NOT NULL
-        ORDER BY
-            Product_Category, Material_Description;
-        """
-        df = pd.read_sql_query(query, engine)
-        
-        current_category = ""
-        for index, row in df.iterrows():
-            if row['Product_Category'] != current_category:
-                current_category = row['Product_Category']
-                analysis += f"\n- Product_Category: {current_category}\n"
-            analysis += f"  - Material_Description: \"{row['Material_Description']}\"\n"
-            
+        if catalog is None:
+            catalog = collect_product_catalog(engine)
+        for category, products in catalog.items():
+            analysis += f"\n- Product_Category: {category}\n"
+            analysis += "".join(f"  - Material_Description: \"{product}\"\n" for product in products)
         return analysis + "\n"
     except Exception as e:
         return f"Konnte Produktkatalog nicht erstellen: {e}\n\n"
 
+# Spalten, deren Inhalt in den Kontext einfließt (kategoriale Werte und Produktkatalog)
+CONTENT_CHECKSUM_COLUMNS = {
+    **COLUMNS_TO_ANALYZE,
+    "Dim_Product": [*COLUMNS_TO_ANALYZE["Dim_Product"], "Material_Description"],
+}
+
+def collect_content_checksums(engine: Engine) -> str:
+    """
+    Liest Zeilenanzahl und CHECKSUM_AGG der Kontext-Spalten je Dimensionstabelle in einer Abfrage.
+    So erkennt der Fingerabdruck auch geänderte Produkte oder Dimensionswerte, die keinen Zeitraum verschieben.
+    """
+    probes = [
+        f"SELECT '{table}' AS table_name, COUNT_BIG(*) AS row_count, "
+        f"CHECKSUM_AGG(BINARY_CHECKSUM({', '.join(f'[{column}]' for column in columns)})) AS content_checksum "
+        f"FROM dbo.[{table}]"
+        for table, columns in CONTENT_CHECKSUM_COLUMNS.items()
+    ]
+    try:
+        checksums = pd.read_sql_query(" UNION ALL ".join(probes), engine)
+    except Exception as e:
+        # Ohne Prüfsummen lässt sich keine Aktualität belegen -> Fingerabdruck erzwingt eine Neuanalyse
+        print(f"Konnte Prüfsummen der Dimensionstabellen nicht lesen: {e}")
+        return f"unbekannt-{time.time()}"
+    return "\n".join(
+        f"{row.table_name}: {row.row_count} Zeilen, Prüfsumme {row.content_checksum}"
+        for row in checksums.sort_values("table_name").itertuples()
+    )
+
+def _hash_text(content: str) -> str:
+    """Berechnet einen SHA-256-Hash über einen Text."""
+    return hashlib.sha256(content.encode("utf-8")).hexdigest()
+
+def is_context_up_to_date(file_name: str, meta_file_name: str, fingerprint: str) -> bool:
+    """
+    Prüft, ob die bestehende Kontextdatei noch aktuell ist: Der Fingerabdruck (Schema, Zeiträume und Prüfsummen)
+    muss unverändert sein und die Datei darf seit der letzten Generierung nicht verändert worden sein.
+    """
+    if not os.path.exists(file_name) or not os.path.exists(meta_file_name):
+        return False
+    with open(meta_file_name, "r", encoding="utf-8") as f:
+        meta = json.load(f)
+    with open(file_name, "r", encoding="utf-8") as f:
+        content_hash = _hash_text(f.read())
+    return meta.get("fingerprint") == fingerprint and meta.get("content_hash") == content_hash
+
 
 if __name__ == "__main__":
+    file_name = "database_analysis_for_prompt.txt"
+    meta_file_name = "database_analysis_for_prompt.meta.json"
+    # Maschinenlesbarer Kontext für den Build-Schritt des SQL-Agenten (siehe build_context.py)
+    context_file_name = "database_context.json"
+
     db_engine = get_db_engine()
     if db_engine:
-        # Führe alle Analysen durch
-        schema_script = generate_schema_script(db_engine)
-        date_analysis = analyze_date_ranges(db_engine)
-        categorical_analysis = analyze_categorical_data(db_engine)
-        product_catalog = generate_product_catalog(db_engine)
+        # Günstige Abfragen zuerst: Schema, Zeiträume und Prüfsummen der Dimensionen bilden den Fingerabdruck
+        with ThreadPoolExecutor(max_workers=3) as executor:
+            column_future = executor.submit(collect_column_metadata, db_engine)
+            date_future = executor.submit(collect_date_ranges, db_engine)
+            checksum_future = executor.submit(collect_content_checksums, db_engine)
+        column_metadata = column_future.result()
+        schema_script = generate_schema_script(db_engine, columns=column_metadata)
+        date_ranges = date_future.result()
+        date_analysis = analyze_date_ranges(db_engine, date_ranges)
+        fingerprint = _hash_text(schema_script + date_analysis + checksum_future.result())
+
+        if os.path.exists(context_file_name) and is_context_up_to_date(file_name, meta_file_name, fingerprint):
+            print(f"\n✅ Schema und Datenstand unverändert, '{file_name}' ist aktuell. Keine weitere Analyse nötig.")
+            raise SystemExit(0)
+
+        # Teure Analysen parallel ausführen
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            categorical_future = executor.submit(collect_categorical_values, db_engine)
+            catalog_future = executor.submit(collect_product_catalog, db_engine)
+        categorical_values = categorical_future.result()
+        catalog = catalog_future.result()
+        categorical_analysis = analyze_categorical_data(db_engine, categorical_values)
+        product_catalog = generate_product_catalog(db_engine, catalog)
         
         # Kombiniere alle Informationen
         full_context = (
@@ -246,8 +387,16 @@ if __name__ == "__main__":
         print("\n\n--- Vollständige Analyse erfolgreich abgeschlossen ---")
         
         # Speichere das Ergebnis in einer Datei
-        file_name = "database_analysis_for_prompt.txt"
         with open(file_name, "w", encoding="utf-8") as f:
             f.write(full_context)
+        with open(context_file_name, "w", encoding="utf-8") as f:
+            json.dump({
+                "date_ranges": date_ranges,
+                "categorical_values": categorical_values,
+                "product_catalog": catalog,
+                "table_columns": collect_table_columns(column_metadata),
+            }, f, ensure_ascii=False, indent=2)
+        with open(meta_file_name, "w", encoding="utf-8") as f:
+            json.dump({"fingerprint": fingerprint, "content_hash": _hash_text(full_context)}, f)
         print(f"\n✅ Alle Analyseergebnisse wurden in der Datei '{file_name}' gespeichert.")
-        print("Bitte verwenden Sie den Inhalt dieser Datei als Grundlage für den nächsten Schritt.")
\ No newline at end of file
+        print("Führen Sie jetzt 'python build_context.py' aus, um den Kontext in den SQL-Agenten zu übernehmen.")
@@ -0,0 +1,270 @@
+# intent_parser.py
+import os
+import re
+from datetime import date
+
+# Aktuelles Datum für relative Anfragen (siehe _systemprompt_sql_agent.txt, Abschnitt 3.1)
+CURRENT_DATE = date.fromisoformat(os.getenv("INTENT_CURRENT_DATE", "2025-06-30"))
+INTENT_CONFIDENCE_THRESHOLD = float(os.getenv("INTENT_CONFIDENCE_THRESHOLD", "0.85"))
+
+METRIC_SYNONYMS = {
+    "umsatz": "revenue", "umsätze": "revenue", "erlös": "revenue", "erlöse": "revenue", "revenue": "revenue",
+    "verkaufsmenge": "amount", "verkaufsmengen": "amount", "stückzahl": "amount", "stückzahlen": "amount",
+    "absatz": "amount", "menge": "amount", "quantity": "amount", "units": "amount", "sales amount": "amount",
+}
+METRIC_EXPRESSIONS = {
+    "revenue": "SUM(dms.Revenue_EUR) AS Gesamtumsatz_EUR",
+    "amount": "SUM(dms.Sales_Amount) AS Gesamtstueckzahl",
+}
+
+COUNTRY_SYNONYMS = {
+    "deutschland": "Germany", "germany": "Germany",
+    "frankreich": "France", "france": "France",
+    "niederlande": "Netherlands", "holland": "Netherlands", "netherlands": "Netherlands",
+    "schweiz": "Switzerland", "switzerland": "Switzerland",
+    "großbritannien": "United Kingdom", "vereinigtes königreich": "United Kingdom", "united kingdom": "United Kingdom", "uk": "United Kingdom", "england": "United Kingdom",
+    "usa": "United States", "vereinigte staaten": "United States", "united states": "United States", "amerika": "United States",
+}
+CATEGORY_SYNONYMS = {
+    "city bikes": "City Bikes", "city bike": "City Bikes", "citybikes": "City Bikes", "stadträder": "City Bikes", "stadtrad": "City Bikes",
+    "kid bikes": "Kid Bikes", "kid bike": "Kid Bikes", "kids bikes": "Kid Bikes", "kinderräder": "Kid Bikes", "kinderrad": "Kid Bikes", "kinderfahrräder": "Kid Bikes",
+    "mountain bikes": "Mountain Bikes", "mountain bike": "Mountain Bikes", "mountainbikes": "Mountain Bikes", "mtb": "Mountain Bikes",
+    "race bikes": "Race Bikes", "race bike": "Race Bikes", "rennräder": "Race Bikes", "rennrad": "Race Bikes",
+    "trekking bikes": "Trekking Bikes", "trekking bike": "Trekking Bikes", "trekkingräder": "Trekking Bikes", "trekkingrad": "Trekking Bikes",
+}
+CHANNEL_SYNONYMS = {
+    "direct sales": "Direct Sales", "direktvertrieb": "Direct Sales", "direktverkauf": "Direct Sales",
+    "internet sales": "Internet Sales", "internet": "Internet Sales", "online": "Internet Sales", "onlinehandel": "Internet Sales",
+    "reseller": "Reseller", "händler": "Reseller", "wiederverkäufer": "Reseller",
+}
+GROUP_SYNONYMS = {
+    "land": "dms.Sales_Country", "länder": "dms.Sales_Country", "country": "dms.Sales_Country", "countries": "dms.Sales_Country",
+    "kategorie": "p.Product_Category", "kategorien": "p.Product_Category", "produktkategorie": "p.Product_Category", "category": "p.Product_Category",
+    "kanal": "dms.Sales_Channel", "vertriebskanal": "dms.Sales_Channel", "channel": "dms.Sales_Channel",
+    "monat": "dms.Calendar_Month_ISO", "monate": "dms.Calendar_Month_ISO", "month": "dms.Calendar_Month_ISO",
+    "jahr": "dms.Calendar_Year", "jahre": "dms.Calendar_Year", "year": "dms.Calendar_Year",
+}
+MONTH_SYNONYMS = {
+    "januar": 1, "january": 1, "februar": 2, "february": 2, "märz": 3, "march": 3, "april": 4,
+    "mai": 5, "may": 5, "juni": 6, "june": 6, "juli": 7, "july": 7, "august": 8,
+    "september": 9, "oktober": 10, "october": 10, "november": 11, "dezember": 12, "december": 12,
+}
+RELATIVE_YEARS = {
+    "letztes jahr": -1, "letzten jahr": -1, "vorjahr": -1, "last year": -1,
+    "dieses jahr": 0, "diesem jahr": 0, "this year": 0, "aktuellen jahr": 0,
+}
+RELATIVE_MONTHS = {"letzter monat": -1, "letzten monat": -1, "vormonat": -1, "last month": -1}
+
+# Füllwörter, die keine fachliche Bedeutung tragen und die Konfidenz nicht senken
+STOPWORDS = {
+    "was", "war", "wie", "hoch", "viel", "viele", "ist", "sind", "waren", "der", "die", "das", "den", "dem", "des",
+    "in", "im", "für", "von", "vom", "und", "zeige", "zeig", "mir", "gib", "bitte", "wurden", "wurde", "verkauft",
+    "gesamte", "gesamt", "gesamten", "insgesamt", "total", "an", "am", "bei", "mit", "uns", "wir", "haben", "hatten",
+    "what", "was", "how", "much", "many", "the", "of", "for", "show", "me", "in", "and", "total", "sold", "were",
+    "pro", "je", "nach", "per", "by", "aufgeteilt", "aufgeschlüsselt", "jahr", "ein", "eine", "einer", "alle",
+}
+
+# Begriffe offener Analysefragen, die keinen Filter bedeuten (z.B. "Analysiere die Entwicklung der Verkäufe")
+ANALYSIS_WORDS = {
+    "analysiere", "analysieren", "analyse", "analysiert", "untersuche", "untersuchen", "auswertung", "werte", "aus",
+    "verkäufe", "verkauf", "verkaufszahlen", "verkaufsdaten", "umsatzentwicklung", "entwicklung", "trend", "trends",
+    "überblick", "übersicht", "performance", "leistung", "statistik", "statistiken", "kennzahlen", "daten", "über",
+    "vergleiche", "vergleich", "zeit", "verlauf", "muster", "auffälligkeiten", "analyze", "analyse", "sales", "overview",
+}
+
+
+def _find_phrases(text: str, synonyms: dict) -> tuple[list, str]:
+    """
+    Sucht alle Synonyme (längste zuerst) im Text und entfernt die Fundstellen.
+
+    :param text: Die normalisierte Frage.
+    :param synonyms: Zuordnung Synonym -> kanonischer Wert.
+    :return: Die gefundenen kanonischen Werte in Reihenfolge ihres Auftretens (ohne Duplikate) und der Resttext.
+    """
+    positions = {}
+    for phrase in sorted(synonyms, key=len, reverse=True):
+        pattern = rf"(?<![\wäöüß]){re.escape(phrase)}(?![\wäöüß])"
+        match = re.search(pattern, text)
+        if match:
+            value = synonyms[phrase]
+            positions[value] = min(positions.get(value, match.start()), match.start())
+            # Fundstelle durch gleich lange Leerzeichen ersetzen, damit die Positionen stabil bleiben
+            text = re.sub(pattern, lambda found: " " * len(found.group(0)), text)
+    found = sorted(positions, key=positions.get)
+    return found, text
+
+
+def _sql_list(values: list[str]) -> str:
+    """
+    Formatiert Filterwerte für eine SQL-Bedingung (= oder IN).
+
+    :param values: Die gültigen Filterwerte.
+    :return: Der Operator samt Werten, z.B. "= 'Germany'" oder "IN ('City Bikes', 'Race Bikes')".
+    """
+    if len(values) == 1:
+        return f"= '{values[0]}'"
+    return "IN (" + ", ".join(f"'{value}'" for value in values) + ")"
+
+
+def _total_label(year: int | None, month: int | None) -> str:
+    """
+    Beschriftet die ROLLUP-Gesamtzeile mit dem tatsächlich abgefragten Zeitraum.
+
+    :param year: Das gefilterte Jahr (oder None).
+    :param month: Der gefilterte Monat (oder None).
+    :return: Die Beschriftung, z.B. "Gesamt Mai 2024", "Gesamt 2024" oder "Gesamt".
+    """
+    if year is None:
+        return "Gesamt"
+    if month is None:
+        return f"Gesamt {year}"
+    # Der erste Eintrag je Monat in MONTH_SYNONYMS ist der deutsche Name
+    month_name = next(name for name, number in MONTH_SYNONYMS.items() if number == month)
+    return f"Gesamt {month_name.capitalize()} {year}"
+
+
+def parse_question(question: str) -> tuple[str | None, float]:
+    """
+    Erkennt häufige Fragemuster (Umsatz/Verkaufsmenge nach Land, Kategorie, Kanal und Zeitraum)
+    und erzeugt daraus deterministisch SQL-Code nach den Regeln des SQL-Agenten.
+
+    :param question: Die Benutzerfrage (Deutsch oder Englisch).
+    :return: Ein Tupel aus generiertem SQL-Code (oder None) und der Konfidenz zwischen 0 und 1.
+    """
+    text = re.sub(r"\s+", " ", question.lower().strip().replace("-", " ").replace("?", " ").replace(",", " "))
+
+    metrics, text = _find_phrases(text, METRIC_SYNONYMS)
+    if not metrics:
+        return None, 0.0
+    countries, text = _find_phrases(text, COUNTRY_SYNONYMS)
+    categories, text = _find_phrases(text, CATEGORY_SYNONYMS)
+    channels, text = _find_phrases(text, CHANNEL_SYNONYMS)
+
+    # Gruppierung nur nach "pro/je/nach/per/by <Dimension>" oder "monatlich"
+    group_columns = []
+    group_pattern = r"(?:pro|je|nach|per|by) +(\w+)(?: +(?:und|and) +(\w+))?"
+    for match in re.finditer(group_pattern, text):
+        for word in match.groups():
+            column = GROUP_SYNONYMS.get(word)
+            if column and column not in group_columns:
+                group_columns.append(column)
+    text = re.sub(group_pattern, lambda found: found.group(0) if not GROUP_SYNONYMS.get(found.group(1)) else " ", text)
+    if re.search(r"monatlich|monthly", text):
+        group_columns.append("dms.Calendar_Month_ISO")
+        text = re.sub(r"monatlich|monthly", " ", text)
+
+    # Zeitraum: relativer Monat, Monat + Jahr, relatives Jahr oder explizites Jahr
+    year, month = None, None
+    relative_months, text = _find_phrases(text, RELATIVE_MONTHS)
+    relative_years, text = _find_phrases(text, RELATIVE_YEARS)
+    years = re.findall(r"\b(20\d{2})\b", text)
+    text = re.sub(r"\b20\d{2}\b", " ", text)
+    months, text = _find_phrases(text, MONTH_SYNONYMS)
+
+    if relative_months:
+        previous_month_index = CURRENT_DATE.year * 12 + CURRENT_DATE.month - 1 + relative_months[0]
+        year, month = previous_month_index // 12, previous_month_index % 12 + 1
+    elif relative_years:
+        year = CURRENT_DATE.year + relative_years[0]
+    if years:
+        if len(set(years)) > 1 or (year is not None and int(years[0]) != year):
+            return None, 0.0
+        year = int(years[0])
+    if months:
+        if len(months) > 1 or year is None:
+            return None, 0.0
+        month = months[0]
+    if len(relative_years) + len(relative_months) > 1:
+        return None, 0.0
+
+    # Konfidenz: Anteil der Wörter, die erkannt wurden oder bedeutungslos sind
+    remaining_words = [word for word in re.findall(r"[\wäöüß]+", text) if word not in STOPWORDS]
+    total_words = len(re.findall(r"[\wäöüß]+", question.lower()))
+    confidence = 1.0 - len(remaining_words) / max(total_words, 1)
+    if remaining_words:
+        # Unbekannte Begriffe (z.B. Produktnamen, "Top", "Durchschnitt") gehören in die Hände des LLM
+        confidence = min(confidence, 0.5)
+
+    # Mehrere Werte eines Filters (z.B. "Deutschland und Frankreich") werden einzeln ausgewiesen
+    multi_value_columns = [
+        column for column, values in (
+            ("dms.Sales_Country", countries), ("p.Product_Category", categories), ("dms.Sales_Channel", channels)
+        ) if len(values) > 1 and column not in group_columns
+    ]
+    group_columns = multi_value_columns + group_columns
+    if len(group_columns) > 2:
+        # Mehrdimensionale Aufschlüsselungen überlässt die Schnellerkennung dem SQL-Agenten
+        return None, 0.0
+
+    # Ohne explizite Gruppierung: Aufschlüsselung nach den Regeln 4.2 und 4.3 des SQL-Agenten
+    if not group_columns:
+        if len(categories) == 1:
+            group_columns = ["p.Material_Description"]
+        elif year is not None and month is None:
+            group_columns = ["dms.Calendar_Month_ISO"]
+
+    conditions = []
+    if categories:
+        conditions.append(f"p.Product_Category {_sql_list(categories)}")
+    if countries:
+        conditions.append(f"dms.Sales_Country {_sql_list(countries)}")
+    if channels:
+        conditions.append(f"dms.Sales_Channel {_sql_list(channels)}")
+    if year is not None:
+        conditions.append(f"dms.Calendar_Year = '{year}'")
+    if month is not None:
+        conditions.append(f"dms.Calendar_Month_ISO = '{year}.{month:02d}'")
+
+    metric_expressions = [METRIC_EXPRESSIONS[metric] for metric in metrics]
+    sql_lines = ["SELECT"]
+    if len(group_columns) == 1:
+        label = _total_label(year, month)
+        # CAST verhindert, dass ISNULL die Beschriftung auf die Länge von CHAR-Spalten kürzt
+        select_items = [f"ISNULL(CAST({group_columns[0]} AS NVARCHAR(200)), '{label}') AS {group_columns[0].split('.')[1]}"]
+    else:
+        select_items = list(group_columns)
+    select_items += metric_expressions
+    sql_lines.append(",\n".join(f"    {item}" for item in select_items))
+    sql_lines.append("FROM\n    dbo.DataSet_Monthly_Sales AS dms")
+    sql_lines.append("JOIN\n    dbo.Dim_Product AS p ON dms.Material_Number = p.Material_Number")
+    if conditions:
+        sql_lines.append("WHERE\n    " + "\n    AND ".join(conditions))
+    if len(group_columns) == 1:
+        sql_lines.append(f"GROUP BY\n    {group_columns[0]} WITH ROLLUP")
+        sql_lines.append(f"ORDER BY\n    GROUPING({group_columns[0]}), {group_columns[0]}")
+    elif group_columns:
+        sql_lines.append("GROUP BY\n    " + ", ".join(group_columns))
+        sql_lines.append("ORDER BY\n    " + ", ".join(group_columns))
+
+    return "\n".join(sql_lines) + ";", round(confidence, 2)
+
+
+def parse_filters(question: str) -> dict:
+    """
+    Erkennt nur die Filter einer Frage (Land, Kategorie, Kanal, Jahr), z.B. für den Analyseplan.
+    Ob diese Filter die ganze Frage abdecken, zeigt 'covered': unbekannte Begriffe (Regionen, Produktlinien,
+    Quartale, "letzte 6 Monate" ...) oder mehrere Jahre ergeben False.
+
+    :param question: Die Benutzerfrage (Deutsch oder Englisch).
+    :return: Ein Dictionary mit den Listen 'countries', 'categories', 'channels', dem Jahr 'year' (oder None)
+             und 'covered'.
+    """
+    text = re.sub(r"\s+", " ", question.lower().strip().replace("-", " ").replace("?", " ").replace(",", " "))
+    countries, text = _find_phrases(text, COUNTRY_SYNONYMS)
+    categories, text = _find_phrases(text, CATEGORY_SYNONYMS)
+    channels, text = _find_phrases(text, CHANNEL_SYNONYMS)
+    relative_years, text = _find_phrases(text, RELATIVE_YEARS)
+    years = sorted(set(re.findall(r"\b(20\d{2})\b", text)))
+    text = re.sub(r"\b20\d{2}\b", " ", text)
+    _, text = _find_phrases(text, METRIC_SYNONYMS)
+
+    # Mehrdeutige Zeiträume (mehrere Jahre) werden nicht gefiltert
+    year = None
+    if len(years) == 1 and not relative_years:
+        year = int(years[0])
+    elif relative_years and not years and len(relative_years) == 1:
+        year = CURRENT_DATE.year + relative_years[0]
+
+    remaining_words = [word for word in re.findall(r"[\wäöüß]+", text) if word not in STOPWORDS | ANALYSIS_WORDS]
+    covered = not remaining_words and (year is not None or not (years or relative_years))
+    return {"countries": countries, "categories": categories, "channels": channels, "year": year, "covered": covered}
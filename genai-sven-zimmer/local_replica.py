@@ -0,0 +1,212 @@
+# local_replica.py
+import os
+import re
+import sqlite3
+import threading
+import time
+from contextlib import closing
+
+import pandas as pd
+from sqlalchemy import text
+from sqlalchemy.engine import Engine
+
+LOCAL_REPLICA_PATH = os.getenv("LOCAL_REPLICA_PATH", ".cache/replica.sqlite")
+LOCAL_REPLICA_MMAP_BYTES = int(os.getenv("LOCAL_REPLICA_MMAP_BYTES", str(256 * 1024 * 1024)))
+REPLICA_FETCH_CHUNK_ROWS = 20000
+# Neue Daten werden erst in eine Staging-Tabelle geladen und dann in einer Transaktion übernommen
+STAGING_PREFIX = "_staging_"
+
+MONTHLY_TABLE = "DataSet_Monthly_Sales"
+DIMENSION_TABLES = ["Dim_Product", "Dim_Sales_Office", "Dim_Sales_Channel", "Dim_Calendar", "Dim_Currency"]
+MIRRORED_TABLES = {MONTHLY_TABLE, *DIMENSION_TABLES}
+
+# T-SQL-Konstrukte, die SQLite nicht (gleichwertig) ausführen kann -> Abfrage geht an den Server
+UNSUPPORTED_TSQL = re.compile(
+    r"\b(WITH|ROLLUP|CUBE|GROUPING|OVER|PIVOT|UNPIVOT|APPLY|DATEPART|DATEADD|DATEDIFF|DATENAME|EOMONTH|FORMAT|CONVERT|"
+    r"TRY_CAST|GETDATE|YEAR|MONTH|DAY|LEN|STRING_AGG|STDEV|STDEVP|VAR|VARP|PERCENT|OFFSET|FETCH|INTO)\b",
+    re.IGNORECASE,
+)
+TABLE_REFERENCE = re.compile(r"\b(?:FROM|JOIN)\s+(?:\[?dbo\]?\.)?\[?(\w+)\]?", re.IGNORECASE)
+TOP_CLAUSE = re.compile(r"^\s*SELECT\s+(DISTINCT\s+)?TOP\s*\(?\s*(\d+)\s*\)?", re.IGNORECASE)
+
+
+def to_sqlite_sql(sql_query: str) -> str:
+    """
+    Übersetzt die wenigen T-SQL-Besonderheiten, die sich eindeutig abbilden lassen
+    (SELECT TOP n -> LIMIT n, ISNULL() -> IFNULL()).
+
+    :param sql_query: Der T-SQL-Code.
+    :return: Der für SQLite angepasste SQL-Code.
+    """
+    sql_query = sql_query.strip().rstrip(";")
+    # ISNULL ist in SQLite ein Operator, IFNULL hat dieselbe Semantik wie die T-SQL-Funktion
+    sql_query = re.sub(r"\bISNULL\s*\(", "IFNULL(", sql_query, flags=re.IGNORECASE)
+    top_match = TOP_CLAUSE.match(sql_query)
+    if top_match:
+        sql_query = f"SELECT {top_match.group(1) or ''}" + sql_query[top_match.end():]
+        sql_query += f"\nLIMIT {top_match.group(2)}"
+    return sql_query
+
+
+class LocalReplica:
+    """Lokale SQLite-Kopie von DataSet_Monthly_Sales und den Dim_*-Tabellen mit inkrementeller Aktualisierung."""
+
+    def __init__(self, file_path: str = LOCAL_REPLICA_PATH):
+        self.file_path = file_path
+        self._refresh_lock = threading.Lock()
+        directory = os.path.dirname(self.file_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        # "with connection" schließt nur die Transaktion ab, closing() schließt die Verbindung
+        with closing(sqlite3.connect(self.file_path)) as connection, connection:
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS _replica_meta (table_name TEXT PRIMARY KEY, watermark TEXT, refreshed_at REAL)"
+            )
+
+    def _read_meta(self) -> dict[str, str]:
+        """
+        Liest die Wasserzeichen der gespiegelten Tabellen.
+
+        :return: Zuordnung Tabellenname -> Wasserzeichen.
+        """
+        with closing(sqlite3.connect(self.file_path)) as connection:
+            rows = connection.execute("SELECT table_name, watermark FROM _replica_meta").fetchall()
+        return dict(rows)
+
+    def _write_meta(self, connection: sqlite3.Connection, table_name: str, watermark: str) -> None:
+        """
+        Speichert das Wasserzeichen einer Tabelle nach erfolgreicher Aktualisierung.
+
+        :param connection: Die geöffnete Replikat-Verbindung.
+        :param table_name: Der Tabellenname.
+        :param watermark: Das neue Wasserzeichen.
+        """
+        connection.execute(
+            "INSERT OR REPLACE INTO _replica_meta (table_name, watermark, refreshed_at) VALUES (?, ?, ?)",
+            (table_name, watermark, time.time()),
+        )
+
+    def mirrored_tables(self) -> set[str]:
+        """
+        Liefert die Tabellen, die bereits vollständig im Replikat vorliegen.
+
+        :return: Die Menge der gespiegelten Tabellennamen.
+        """
+        return set(self._read_meta()) & MIRRORED_TABLES
+
+    def refresh(self, source_engine: Engine, daily_watermark: str) -> None:
+        """
+        Aktualisiert das Replikat. DataSet_Monthly_Sales wird ab dem letzten gespiegelten Monat
+        (Calendar_Month_ISO) nachgeladen, die Dimensionstabellen nur bei geändertem ID_Order_Date-Wasserzeichen.
+        Die Daten landen zuerst in Staging-Tabellen und werden dann je Tabelle in einer einzigen Transaktion
+        übernommen, sodass parallele Abfragen nie einen halb geladenen Monat sehen.
+
+        :param source_engine: Die Engine der MSSQL-Quelldatenbank.
+        :param daily_watermark: Das aktuelle MAX(ID_Order_Date) der Quelldatenbank.
+        """
+        with self._refresh_lock:
+            meta = self._read_meta()
+            with closing(sqlite3.connect(self.file_path)) as replica, source_engine.connect() as source:
+                # Transaktionen explizit steuern (BEGIN/COMMIT in _swap_in)
+                replica.isolation_level = None
+
+                # Monatsdaten: letzten (ggf. unvollständigen) Monat ersetzen und neuere Monate anhängen
+                last_month = meta.get(MONTHLY_TABLE)
+                staging_table = STAGING_PREFIX + MONTHLY_TABLE
+                replica.execute(f"DROP TABLE IF EXISTS {staging_table}")
+                if last_month is None:
+                    query = text(f"SELECT * FROM dbo.{MONTHLY_TABLE}")
+                    parameters = {}
+                else:
+                    query = text(f"SELECT * FROM dbo.{MONTHLY_TABLE} WHERE Calendar_Month_ISO >= :last_month")
+                    parameters = {"last_month": last_month}
+
+                loaded_rows = 0
+                for chunk in pd.read_sql_query(query, source, params=parameters, chunksize=REPLICA_FETCH_CHUNK_ROWS):
+                    chunk.to_sql(staging_table, replica, if_exists="append", index=False)
+                    loaded_rows += len(chunk)
+
+                if last_month is None:
+                    if loaded_rows:
+                        self._swap_in(replica, MONTHLY_TABLE, [
+                            (f"DROP TABLE IF EXISTS {MONTHLY_TABLE}", ()),
+                            (f"ALTER TABLE {staging_table} RENAME TO {MONTHLY_TABLE}", ()),
+                            (f"CREATE INDEX IF NOT EXISTS ix_{MONTHLY_TABLE}_month ON {MONTHLY_TABLE} (Calendar_Month_ISO)", ()),
+                        ])
+                else:
+                    statements = [(f"DELETE FROM {MONTHLY_TABLE} WHERE Calendar_Month_ISO >= ?", (last_month,))]
+                    if loaded_rows:
+                        statements += [
+                            (f"INSERT INTO {MONTHLY_TABLE} SELECT * FROM {staging_table}", ()),
+                            (f"DROP TABLE {staging_table}", ()),
+                        ]
+                    self._swap_in(replica, MONTHLY_TABLE, statements)
+                print(f"Replikat: {loaded_rows} Zeilen aus {MONTHLY_TABLE} ab {last_month or 'Beginn'} geladen.")
+
+                # Dimensionstabellen sind klein und werden bei neuen Tagesdaten komplett ersetzt
+                for table_name in DIMENSION_TABLES:
+                    if meta.get(table_name) == daily_watermark:
+                        continue
+                    try:
+                        df = pd.read_sql_query(text(f"SELECT * FROM dbo.{table_name}"), source)
+                    except Exception as e:
+                        print(f"Replikat: Tabelle {table_name} konnte nicht gespiegelt werden: {e}")
+                        continue
+                    staging_table = STAGING_PREFIX + table_name
+                    df.to_sql(staging_table, replica, if_exists="replace", index=False)
+                    self._swap_in(replica, table_name, [
+                        (f"DROP TABLE IF EXISTS {table_name}", ()),
+                        (f"ALTER TABLE {staging_table} RENAME TO {table_name}", ()),
+                    ], daily_watermark)
+                    print(f"Replikat: {table_name} mit {len(df)} Zeilen aktualisiert.")
+
+    def _swap_in(self, replica: sqlite3.Connection, table_name: str, statements: list[tuple[str, tuple]], watermark: str | None = None) -> None:
+        """
+        Übernimmt geladene Staging-Daten atomar: alle Anweisungen und das neue Wasserzeichen
+        werden gemeinsam festgeschrieben oder bei einem Fehler vollständig verworfen.
+
+        :param replica: Die Replikat-Verbindung (isolation_level=None).
+        :param table_name: Die Zieltabelle.
+        :param statements: Die auszuführenden Anweisungen mit ihren Parametern.
+        :param watermark: Das neue Wasserzeichen (Standard: MAX(Calendar_Month_ISO) der Tabelle).
+        """
+        replica.execute("BEGIN IMMEDIATE")
+        try:
+            for statement, parameters in statements:
+                replica.execute(statement, parameters)
+            if watermark is None:
+                watermark = str(replica.execute(f"SELECT MAX(Calendar_Month_ISO) FROM {table_name}").fetchone()[0])
+            self._write_meta(replica, table_name, watermark)
+            replica.execute("COMMIT")
+        except Exception:
+            replica.execute("ROLLBACK")
+            raise
+
+    def can_serve(self, sql_query: str) -> bool:
+        """
+        Prüft, ob eine Abfrage vollständig aus dem Replikat beantwortet werden kann.
+
+        :param sql_query: Der T-SQL-Code.
+        :return: True, wenn alle verwendeten Tabellen gespiegelt sind und nur SQLite-kompatible Konstrukte vorkommen.
+        """
+        if UNSUPPORTED_TSQL.search(sql_query):
+            return False
+        referenced_tables = set(TABLE_REFERENCE.findall(sql_query))
+        return referenced_tables <= self.mirrored_tables()
+
+    def query(self, sql_query: str) -> pd.DataFrame:
+        """
+        Führt eine Abfrage gegen das Replikat aus. Das Replikat wird als Schema "dbo" eingebunden,
+        sodass Tabellennamen wie dbo.DataSet_Monthly_Sales unverändert funktionieren.
+
+        :param sql_query: Der T-SQL-Code.
+        :return: Das Ergebnis als DataFrame.
+        """
+        connection = sqlite3.connect(":memory:")
+        try:
+            connection.execute("ATTACH DATABASE ? AS dbo", (self.file_path,))
+            connection.execute(f"PRAGMA dbo.mmap_size={LOCAL_REPLICA_MMAP_BYTES}")
+            return pd.read_sql_query(to_sqlite_sql(sql_query), connection)
+        finally:
+            connection.close()
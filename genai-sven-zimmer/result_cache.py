@@ -0,0 +1,145 @@
+# result_cache.py
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable
+
+import pandas as pd
+
+
+def canonicalize_sql(sql_query: str) -> str:
+    """
+    Bringt SQL-Text in eine kanonische Form, damit gleichwertige Abfragen denselben Cache-Schlüssel ergeben.
+    Kommentare werden entfernt, Leerraum außerhalb von String-Literalen wird zusammengefasst.
+
+    :param sql_query: Der auszuführende SQL-Code.
+    :return: Der kanonische SQL-Text.
+    """
+    # String-Literale bleiben unverändert, nur der restliche Text wird normalisiert
+    parts = re.split(r"('(?:[^']|'')*')", sql_query)
+    canonical_parts = []
+    for index, part in enumerate(parts):
+        if index % 2 == 1:
+            canonical_parts.append(part)
+            continue
+        part = re.sub(r"--[^\n]*", " ", part)
+        part = re.sub(r"/\*.*?\*/", " ", part, flags=re.DOTALL)
+        part = re.sub(r"\s+", " ", part)
+        canonical_parts.append(part.upper())
+    return "".join(canonical_parts).strip().rstrip(";").strip()
+
+
+class ResultCache:
+    """Größenbegrenzter Cache für Abfrageergebnisse, der bei Änderung des Daten-Wasserzeichens invalidiert wird."""
+
+    def __init__(
+        self,
+        watermark_reader: Callable[[], tuple],
+        max_bytes: int | None = None,
+        watermark_interval_seconds: float | None = None,
+    ):
+        self.watermark_reader = watermark_reader
+        self.max_bytes = max_bytes or int(os.getenv("RESULT_CACHE_MAX_BYTES", str(64 * 1024 * 1024)))
+        self.watermark_interval_seconds = watermark_interval_seconds or float(
+            os.getenv("RESULT_CACHE_WATERMARK_INTERVAL_SECONDS", "60")
+        )
+        self.hits = 0
+        self.misses = 0
+        self.current_bytes = 0
+        self._entries: OrderedDict[str, tuple[pd.DataFrame, int]] = OrderedDict()
+        self._watermark: tuple | None = None
+        self._watermark_checked_at = 0.0
+        # Wird bei jeder Invalidierung erhöht; Ergebnisse aus einer älteren Generation werden nicht gespeichert
+        self.generation = 0
+        self._lock = threading.Lock()
+
+    def _check_watermark(self) -> None:
+        """
+        Prüft das Daten-Wasserzeichen höchstens alle `watermark_interval_seconds` Sekunden
+        und leert den Cache, sobald sich die Daten geändert haben. Die Datenbankabfrage läuft
+        außerhalb des Locks, damit andere Cache-Zugriffe nicht auf sie warten.
+        """
+        now = time.monotonic()
+        with self._lock:
+            if now - self._watermark_checked_at < self.watermark_interval_seconds:
+                return
+            # Sofort setzen, damit parallel nur ein Aufrufer das Wasserzeichen liest
+            self._watermark_checked_at = now
+
+        try:
+            watermark = self.watermark_reader()
+        except Exception as e:
+            # Ohne gültiges Wasserzeichen kann die Aktualität nicht garantiert werden
+            print(f"Wasserzeichen konnte nicht gelesen werden, Ergebnis-Cache wird geleert: {e}")
+            watermark = None
+
+        with self._lock:
+            if watermark is None or watermark != self._watermark:
+                if self._entries:
+                    print(f"Datenstand geändert ({self._watermark} -> {watermark}), Ergebnis-Cache wird geleert.")
+                self._entries.clear()
+                self.current_bytes = 0
+                self.generation += 1
+            self._watermark = watermark
+
+    def get(self, sql_query: str) -> pd.DataFrame | None:
+        """
+        Liefert das gecachte Ergebnis einer Abfrage, sofern der Datenstand unverändert ist.
+
+        :param sql_query: Der auszuführende SQL-Code.
+        :return: Eine (flache) Kopie des gecachten DataFrames oder None bei einem Cache-Miss.
+        """
+        key = canonicalize_sql(sql_query)
+        self._check_watermark()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0].copy(deep=False)
+
+    def put(self, sql_query: str, df: pd.DataFrame, generation: int) -> None:
+        """
+        Speichert ein Abfrageergebnis und verdrängt die ältesten Einträge, bis das Byte-Budget eingehalten ist.
+
+        :param sql_query: Der ausgeführte SQL-Code.
+        :param df: Das Ergebnis der Abfrage.
+        :param generation: Der Wert von `generation` vor Beginn der Abfrage. Wurde der Cache seitdem
+            invalidiert, stammt das Ergebnis möglicherweise vom alten Datenstand und wird verworfen.
+        """
+        size_bytes = int(df.memory_usage(index=True, deep=True).sum())
+        if size_bytes > self.max_bytes:
+            return
+
+        key = canonicalize_sql(sql_query)
+        with self._lock:
+            if self._watermark is None or generation != self.generation:
+                # Ohne bekanntes Wasserzeichen oder nach einer Invalidierung wird nichts gecacht
+                return
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self.current_bytes -= previous[1]
+            self._entries[key] = (df, size_bytes)
+            self.current_bytes += size_bytes
+            while self.current_bytes > self.max_bytes:
+                _, (_, evicted_bytes) = self._entries.popitem(last=False)
+                self.current_bytes -= evicted_bytes
+
+    def stats(self) -> dict:
+        """
+        Gibt die aktuellen Cache-Kennzahlen zurück.
+
+        :return: Ein Dictionary mit Treffern, Fehlschlägen, Einträgen, belegten Bytes und Wasserzeichen.
+        """
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "entries": len(self._entries),
+                "bytes": self.current_bytes,
+                "watermark": self._watermark,
+            }
@@ -0,0 +1,233 @@
+# result_encoder.py
+import os
+
+import pandas as pd
+
+# Grobe Faustregel für gpt-4o-mini: ca. 4 Zeichen pro Token
+CHARS_PER_TOKEN = 4
+DEFAULT_TOKEN_BUDGET = int(os.getenv("RESULT_TOKEN_BUDGET", "3000"))
+MAX_GROUPS_PER_COLUMN = 12
+MAX_GROUP_CARDINALITY = 50
+# Zeilen, aus denen die CSV-Größe eines Ergebnisses hochgerechnet wird
+SIZE_SAMPLE_ROWS = 50
+# Anteil des Token-Budgets, den die Gruppensummen höchstens belegen
+GROUP_TOTALS_BUDGET_SHARE = 0.5
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    Schätzt die Anzahl der Tokens eines Textes.
+
+    :param text: Der zu bewertende Text.
+    :return: Die geschätzte Token-Anzahl.
+    """
+    return len(text) // CHARS_PER_TOKEN + 1
+
+
+def format_number(value: float) -> str:
+    """
+    Formatiert eine Zahl kompakt: Ganzzahlen ohne Nachkommastellen, sonst maximal zwei Nachkommastellen.
+
+    :param value: Die zu formatierende Zahl.
+    :return: Die Zahl als kompakter String.
+    """
+    if pd.isna(value):
+        return ""
+    rounded = round(float(value), 2)
+    if rounded.is_integer():
+        return str(int(rounded))
+    return f"{rounded:.2f}".rstrip("0")
+
+
+def _compact_frame(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Ersetzt numerische Spalten durch kompakt formatierte Strings.
+
+    :param df: Das ursprüngliche Datenbankergebnis.
+    :return: Ein DataFrame mit kompakter Zahlendarstellung.
+    """
+    compact_df = df.copy()
+    for column in compact_df.columns:
+        series = compact_df[column]
+        if pd.api.types.is_float_dtype(series) or (pd.api.types.is_object_dtype(series) and _is_decimal_column(series)):
+            compact_df[column] = compact_df[column].map(format_number)
+    return compact_df
+
+
+def _is_decimal_column(series: pd.Series) -> bool:
+    """
+    Erkennt Objekt-Spalten, die Zahlen enthalten (z.B. Decimal-Werte aus MONEY-Spalten).
+
+    :param series: Die zu prüfende Spalte.
+    :return: True, wenn alle nicht-leeren Werte numerisch sind.
+    """
+    non_null = series.dropna()
+    # Texte wie '2024.10' (Calendar_Month_ISO) sind Beschriftungen, keine Zahlen
+    if non_null.empty or non_null.map(lambda value: isinstance(value, str)).any():
+        return False
+    return pd.to_numeric(non_null, errors="coerce").notna().all()
+
+
+def get_numeric_columns(df: pd.DataFrame) -> list[str]:
+    """
+    Ermittelt alle Spalten mit Kennzahlen (inklusive Decimal-Spalten).
+
+    :param df: Das Datenbankergebnis.
+    :return: Die Namen der numerischen Spalten.
+    """
+    return [
+        column for column in df.columns
+        if (pd.api.types.is_numeric_dtype(df[column]) and not pd.api.types.is_bool_dtype(df[column]))
+        or (pd.api.types.is_object_dtype(df[column]) and _is_decimal_column(df[column]))
+    ]
+
+
+def _is_total_label(value) -> bool:
+    """
+    Erkennt die Gesamtzeile einer ROLLUP-Abfrage (NULL oder 'Gesamt ...' als Beschriftung).
+
+    :param value: Der Wert der Beschriftungsspalte.
+    :return: True bei einer Gesamtzeile.
+    """
+    return pd.isna(value) or str(value).strip().lower().startswith(("gesamt", "total"))
+
+
+def drop_total_rows(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Entfernt ROLLUP-Gesamt- und Zwischensummenzeilen (NULL oder 'Gesamt ...' in einer Beschriftungsspalte),
+    damit Summen, Anteile und Ausreißer die Werte nicht doppelt zählen.
+
+    :param df: Das Datenbankergebnis.
+    :return: Das Ergebnis ohne Gesamtzeilen (unverändert, wenn es nur aus solchen Zeilen besteht).
+    """
+    numeric_columns = get_numeric_columns(df)
+    label_columns = [column for column in df.columns if column not in numeric_columns]
+    if not label_columns or len(df) < 2:
+        return df
+    is_total = df[label_columns].map(_is_total_label).any(axis=1).to_numpy()
+    if is_total.all() or not is_total.any():
+        return df
+    return df[~is_total]
+
+
+def _column_aggregates(df: pd.DataFrame, numeric_columns: list[str]) -> str:
+    """
+    Berechnet Summe, Minimum, Maximum und Mittelwert je Kennzahl-Spalte.
+
+    :param df: Das Datenbankergebnis.
+    :param numeric_columns: Die Kennzahl-Spalten.
+    :return: Die Aggregate im CSV-Format.
+    """
+    if not numeric_columns:
+        return ""
+    values = df[numeric_columns].apply(pd.to_numeric, errors="coerce")
+    aggregates = pd.DataFrame({
+        "Spalte": numeric_columns,
+        "Summe": values.sum().to_numpy(),
+        "Min": values.min().to_numpy(),
+        "Max": values.max().to_numpy(),
+        "Mittelwert": values.mean().to_numpy(),
+    })
+    return _compact_frame(aggregates).to_csv(index=False)
+
+
+def _group_totals(df: pd.DataFrame, numeric_columns: list[str], max_chars: int) -> str:
+    """
+    Summiert die Kennzahlen je Ausprägung der kategorialen Spalten (nur bei überschaubarer Kardinalität).
+    Je Dimension erscheinen die MAX_GROUPS_PER_COLUMN größten Gruppen und eine Zeile "Rest";
+    weitere Dimensionen entfallen, sobald max_chars erreicht ist.
+
+    :param df: Das Datenbankergebnis.
+    :param numeric_columns: Die Kennzahl-Spalten.
+    :param max_chars: Die maximale Länge aller Gruppensummen zusammen.
+    :return: Die Gruppensummen als Text mit einem CSV-Block je Dimension.
+    """
+    if not numeric_columns:
+        return ""
+    values = df[numeric_columns].apply(pd.to_numeric, errors="coerce")
+    sections = []
+    used_chars = 0
+    for column in df.columns:
+        if column in numeric_columns:
+            continue
+        cardinality = df[column].nunique(dropna=True)
+        if cardinality < 2 or cardinality > MAX_GROUP_CARDINALITY:
+            continue
+        totals = values.groupby(df[column], dropna=True).sum().sort_values(numeric_columns[0], ascending=False)
+        top_totals = totals.head(MAX_GROUPS_PER_COLUMN).reset_index()
+        if len(totals) > MAX_GROUPS_PER_COLUMN:
+            rest = totals.iloc[MAX_GROUPS_PER_COLUMN:].sum()
+            rest_row = pd.DataFrame([{column: f"Rest ({len(totals) - MAX_GROUPS_PER_COLUMN} weitere)", **rest.to_dict()}])
+            top_totals = pd.concat([top_totals.astype({column: object}), rest_row], ignore_index=True)
+        section = f"Summen je {column}:\n{_compact_frame(top_totals).to_csv(index=False)}"
+        if used_chars + len(section) > max_chars:
+            break
+        sections.append(section)
+        used_chars += len(section)
+    return "\n".join(sections)
+
+
+def _estimate_csv_chars(df: pd.DataFrame) -> int:
+    """
+    Schätzt die Länge der kompakten CSV-Darstellung aus einer gleichmäßig verteilten Stichprobe,
+    ohne das ganze Ergebnis zu serialisieren.
+
+    :param df: Das Datenbankergebnis.
+    :return: Die geschätzte Anzahl an Zeichen.
+    """
+    if len(df) <= SIZE_SAMPLE_ROWS:
+        return len(_compact_frame(df).to_csv(index=False))
+    sample = df.iloc[::len(df) // SIZE_SAMPLE_ROWS]
+    header_chars = len(_compact_frame(sample.head(0)).to_csv(index=False))
+    sample_chars = len(_compact_frame(sample).to_csv(index=False)) - header_chars
+    return header_chars + sample_chars * len(df) // len(sample)
+
+
+def encode_result(df: pd.DataFrame, token_budget: int = DEFAULT_TOKEN_BUDGET) -> str:
+    """
+    Kodiert ein Datenbankergebnis für den Agenten-Prompt innerhalb eines Token-Budgets.
+    Kleine Ergebnisse werden vollständig als CSV übergeben, große als Zusammenfassung
+    mit Zeilenanzahl, Aggregaten, Gruppensummen sowie Anfangs- und Endzeilen.
+
+    :param df: Das Ergebnis der Datenbankabfrage.
+    :param token_budget: Die maximale Anzahl an Tokens für die Darstellung.
+    :return: Die kompakte Textdarstellung des Ergebnisses.
+    """
+    # Vollständig serialisieren nur, wenn das Ergebnis laut Hochrechnung passen kann (mit Reserve für Ausreißerzeilen)
+    if _estimate_csv_chars(df) <= 2 * token_budget * CHARS_PER_TOKEN:
+        full_csv = _compact_frame(df).to_csv(index=False)
+        if estimate_tokens(full_csv) <= token_budget:
+            return full_csv
+
+    numeric_columns = get_numeric_columns(df)
+    # Aggregate und Gruppensummen ohne ROLLUP-Gesamtzeilen, sonst zählen die Werte doppelt
+    data_rows = drop_total_rows(df)
+    total_rows = len(df) - len(data_rows)
+    header = (
+        f"ZUSAMMENFASSUNG (Ergebnis zu groß für vollständige Übergabe)\n"
+        f"Zeilen gesamt: {len(df)}\n"
+        f"Spalten: {', '.join(map(str, df.columns))}\n"
+    )
+    if total_rows:
+        header += f"Gesamt-/Zwischensummenzeilen (ROLLUP), nicht in Aggregaten und Summen enthalten: {total_rows}\n"
+    header += "\n"
+    aggregates = _column_aggregates(data_rows, numeric_columns)
+    group_totals = _group_totals(data_rows, numeric_columns, int(token_budget * GROUP_TOTALS_BUDGET_SHARE) * CHARS_PER_TOKEN)
+    summary = header
+    if aggregates:
+        summary += f"Aggregate je Kennzahl:\n{aggregates}\n"
+    if group_totals:
+        summary += f"{group_totals}\n"
+
+    # Stichprobe so groß wählen, wie das restliche Budget erlaubt (Halbierung bis es passt)
+    remaining_chars = max(token_budget - estimate_tokens(summary), 0) * CHARS_PER_TOKEN
+    sample_size = min(20, len(df) // 2)
+    while sample_size > 0:
+        head_csv = _compact_frame(df.head(sample_size)).to_csv(index=False)
+        tail_csv = _compact_frame(df.tail(sample_size)).to_csv(index=False, header=False)
+        sample = f"Erste {sample_size} Zeilen:\n{head_csv}\nLetzte {sample_size} Zeilen:\n{tail_csv}"
+        if len(sample) <= remaining_chars:
+            return summary + sample
+        sample_size //= 2
+
+    return summary
@@ -0,0 +1,295 @@
+# result_table.py
+import asyncio
+import contextvars
+import csv
+import datetime
+import decimal
+import functools
+import math
+import os
+import tempfile
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from typing import Iterable, Iterator
+
+import pandas as pd
+from sqlalchemy import text
+from sqlalchemy.exc import SQLAlchemyError
+
+from database_request import DB_FETCH_CHUNK_ROWS, _connect, get_db_engine
+from followup_planner import LOCAL_SQL_HEADER
+from scheduler import PrioritySemaphore
+from session_state import StoredResult
+from tracing import span
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+    _HAS_PYARROW = True
+except ImportError:
+    _HAS_PYARROW = False
+
+# --- Ergebnistabelle (seitenweise) ---
+GRID_PAGE_SIZE = int(os.getenv("GRID_PAGE_SIZE", "50"))
+
+# --- Export (CSV/Parquet) ---
+EXPORT_DIR = os.getenv("EXPORT_DIR", os.path.join(tempfile.gettempdir(), "genai_exports"))
+EXPORT_TTL_SECONDS = float(os.getenv("EXPORT_TTL_SECONDS", "3600"))
+EXPORT_TIMEOUT_SECONDS = float(os.getenv("EXPORT_TIMEOUT_SECONDS", "600"))
+EXPORT_MAX_CONCURRENCY = int(os.getenv("EXPORT_MAX_CONCURRENCY", "2"))
+EXPORT_CSV_DELIMITER = os.getenv("EXPORT_CSV_DELIMITER", ",")
+# Anzeigename -> Dateiendung; Parquet nur, wenn das optionale Paket pyarrow installiert ist
+EXPORT_FORMATS = {"CSV": "csv", "Parquet": "parquet"} if _HAS_PYARROW else {"CSV": "csv"}
+
+
+def get_result_page(entry: StoredResult | None, page: int) -> tuple[pd.DataFrame, str, int]:
+    """
+    Liefert eine Seite des gespeicherten Ergebnisses für die Tabellenansicht. Es wird immer nur
+    die angeforderte Seite an den Browser übertragen.
+
+    :param entry: Das Ergebnis der jüngsten Anfrage (oder None).
+    :param page: Die gewünschte Seite (0-basiert, wird auf den gültigen Bereich begrenzt).
+    :return: Ein Tupel aus den Zeilen der Seite, dem Seitenhinweis und der tatsächlichen Seite.
+    """
+    if entry is None:
+        return pd.DataFrame(), "Kein Ergebnis vorhanden.", 0
+    if entry.frame is None:
+        return pd.DataFrame(), "Das Ergebnis ist zu groß für die Tabellenansicht. Bitte nutzen Sie den Export.", 0
+
+    total_rows = len(entry.frame)
+    page_count = max(math.ceil(total_rows / GRID_PAGE_SIZE), 1)
+    page = min(max(page, 0), page_count - 1)
+    start = page * GRID_PAGE_SIZE
+    end = min(start + GRID_PAGE_SIZE, total_rows)
+    # Decimal- und Datumswerte des Treibers als JSON-taugliche Werte für die Anzeige
+    page_frame = entry.frame.iloc[start:end].map(_display_value)
+
+    info = f"Seite {page + 1} von {page_count} · Zeilen {start + 1 if total_rows else 0}–{end} von {total_rows}"
+    if entry.frame.attrs.get("truncated"):
+        # Lokal beantwortete Nachfragen exportieren nur die Daten der Sitzung
+        info += " · Ergebnis gekürzt" if entry.sql.startswith(LOCAL_SQL_HEADER) else " · Ergebnis gekürzt, vollständige Daten über den Export"
+    return page_frame, info, page
+
+
+def _display_value(value):
+    """
+    Wandelt einen Zellwert für die Tabellenansicht um (Decimal -> float, Datum -> ISO-Text).
+
+    :param value: Der Zellwert.
+    :return: Der darstellbare Wert.
+    """
+    if isinstance(value, decimal.Decimal):
+        return float(value)
+    if isinstance(value, (datetime.date, datetime.datetime)):
+        return value.isoformat()
+    return value
+
+
+def _arrow_schema(columns: list[str], description, first_rows: list[tuple]) -> "pa.Schema":
+    """
+    Bestimmt das Parquet-Schema einmalig für den ganzen Export: aus den Typen des Cursors (pyodbc
+    liefert Python-Typen samt Präzision), sonst aus dem ersten Block. Unbekannte Spalten werden Text.
+
+    :param columns: Die Spaltennamen.
+    :param description: Die Cursor-Beschreibung (DB-API) oder None.
+    :param first_rows: Die Zeilen des ersten Blocks.
+    :return: Das Schema.
+    """
+    python_types = {
+        str: pa.string(),
+        int: pa.int64(),
+        float: pa.float64(),
+        bool: pa.bool_(),
+        datetime.datetime: pa.timestamp("us"),
+        datetime.date: pa.date32(),
+        bytes: pa.binary(),
+        bytearray: pa.binary(),
+    }
+    fields = []
+    for index, column in enumerate(columns):
+        type_code = description[index][1] if description else None
+        if type_code is decimal.Decimal:
+            precision, scale = description[index][4], description[index][5]
+            arrow_type = pa.decimal128(min(max(precision or 38, 1), 38), scale or 0)
+        elif type_code in python_types:
+            arrow_type = python_types[type_code]
+        else:
+            arrow_type = pa.array([row[index] for row in first_rows], from_pandas=True).type if first_rows else pa.null()
+        if pa.types.is_null(arrow_type):
+            arrow_type = pa.string()
+        fields.append(pa.field(str(column), arrow_type))
+    return pa.schema(fields)
+
+
+def _write_chunks(file_path: str, file_format: str, columns: list[str], chunks: Iterable[list[tuple]], description=None, cancelled: threading.Event | None = None) -> int:
+    """
+    Schreibt Zeilenblöcke nacheinander in eine CSV- oder Parquet-Datei. Es liegt immer nur ein Block
+    im Speicher (Parquet: eine Row Group je Block).
+
+    :param file_path: Die Zieldatei.
+    :param file_format: "csv" oder "parquet".
+    :param columns: Die Spaltennamen.
+    :param chunks: Die Zeilenblöcke.
+    :param description: Die Cursor-Beschreibung für das Parquet-Schema (optional).
+    :param cancelled: Abbruchsignal (z.B. nach Zeitüberschreitung), wird vor jedem Block geprüft.
+    :return: Die Anzahl der geschriebenen Zeilen.
+    """
+    rows_written = 0
+    if file_format == "csv":
+        with open(file_path, "w", newline="", encoding="utf-8") as file:
+            writer = csv.writer(file, delimiter=EXPORT_CSV_DELIMITER)
+            writer.writerow(columns)
+            for rows in chunks:
+                if cancelled is not None and cancelled.is_set():
+                    raise TimeoutError("Export abgebrochen.")
+                writer.writerows(rows)
+                rows_written += len(rows)
+        return rows_written
+
+    parquet_writer = None
+    try:
+        for rows in chunks:
+            if cancelled is not None and cancelled.is_set():
+                raise TimeoutError("Export abgebrochen.")
+            if parquet_writer is None:
+                schema = _arrow_schema(columns, description, rows)
+                parquet_writer = pq.ParquetWriter(file_path, schema)
+            arrays = [pa.array(values, type=field.type, from_pandas=True) for values, field in zip(zip(*rows), schema)]
+            parquet_writer.write_table(pa.Table.from_arrays(arrays, schema=schema))
+            rows_written += len(rows)
+        if parquet_writer is None:
+            # Leeres Ergebnis: Datei nur mit Schema
+            schema = _arrow_schema(columns, description, [])
+            parquet_writer = pq.ParquetWriter(file_path, schema)
+    finally:
+        if parquet_writer is not None:
+            parquet_writer.close()
+    return rows_written
+
+
+def _cursor_chunks(result) -> Iterator[list[tuple]]:
+    """
+    Liest ein Abfrageergebnis blockweise vom Server-Cursor.
+
+    :param result: Das Ergebnis von execute() mit stream_results.
+    :return: Ein Iterator über Zeilenblöcke mit höchstens DB_FETCH_CHUNK_ROWS Zeilen.
+    """
+    while rows := result.fetchmany(DB_FETCH_CHUNK_ROWS):
+        yield [tuple(row) for row in rows]
+
+
+def _frame_chunks(frame: pd.DataFrame) -> Iterator[list[tuple]]:
+    """
+    Zerlegt ein gespeichertes Ergebnis in Zeilenblöcke.
+
+    :param frame: Das Ergebnis.
+    :return: Ein Iterator über Zeilenblöcke mit höchstens DB_FETCH_CHUNK_ROWS Zeilen.
+    """
+    for start in range(0, len(frame), DB_FETCH_CHUNK_ROWS):
+        chunk = frame.iloc[start:start + DB_FETCH_CHUNK_ROWS].astype(object)
+        # Fehlende Werte wie NULL vom Server schreiben (leere CSV-Zelle statt "nan")
+        yield list(chunk.where(chunk.notna(), None).itertuples(index=False, name=None))
+
+
+def _remove_expired_exports() -> None:
+    """Löscht Exportdateien, die älter als EXPORT_TTL_SECONDS sind."""
+    expires_before = time.time() - EXPORT_TTL_SECONDS
+    for name in os.listdir(EXPORT_DIR):
+        file_path = os.path.join(EXPORT_DIR, name)
+        try:
+            if os.path.getmtime(file_path) < expires_before:
+                os.remove(file_path)
+        except OSError:
+            pass
+
+
+def export_result(entry: StoredResult, file_format: str, cancelled: threading.Event | None = None) -> str:
+    """
+    Exportiert das Ergebnis einer Anfrage als CSV- oder Parquet-Datei, ohne Umweg über den Interpreter-Agenten.
+    Vollständig gespeicherte Ergebnisse (auch lokal beantwortete Nachfragen) werden aus der Sitzung
+    geschrieben; gekürzte oder zu große Ergebnisse werden ohne das Zeilenlimit der SQL-Prüfung (entry.export_sql)
+    erneut ausgeführt und blockweise direkt vom Server-Cursor in die Datei gestreamt, sodass der Speicherbedarf
+    unabhängig von der Exportgröße bleibt.
+
+    :param entry: Das Ergebnis der jüngsten Anfrage.
+    :param file_format: "csv" oder "parquet".
+    :param cancelled: Abbruchsignal für lange Exporte.
+    :return: Der Pfad der Exportdatei oder eine Fehlermeldung, die mit "FEHLER" beginnt.
+    """
+    with span("export", format=file_format) as export_span:
+        if file_format == "parquet" and not _HAS_PYARROW:
+            export_span.status = "error"
+            return "FEHLER: Der Parquet-Export benötigt das Paket 'pyarrow'. Bitte wählen Sie CSV."
+
+        os.makedirs(EXPORT_DIR, exist_ok=True)
+        _remove_expired_exports()
+        file_path = os.path.join(EXPORT_DIR, f"ergebnis_{time.strftime('%Y%m%d_%H%M%S')}_{uuid.uuid4().hex[:8]}.{file_format}")
+        # Erst nach vollständigem Schreiben unter dem endgültigen Namen ablegen
+        partial_path = file_path + ".part"
+
+        from_session = entry.frame is not None and (entry.sql.startswith(LOCAL_SQL_HEADER) or not entry.frame.attrs.get("truncated"))
+        try:
+            if from_session:
+                columns = [str(column) for column in entry.frame.columns]
+                rows_written = _write_chunks(partial_path, file_format, columns, _frame_chunks(entry.frame), cancelled=cancelled)
+                export_span.set(source="session")
+            else:
+                if not entry.export_sql.strip().upper().startswith("SELECT"):
+                    export_span.status = "error"
+                    return "FEHLER: Nur SELECT-Abfragen können exportiert werden."
+                engine = get_db_engine()
+                if engine is None:
+                    export_span.status = "error"
+                    return "FEHLER: Export aufgrund fehlender Datenbankverbindung nicht möglich."
+                with _connect(engine) as connection:
+                    result = connection.execution_options(stream_results=True).execute(text(entry.export_sql))
+                    columns = [str(column) for column in result.keys()]
+                    rows_written = _write_chunks(
+                        partial_path, file_format, columns, _cursor_chunks(result), result.cursor.description, cancelled
+                    )
+                export_span.set(source="server")
+            os.replace(partial_path, file_path)
+        except TimeoutError:
+            export_span.status = "error"
+            return f"FEHLER: Der Export hat das Zeitlimit von {EXPORT_TIMEOUT_SECONDS:.0f} Sekunden überschritten."
+        except (SQLAlchemyError, OSError, ValueError, TypeError) as e:
+            print(f"Detaillierter Exportfehler (nur für Debugging): {e}")
+            export_span.status = "error"
+            return "FEHLER: Das Ergebnis konnte nicht exportiert werden."
+        finally:
+            if os.path.exists(partial_path):
+                os.remove(partial_path)
+
+        export_span.set(rows=rows_written, file_bytes=os.path.getsize(file_path))
+        return file_path
+
+
+_export_executor = ThreadPoolExecutor(max_workers=EXPORT_MAX_CONCURRENCY, thread_name_prefix="export-worker")
+# Eigener Limiter, damit lange Exporte keine Plätze der interaktiven Abfragen belegen
+export_limiter = PrioritySemaphore("export", EXPORT_MAX_CONCURRENCY)
+
+
+async def async_export_result(entry: StoredResult, file_format: str) -> str:
+    """
+    Führt export_result in einem eigenen Worker-Pool aus, ohne die Event-Loop zu blockieren.
+
+    :param entry: Das Ergebnis der jüngsten Anfrage.
+    :param file_format: "csv" oder "parquet".
+    :return: Der Pfad der Exportdatei oder eine Fehlermeldung, die mit "FEHLER" beginnt.
+    """
+    loop = asyncio.get_running_loop()
+    cancelled = threading.Event()
+    async with export_limiter.slot():
+        try:
+            return await asyncio.wait_for(
+                loop.run_in_executor(_export_executor, functools.partial(contextvars.copy_context().run, export_result, entry, file_format, cancelled)),
+                timeout=EXPORT_TIMEOUT_SECONDS,
+            )
+        except asyncio.TimeoutError:
+            # Der Worker bricht vor dem nächsten Block ab und löscht die Teildatei
+            cancelled.set()
+            error_msg = f"FEHLER: Der Export hat das Zeitlimit von {EXPORT_TIMEOUT_SECONDS:.0f} Sekunden überschritten."
+            print(error_msg)
+            return error_msg
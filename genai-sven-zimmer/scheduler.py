@@ -0,0 +1,117 @@
+# scheduler.py
+import asyncio
+import contextvars
+import heapq
+import itertools
+import time
+from contextlib import asynccontextmanager
+from typing import AsyncIterator
+
+from tracing import metrics
+
+# Niedrigere Zahl = höhere Priorität: schnelle Abfragen vor breiten Analysen
+PRIORITY_QUERY = 0
+PRIORITY_ANALYSIS = 1
+MODE_PRIORITIES = {"Datenbank-Abfrage": PRIORITY_QUERY, "Statistische Analyse": PRIORITY_ANALYSIS}
+
+# Priorität der aktuellen Anfrage; wird von allen Stufen-Limits derselben Pipeline übernommen
+current_priority: contextvars.ContextVar[int] = contextvars.ContextVar("current_priority", default=PRIORITY_QUERY)
+
+
+class QueueFullError(Exception):
+    """Die Warteschlange ist voll oder die maximale Wartezeit wurde überschritten."""
+
+
+class PrioritySemaphore:
+    """
+    Begrenzt die gleichzeitige Nutzung einer Ressource (LLM, Datenbank, Whisper). Wartende werden
+    nach Priorität und danach in Ankunftsreihenfolge bedient. Optional ist die Warteschlange begrenzt.
+    """
+
+    def __init__(self, name: str, limit: int, max_queued: int | None = None, max_wait_seconds: float | None = None):
+        self.name = name
+        self.limit = limit
+        self.max_queued = max_queued
+        self.max_wait_seconds = max_wait_seconds
+        self.active = 0
+        self.queued = 0
+        self.rejected = 0
+        self._waiters: list[tuple[int, int, asyncio.Future]] = []
+        self._sequence = itertools.count()
+
+        metrics.register_gauge(f"genai_{name}_active", f"Laufende Aufrufe ({name}).", lambda: self.active)
+        metrics.register_gauge(f"genai_{name}_queue_depth", f"Wartende Aufrufe ({name}).", lambda: self.queued)
+        metrics.register_gauge(f"genai_{name}_rejected", f"Abgewiesene Aufrufe ({name}) seit dem Start.", lambda: self.rejected)
+
+    def has_capacity(self) -> bool:
+        """
+        Prüft, ob ein Aufruf sofort ohne Wartezeit starten kann.
+
+        :return: True, wenn ein Platz frei ist und niemand wartet.
+        """
+        return self.active < self.limit and self.queued == 0
+
+    async def acquire(self, priority: int | None = None) -> None:
+        """
+        Belegt einen Platz; wartet bei Bedarf in der Prioritätswarteschlange.
+
+        :param priority: Die Priorität (Standard: Priorität der aktuellen Anfrage).
+        :raises QueueFullError: Wenn die Warteschlange voll ist oder die maximale Wartezeit überschritten wird.
+        """
+        priority = current_priority.get() if priority is None else priority
+        started_at = time.perf_counter()
+        if self.has_capacity():
+            self.active += 1
+            metrics.observe_duration(f"queue_wait_{self.name}", 0.0)
+            return
+        if self.max_queued is not None and self.queued >= self.max_queued:
+            self.rejected += 1
+            raise QueueFullError(f"Warteschlange '{self.name}' ist voll ({self.queued} wartende Anfragen).")
+
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._waiters, (priority, next(self._sequence), future))
+        self.queued += 1
+        try:
+            await asyncio.wait_for(future, timeout=self.max_wait_seconds)
+        except asyncio.TimeoutError:
+            self.rejected += 1
+            metrics.observe_duration(f"queue_wait_{self.name}", time.perf_counter() - started_at, status="rejected")
+            raise QueueFullError(f"Maximale Wartezeit von {self.max_wait_seconds:g} Sekunden in '{self.name}' überschritten.")
+        except asyncio.CancelledError:
+            # Der Platz wurde bereits übergeben, der Aufrufer ist aber weg -> sofort weitergeben
+            if future.done() and not future.cancelled():
+                self.release()
+            raise
+        finally:
+            self.queued -= 1
+        metrics.observe_duration(f"queue_wait_{self.name}", time.perf_counter() - started_at)
+
+    def release(self) -> None:
+        """Gibt einen Platz frei und übergibt ihn direkt an den wichtigsten noch Wartenden."""
+        while self._waiters:
+            _, _, future = heapq.heappop(self._waiters)
+            if not future.done():
+                future.set_result(True)
+                return
+        self.active -= 1
+
+    @asynccontextmanager
+    async def slot(self, priority: int | None = None) -> AsyncIterator[None]:
+        """
+        Belegt einen Platz für die Dauer des with-Blocks.
+
+        :param priority: Die Priorität (Standard: Priorität der aktuellen Anfrage).
+        """
+        await self.acquire(priority)
+        try:
+            yield
+        finally:
+            self.release()
+
+    def stats(self) -> dict:
+        """
+        Gibt die aktuelle Auslastung zurück.
+
+        :return: Ein Dictionary mit Limit, laufenden, wartenden und abgewiesenen Aufrufen.
+        """
+        return {"limit": self.limit, "active": self.active, "queued": self.queued, "rejected": self.rejected}
@@ -0,0 +1,247 @@
+# schema_pruner.py
+import os
+import re
+from collections import defaultdict
+
+from intent_parser import CATEGORY_SYNONYMS, CHANNEL_SYNONYMS, COUNTRY_SYNONYMS, GROUP_SYNONYMS, STOPWORDS
+from result_encoder import estimate_tokens
+from tracing import span
+
+SCHEMA_PRUNING_ENABLED = os.getenv("SCHEMA_PRUNING_ENABLED", "true").lower() in ("1", "true", "yes")
+NGRAM_SIZE = 3
+# Mindest-Ähnlichkeit (Jaccard über Zeichen-Trigramme) zwischen einem Wort der Frage und einem Index-Wort
+MIN_TOKEN_SIMILARITY = float(os.getenv("SCHEMA_PRUNING_MIN_SIMILARITY", "0.6"))
+# Wörter, die in mehr als diesem Anteil der Einträge vorkommen ("Modell", "Gear", "28"), sind nicht trennscharf
+MAX_TOKEN_SHARE = 0.25
+
+# Basistabellen für Monats-Abfragen (Regel 4.3 des SQL-Prompts) werden immer mitgegeben
+ALWAYS_INCLUDED_TABLES = {"DataSet_Monthly_Sales", "Dim_Product"}
+TABLE_KEYWORDS = {
+    "Facts_Daily_Sales": ["tag", "tage", "tagen", "täglich", "tagesgenau", "datum", "woche", "wochen", "daily", "day", "days", "date", "week"],
+}
+DAILY_DATE_PATTERN = re.compile(r"\b\d{4}-\d{2}-\d{2}\b|\b\d{1,2}\.\s*(?:\d{1,2}\.|[a-zäöü]+)")
+
+CATALOG_LINE = re.compile(r"^- \*\*(.+?):\*\* (.*)$")
+TABLE_LINE = re.compile(r"CREATE TABLE \[dbo\]\.\[(\w+)\] \((.*)\)")
+QUOTED_VALUE = re.compile(r'"((?:[^"]|"")*)"')
+COLUMN_NAME = re.compile(r"\[(\w+)\] [A-Z]")
+
+# Die Vorauswahl ist unscharf (Tippfehler, Teilnamen): ein fehlender Eintrag ist kein Beleg, dass es das Produkt nicht gibt
+CATALOG_NOTE = (
+    "- Hinweis: Es sind nur die zur Frage vorausgewählten Einträge aufgeführt, nicht der vollständige Katalog. "
+    "Fehlt ein in der Frage genanntes Produkt hier (z.B. wegen eines Tippfehlers oder eines Teilnamens), "
+    "ist es nur nicht vorausgewählt. Melde deshalb KEIN ungültiges Produkt, sondern filtere mit "
+    "`p.Material_Description LIKE '%<Name>%'`.\n"
+)
+
+
+def _tokenize(text: str) -> list[str]:
+    """
+    Zerlegt einen Text in kleingeschriebene Wörter (Unterstriche trennen ebenfalls).
+
+    :param text: Der Text, z.B. eine Frage oder ein Produktname.
+    :return: Die Wörter ohne Satzzeichen.
+    """
+    return re.findall(r"[0-9a-zäöüß]+", text.lower().replace("_", " "))
+
+
+def _ngrams(token: str) -> set[str]:
+    """
+    Bildet die Zeichen-N-Gramme eines Wortes (mit Randmarkierung, damit kurze Wörter nicht leer bleiben).
+
+    :param token: Das Wort.
+    :return: Die Menge der N-Gramme.
+    """
+    padded = f" {token} "
+    return {padded[index:index + NGRAM_SIZE] for index in range(len(padded) - NGRAM_SIZE + 1)}
+
+
+def _entry_kind(entry: tuple[str, str]) -> tuple[str, bool]:
+    """
+    Bestimmt die Art eines Eintrags (Abschnitt und ob es ein einzelnes Produkt ist).
+
+    :param entry: Der Eintrag als (Abschnitt, Schlüssel).
+    :return: Die Eintragsart, z.B. ('3.3', True) für ein Produkt.
+    """
+    section, key = entry
+    return section, "|" in key
+
+
+def _quote(value: str) -> str:
+    """
+    Setzt einen Produktnamen wieder in doppelte Anführungszeichen (eingebettete Anführungszeichen werden verdoppelt).
+
+    :param value: Der Produktname.
+    :return: Der zitierte Produktname.
+    """
+    return '"' + value.replace('"', '""') + '"'
+
+
+class SchemaPruner:
+    """Lexikalischer N-Gramm-Index über den Datenbank-Kontext, der je Frage nur die relevanten Einträge auswählt."""
+
+    def __init__(self, context_sections: dict[str, str]):
+        self.context_sections = context_sections
+        self.full_context = "\n".join(context_sections.values())
+        self.full_tokens = estimate_tokens(self.full_context)
+        # Einträge: (Abschnitt, Schlüssel) -> Suchwörter
+        self._entry_tokens: dict[tuple[str, str], set[str]] = {}
+        self._catalog: dict[str, list[str]] = {}
+        self._tables: dict[str, str] = {}
+        self._build_entries()
+        self._build_index()
+
+    def _add_entry(self, section: str, key: str, texts: list[str]) -> None:
+        """
+        Registriert einen Eintrag mit allen Texten, unter denen er gefunden werden soll.
+
+        :param section: Die Abschnittsnummer (z.B. '3.3').
+        :param key: Der Schlüssel des Eintrags (Kategorie, Produkt oder Tabelle).
+        :param texts: Die Suchtexte (Name, Synonyme, Spaltennamen).
+        """
+        tokens = self._entry_tokens.setdefault((section, key), set())
+        for text in texts:
+            tokens.update(token for token in _tokenize(text) if token not in STOPWORDS)
+
+    def _build_entries(self) -> None:
+        """Zerlegt Produktkatalog (3.3) und Schema (3.4) in einzelne, durchsuchbare Einträge."""
+        synonyms_by_value = defaultdict(list)
+        for synonyms in (CATEGORY_SYNONYMS, COUNTRY_SYNONYMS, CHANNEL_SYNONYMS):
+            for phrase, value in synonyms.items():
+                synonyms_by_value[value].append(phrase)
+        synonyms_by_column = defaultdict(list)
+        for phrase, column in GROUP_SYNONYMS.items():
+            synonyms_by_column[column.split(".")[-1]].append(phrase)
+
+        for line in self.context_sections.get("3.3", "").splitlines():
+            match = CATALOG_LINE.match(line)
+            if not match:
+                continue
+            category = match.group(1)
+            products = [product.replace('""', '"') for product in QUOTED_VALUE.findall(match.group(2))]
+            self._catalog[category] = products
+            self._add_entry("3.3", category, [category, *synonyms_by_value[category]])
+            for product in products:
+                self._add_entry("3.3", f"{category}|{product}", [product])
+
+        for line in self.context_sections.get("3.4", "").splitlines():
+            match = TABLE_LINE.search(line)
+            if not match:
+                continue
+            table = match.group(1)
+            columns = COLUMN_NAME.findall(match.group(2))
+            self._tables[table] = line
+            column_synonyms = [phrase for column in columns for phrase in synonyms_by_column[column]]
+            self._add_entry("3.4", table, [table, *TABLE_KEYWORDS.get(table, []), *column_synonyms])
+
+    def _build_index(self) -> None:
+        """Baut den invertierten Index N-Gramm -> Wörter und bestimmt die trennscharfen Wörter je Abschnitt."""
+        self._ngram_index: dict[str, set[str]] = defaultdict(set)
+        self._token_entries: dict[str, set[tuple[str, str]]] = defaultdict(set)
+        entries_per_kind = defaultdict(int)
+        for entry, tokens in self._entry_tokens.items():
+            entries_per_kind[_entry_kind(entry)] += 1
+            for token in tokens:
+                self._token_entries[token].add(entry)
+                for ngram in _ngrams(token):
+                    self._ngram_index[ngram].add(token)
+
+        # Allgemeine Wörter einer Eintragsart (z.B. "modell" bei Produkten, "bikes" bei Kategorien) tragen nicht zur Auswahl bei
+        self._discriminative: set[tuple[tuple[str, bool], str]] = set()
+        for token, entries in self._token_entries.items():
+            counts = defaultdict(int)
+            for entry in entries:
+                counts[_entry_kind(entry)] += 1
+            for kind, count in counts.items():
+                if count <= max(1, MAX_TOKEN_SHARE * entries_per_kind[kind]):
+                    self._discriminative.add((kind, token))
+
+    def match_entries(self, question: str) -> set[tuple[str, str]]:
+        """
+        Sucht alle Einträge, deren trennscharfe Wörter einem Wort der Frage ähnlich genug sind.
+
+        :param question: Die Benutzerfrage.
+        :return: Die gefundenen Einträge als (Abschnitt, Schlüssel).
+        """
+        matched = set()
+        for question_token in set(_tokenize(question)) - STOPWORDS:
+            question_ngrams = _ngrams(question_token)
+            candidates = set().union(*(self._ngram_index.get(ngram, set()) for ngram in question_ngrams))
+            for token in candidates:
+                token_ngrams = _ngrams(token)
+                similarity = len(question_ngrams & token_ngrams) / len(question_ngrams | token_ngrams)
+                if similarity < MIN_TOKEN_SIMILARITY:
+                    continue
+                matched.update(entry for entry in self._token_entries[token] if (_entry_kind(entry), token) in self._discriminative)
+        return matched
+
+    def _render_catalog(self, matched: set[tuple[str, str]]) -> str:
+        """
+        Erzeugt den gekürzten Produktkatalog: bei genannten Produkten nur diese, bei genannten Kategorien die ganze Kategorie.
+
+        :param matched: Die gefundenen Einträge.
+        :return: Der Abschnittstext 3.3.
+        """
+        heading = self.context_sections["3.3"].splitlines()[0]
+        section = heading + "\n"
+        for category, products in self._catalog.items():
+            matched_products = [product for product in products if ("3.3", f"{category}|{product}") in matched]
+            if not matched_products and ("3.3", category) in matched:
+                matched_products = products
+            if matched_products:
+                section += f"- **{category}:** {', '.join(_quote(product) for product in matched_products)}\n"
+        return section + CATALOG_NOTE
+
+    def _render_tables(self, question: str, matched: set[tuple[str, str]]) -> str:
+        """
+        Erzeugt den gekürzten Schema-Abschnitt mit den Basistabellen und den zur Frage passenden Tabellen.
+
+        :param question: Die Benutzerfrage (für die Erkennung konkreter Tagesdaten).
+        :param matched: Die gefundenen Einträge.
+        :return: Der Abschnittstext 3.4.
+        """
+        lines = self.context_sections["3.4"].splitlines()
+        kept = [lines[0]]
+        for line in lines[1:]:
+            match = TABLE_LINE.search(line)
+            if match is None:
+                kept.append(line)
+                continue
+            table = match.group(1)
+            if table in ALWAYS_INCLUDED_TABLES or ("3.4", table) in matched:
+                kept.append(line)
+            elif table in TABLE_KEYWORDS and DAILY_DATE_PATTERN.search(question.lower()):
+                kept.append(line)
+        return "\n".join(kept) + "\n"
+
+    def prune(self, question: str) -> str:
+        """
+        Liefert den für eine Frage relevanten Datenbank-Kontext. Zeitrahmen (3.1) und gültige
+        Dimensionswerte (3.2) bleiben vollständig, da der Agent jeden Filterwert dagegen prüfen muss.
+
+        :param question: Die Benutzerfrage.
+        :return: Der gekürzte Datenbank-Kontext.
+        """
+        with span("schema_pruning", full_tokens=self.full_tokens) as pruning_span:
+            matched = self.match_entries(question)
+            sections = []
+            for name, text in self.context_sections.items():
+                if name == "3.3" and self._catalog:
+                    sections.append(self._render_catalog(matched))
+                elif name == "3.4" and self._tables:
+                    sections.append(self._render_tables(question, matched))
+                else:
+                    sections.append(text)
+            pruned_context = "\n".join(sections)
+            pruning_span.set(matched_entries=len(matched), tokens=estimate_tokens(pruned_context))
+            return pruned_context
+
+    def build_agent_input(self, agent_prompt: str, question: str) -> str:
+        """
+        Stellt die Eingabe für den SQL-Agenten zusammen: gekürzter Datenbank-Kontext, danach der eigentliche Auftrag.
+
+        :param agent_prompt: Der Auftrag an den SQL-Agenten.
+        :param question: Die ursprüngliche Benutzerfrage (Basis für die Auswahl).
+        :return: Die vollständige Agenten-Eingabe.
+        """
+        return f"### DATABASE CONTEXT\n\n{self.prune(question)}\n{agent_prompt}"
@@ -0,0 +1,105 @@
+# session_state.py
+import contextvars
+import os
+from collections import OrderedDict
+
+import pandas as pd
+
+SESSION_MAX_RESULTS = int(os.getenv("SESSION_MAX_RESULTS", "5"))
+SESSION_MAX_BYTES = int(os.getenv("SESSION_MAX_BYTES", str(32 * 1024 * 1024)))
+SESSION_TTL_SECONDS = float(os.getenv("SESSION_TTL_SECONDS", "1800"))
+
+
+class StoredResult:
+    """Ein Ergebnis einer früheren Anfrage der Sitzung (Frage, SQL-Code und DataFrame)."""
+
+    def __init__(self, question: str, sql: str, frame: pd.DataFrame, export_sql: str | None = None):
+        self.question = question
+        self.sql = sql
+        # SQL-Code für den Export: ohne das Zeilenlimit der SQL-Prüfung, damit gekürzte Ergebnisse vollständig exportiert werden
+        self.export_sql = export_sql if export_sql is not None else sql
+        # None, wenn das Ergebnis zu groß für den Sitzungsspeicher war (Export dann direkt per SQL)
+        self.frame: pd.DataFrame | None = frame
+        self.size_bytes = int(frame.memory_usage(index=False, deep=True).sum())
+
+
+class ResultSink:
+    """Nimmt das Ergebnis-DataFrame einer Pipeline-Ausführung auf, damit die Sitzung es speichern kann."""
+
+    def __init__(self):
+        self.sql: str | None = None
+        self.frame: pd.DataFrame | None = None
+        self.export_sql: str | None = None
+
+    def put(self, sql: str, frame: pd.DataFrame, export_sql: str | None = None) -> None:
+        """
+        Übernimmt SQL-Code und Ergebnis der Pipeline.
+
+        :param sql: Der ausgeführte SQL-Code.
+        :param frame: Das Ergebnis der Datenbankabfrage.
+        :param export_sql: Der SQL-Code ohne Zeilenlimit für den Export (None = wie sql).
+        """
+        self.sql = sql
+        self.frame = frame
+        self.export_sql = export_sql
+
+
+# Ablage der laufenden Anfrage; gesetzt im gemeinsamen Pipeline-Task (siehe app.run_shared_pipeline)
+result_sink: contextvars.ContextVar[ResultSink | None] = contextvars.ContextVar("result_sink", default=None)
+
+
+class SessionResults:
+    """
+    Die letzten Ergebnisse einer Gradio-Sitzung für Nachfragen. Begrenzt auf SESSION_MAX_RESULTS
+    Einträge und SESSION_MAX_BYTES Speicher; die ältesten Ergebnisse werden zuerst verdrängt.
+    """
+
+    def __init__(self, max_results: int = SESSION_MAX_RESULTS, max_bytes: int = SESSION_MAX_BYTES):
+        self.max_results = max_results
+        self.max_bytes = max_bytes
+        self.current_bytes = 0
+        self._entries: OrderedDict[int, StoredResult] = OrderedDict()
+        self._next_id = 0
+        # Ergebnis der jüngsten Anfrage für Tabelle und Export (None, wenn sie kein Ergebnis geliefert hat)
+        self.shown: StoredResult | None = None
+
+    def add(self, question: str, sql: str, frame: pd.DataFrame, export_sql: str | None = None) -> StoredResult:
+        """
+        Speichert ein Ergebnis als jüngsten Eintrag und verdrängt bei Bedarf ältere.
+        Ergebnisse, die allein das Speicherlimit überschreiten, werden nur mit ihrem SQL-Code gemerkt.
+
+        :param question: Die (vollständige) Frage, die zu dem Ergebnis geführt hat.
+        :param sql: Der SQL-Code des Ergebnisses.
+        :param frame: Das Ergebnis.
+        :param export_sql: Der SQL-Code ohne Zeilenlimit für den Export (None = wie sql).
+        :return: Der neue Eintrag.
+        """
+        entry = StoredResult(question, sql, frame, export_sql)
+        self.shown = entry
+        if entry.size_bytes > self.max_bytes:
+            print(f"Ergebnis zu groß für den Sitzungsspeicher ({entry.size_bytes} Bytes).")
+            entry.frame = None
+            # Nachfragen dürfen sich nicht auf ein älteres Ergebnis beziehen
+            self._entries.clear()
+            self.current_bytes = 0
+            return entry
+        self._entries[self._next_id] = entry
+        self._next_id += 1
+        self.current_bytes += entry.size_bytes
+        while len(self._entries) > self.max_results or self.current_bytes > self.max_bytes:
+            _, evicted = self._entries.popitem(last=False)
+            self.current_bytes -= evicted.size_bytes
+        return entry
+
+    def latest(self) -> StoredResult | None:
+        """
+        Liefert das jüngste Ergebnis der Sitzung.
+
+        :return: Das Ergebnis oder None, wenn noch keines gespeichert ist.
+        """
+        if not self._entries:
+            return None
+        return next(reversed(self._entries.values()))
+
+    def __len__(self) -> int:
+        return len(self._entries)
@@ -0,0 +1,114 @@
+# single_flight.py
+import asyncio
+from typing import Any, AsyncIterator, Awaitable, Callable, Hashable
+
+
+class _SharedStream:
+    """Zustand eines gemeinsam genutzten Update-Streams: immer nur das jüngste (kumulierte) Update."""
+
+    def __init__(self):
+        self.latest: Any = None
+        self.version = 0
+        self.done = False
+        self.error: BaseException | None = None
+        self.condition = asyncio.Condition()
+
+
+class SingleFlight:
+    """
+    Bündelt gleichzeitige, identische Aufrufe: Solange ein Aufruf mit demselben Schlüssel läuft,
+    warten weitere Aufrufer auf dessen Ergebnis, statt die Arbeit erneut auszuführen.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self.executions = 0
+        self.coalesced = 0
+        self._calls: dict[Hashable, asyncio.Task] = {}
+        self._streams: dict[Hashable, _SharedStream] = {}
+
+    async def run(self, key: Hashable, factory: Callable[[], Awaitable[Any]]) -> Any:
+        """
+        Führt factory() höchstens einmal gleichzeitig je Schlüssel aus.
+        Die Ausführung läuft als eigener Task weiter, auch wenn der erste Aufrufer abbricht.
+
+        :param key: Der Schlüssel identischer Aufrufe.
+        :param factory: Erzeugt die auszuführende Coroutine.
+        :return: Das (gemeinsame) Ergebnis.
+        """
+        task = self._calls.get(key)
+        if task is not None:
+            self.coalesced += 1
+        else:
+            self.executions += 1
+            task = asyncio.ensure_future(factory())
+            self._calls[key] = task
+            task.add_done_callback(lambda _: self._calls.pop(key, None))
+        return await asyncio.shield(task)
+
+    async def stream(self, key: Hashable, factory: Callable[[], AsyncIterator[Any]]) -> AsyncIterator[Any]:
+        """
+        Teilt einen Update-Stream (z.B. eine Pipeline aus app.py) zwischen gleichzeitigen, identischen Anfragen.
+        Nachzügler erhalten zuerst das jüngste Update und danach alle weiteren. Da die Updates kumuliert sind
+        (bisheriger Antworttext), gehen dabei keine Inhalte verloren.
+
+        :param key: Der Schlüssel identischer Anfragen.
+        :param factory: Erzeugt den auszuführenden asynchronen Generator.
+        :return: Ein asynchroner Iterator über die Updates.
+        """
+        shared = self._streams.get(key)
+        if shared is not None:
+            self.coalesced += 1
+        else:
+            self.executions += 1
+            shared = _SharedStream()
+            self._streams[key] = shared
+            asyncio.ensure_future(self._pump(key, shared, factory))
+
+        seen_version = 0
+        while True:
+            async with shared.condition:
+                await shared.condition.wait_for(lambda: shared.version != seen_version or shared.done)
+                version, latest, done, error = shared.version, shared.latest, shared.done, shared.error
+            if version != seen_version:
+                seen_version = version
+                yield latest
+            elif done:
+                if error is not None:
+                    raise error
+                return
+
+    async def _pump(self, key: Hashable, shared: _SharedStream, factory: Callable[[], AsyncIterator[Any]]) -> None:
+        """
+        Führt den Generator aus und verteilt jedes Update an alle wartenden Abonnenten.
+
+        :param key: Der Schlüssel des Streams.
+        :param shared: Der gemeinsame Zustand.
+        :param factory: Erzeugt den auszuführenden asynchronen Generator.
+        """
+        try:
+            async for update in factory():
+                async with shared.condition:
+                    shared.latest = update
+                    shared.version += 1
+                    shared.condition.notify_all()
+        except Exception as e:
+            shared.error = e
+        finally:
+            # Ab jetzt starten neue Anfragen eine eigene Ausführung
+            self._streams.pop(key, None)
+            async with shared.condition:
+                shared.done = True
+                shared.condition.notify_all()
+
+    def stats(self) -> dict:
+        """
+        Gibt die Kennzahlen der Bündelung zurück.
+
+        :return: Ein Dictionary mit Ausführungen, gebündelten Aufrufern und aktuell laufenden Aufrufen.
+        """
+        return {
+            "executions": self.executions,
+            "coalesced": self.coalesced,
+            "in_flight": len(self._calls) + len(self._streams),
+        }
@@ -0,0 +1,190 @@
+# sql_cache.py
+import atexit
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+
+# Verzögerung, mit der Änderungen gesammelt im Hintergrund auf die Festplatte geschrieben werden
+SQL_CACHE_FLUSH_SECONDS = float(os.getenv("SQL_CACHE_FLUSH_SECONDS", "2"))
+
+
+def normalize_question(question: str) -> str:
+    """
+    Normalisiert eine Benutzerfrage, damit gleichbedeutende Schreibweisen denselben Cache-Schlüssel ergeben.
+
+    :param question: Die ursprüngliche Benutzerfrage.
+    :return: Die Frage in Kleinbuchstaben, ohne überzählige Leerzeichen und abschließende Satzzeichen.
+    """
+    normalized = question.strip().lower()
+    normalized = re.sub(r"\s+", " ", normalized)
+    return normalized.strip(" .?!\"'")
+
+
+def hash_file(file_path: str) -> str:
+    """
+    Berechnet einen kurzen SHA-256-Hash über den Inhalt einer Datei.
+
+    :param file_path: Pfad zur Datei (z.B. dem System-Prompt).
+    :return: Die ersten 16 Hex-Zeichen des Hashes oder "missing", wenn die Datei fehlt.
+    """
+    try:
+        with open(file_path, "rb") as f:
+            return hashlib.sha256(f.read()).hexdigest()[:16]
+    except OSError:
+        return "missing"
+
+
+class SqlCache:
+    """
+    Persistenter LRU/TTL-Cache für die Zuordnung Frage -> generierter SQL-Code. Geschrieben wird
+    gebündelt in einem Hintergrund-Thread, damit eine langsame Festplatte die Event-Loop nicht blockiert.
+    """
+
+    def __init__(
+        self,
+        file_path: str | None = None,
+        max_entries: int | None = None,
+        ttl_seconds: int | None = None,
+        prompt_file: str = "_systemprompt_sql_agent.txt",
+        flush_seconds: float = SQL_CACHE_FLUSH_SECONDS,
+    ):
+        self.file_path = file_path or os.getenv("SQL_CACHE_FILE", ".cache/sql_cache.json")
+        self.max_entries = max_entries or int(os.getenv("SQL_CACHE_MAX_ENTRIES", "500"))
+        self.ttl_seconds = ttl_seconds or int(os.getenv("SQL_CACHE_TTL_SECONDS", str(7 * 24 * 3600)))
+        self.prompt_hash = hash_file(prompt_file)
+        self.flush_seconds = flush_seconds
+        self.hits = 0
+        self.misses = 0
+        self._entries: OrderedDict[str, dict] = OrderedDict()
+        self._lock = threading.Lock()
+        # Serialisiert die Schreibvorgänge, ohne Lesezugriffe auf den Cache zu blockieren
+        self._save_lock = threading.Lock()
+        self._dirty = False
+        self._flush_timer: threading.Timer | None = None
+        self._load()
+        # Ausstehende Änderungen beim Beenden noch schreiben
+        atexit.register(self.flush)
+
+    def _make_key(self, question: str, mode: str) -> str:
+        """
+        Bildet den Cache-Schlüssel aus Modus, Prompt-Hash und normalisierter Frage.
+
+        :param question: Die Benutzerfrage.
+        :param mode: Der gewählte Modus (z.B. "Datenbank-Abfrage").
+        :return: Der Cache-Schlüssel als Hex-String.
+        """
+        raw_key = f"{mode}|{self.prompt_hash}|{normalize_question(question)}"
+        return hashlib.sha256(raw_key.encode("utf-8")).hexdigest()
+
+    def get(self, question: str, mode: str) -> str | None:
+        """
+        Liefert den gecachten SQL-Code für eine Frage, sofern vorhanden und nicht abgelaufen.
+
+        :param question: Die Benutzerfrage.
+        :param mode: Der gewählte Modus.
+        :return: Der gecachte SQL-Code oder None bei einem Cache-Miss.
+        """
+        key = self._make_key(question, mode)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and time.time() - entry["created_at"] > self.ttl_seconds:
+                del self._entries[key]
+                entry = None
+
+            if entry is None:
+                self.misses += 1
+                return None
+
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry["sql"]
+
+    def put(self, question: str, mode: str, sql: str) -> None:
+        """
+        Speichert generierten SQL-Code im Cache. Auf die Festplatte geschrieben wird spätestens nach
+        flush_seconds im Hintergrund (siehe flush).
+
+        :param question: Die Benutzerfrage.
+        :param mode: Der gewählte Modus.
+        :param sql: Der vom SQL-Agenten generierte SQL-Code.
+        """
+        key = self._make_key(question, mode)
+        with self._lock:
+            self._entries[key] = {"sql": sql, "created_at": time.time()}
+            self._entries.move_to_end(key)
+            # Älteste Einträge verdrängen, wenn die maximale Größe überschritten ist (LRU)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+            self._dirty = True
+            if self._flush_timer is None:
+                self._flush_timer = threading.Timer(self.flush_seconds, self.flush)
+                self._flush_timer.daemon = True
+                self._flush_timer.start()
+
+    def flush(self) -> None:
+        """Schreibt ausstehende Änderungen auf die Festplatte (läuft im Hintergrund-Thread oder beim Beenden)."""
+        with self._save_lock:
+            with self._lock:
+                self._flush_timer = None
+                if not self._dirty:
+                    return
+                self._dirty = False
+                # Flache Kopie genügt: Einträge werden nur ersetzt, nie verändert
+                entries = dict(self._entries)
+            self._save(entries)
+
+    def stats(self) -> dict:
+        """
+        Gibt die aktuellen Cache-Kennzahlen zurück.
+
+        :return: Ein Dictionary mit Treffern, Fehlschlägen, Trefferquote und Anzahl Einträge.
+        """
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / total if total else 0.0,
+                "entries": len(self._entries),
+            }
+
+    def _load(self) -> None:
+        """Lädt den Cache von der Festplatte und verwirft abgelaufene Einträge."""
+        if not os.path.exists(self.file_path):
+            return
+        try:
+            with open(self.file_path, "r", encoding="utf-8") as f:
+                stored_entries = json.load(f)
+        except (OSError, json.JSONDecodeError) as e:
+            print(f"SQL-Cache konnte nicht geladen werden, starte leer: {e}")
+            return
+
+        now = time.time()
+        # Einträge sind nach letzter Verwendung sortiert gespeichert
+        for key, entry in stored_entries.items():
+            if now - entry.get("created_at", 0) <= self.ttl_seconds:
+                self._entries[key] = entry
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+        print(f"SQL-Cache geladen: {len(self._entries)} Einträge aus '{self.file_path}'.")
+
+    def _save(self, entries: dict[str, dict]) -> None:
+        """
+        Schreibt den Cache atomar auf die Festplatte (Aufrufer hält _save_lock).
+
+        :param entries: Die Einträge in LRU-Reihenfolge.
+        """
+        try:
+            directory = os.path.dirname(self.file_path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            tmp_path = f"{self.file_path}.tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(entries, f, ensure_ascii=False)
+            os.replace(tmp_path, self.file_path)
+        except OSError as e:
+            print(f"SQL-Cache konnte nicht gespeichert werden: {e}")
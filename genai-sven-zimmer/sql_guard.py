@@ -0,0 +1,679 @@
+# sql_guard.py
+import os
+import re
+
+# Zeilenlimit, das Abfragen ohne Aggregation und ohne eigenes Limit als TOP n erhalten
+SQL_GUARD_ROW_LIMIT = int(os.getenv("SQL_GUARD_ROW_LIMIT", "10000"))
+
+TOKEN = re.compile(
+    r"(?P<comment>--[^\n]*|/\*.*?\*/)"
+    r"|(?P<string>N?'(?:[^']|'')*')"
+    r"|(?P<identifier>\[[^\]]+\]|\"[^\"]+\"|[A-Za-z_@#][\w@#$]*)"
+    r"|(?P<number>\d+(?:\.\d+)?)"
+    r"|(?P<symbol><>|!=|<=|>=|\S)"
+    r"|(?P<space>\s+)",
+    re.DOTALL,
+)
+# Schreibende oder serverseitig gefährliche Befehle; in generiertem Lese-SQL nie zulässig
+FORBIDDEN_KEYWORDS = {
+    "INSERT", "UPDATE", "DELETE", "MERGE", "DROP", "ALTER", "CREATE", "TRUNCATE", "EXEC", "EXECUTE",
+    "GRANT", "REVOKE", "DENY", "INTO", "OPENROWSET", "OPENQUERY", "OPENDATASOURCE", "BULK", "DBCC",
+    "BACKUP", "RESTORE", "SHUTDOWN", "WAITFOR",
+}
+AGGREGATE_FUNCTIONS = {"SUM", "COUNT", "COUNT_BIG", "AVG", "MIN", "MAX", "STDEV", "STDEVP", "VAR", "VARP", "STRING_AGG"}
+JOIN_MODIFIERS = {"INNER", "LEFT", "RIGHT", "FULL", "OUTER", "CROSS"}
+# Schlüsselwörter, die eine FROM-Liste beenden
+CLAUSE_KEYWORDS = {"WHERE", "GROUP", "HAVING", "ORDER", "UNION", "EXCEPT", "INTERSECT", "OPTION", "FOR", "OFFSET"}
+SET_OPERATORS = {"UNION", "EXCEPT", "INTERSECT"}
+COMPARISON_OPERATORS = {"=", "<>", "!=", "<", ">", "<=", ">="}
+NOT_AN_ALIAS = {"ON", "JOIN", "APPLY", "WITH", *JOIN_MODIFIERS, *CLAUSE_KEYWORDS}
+# Beendet die Spaltenliste einer GROUP BY-Klausel
+GROUP_BY_END = {"HAVING", "ORDER", "OPTION", "WITH", "FOR", *SET_OPERATORS}
+# Zeilen aus Abschnitt 3.2 (Dimensionen) und 3.3 (Produktkatalog) des Datenbank-Kontexts
+DIMENSION_LINE = re.compile(r"^- \*\*`\w+\.(\w+)`:\*\* (.*)$")
+CATALOG_LINE = re.compile(r"^- \*\*(.+?):\*\* (.*)$")
+SINGLE_QUOTED_VALUE = re.compile(r"'((?:[^']|'')*)'")
+DOUBLE_QUOTED_VALUE = re.compile(r'"((?:[^"]|"")*)"')
+# Höchstzahl gültiger Werte, die in einer Fehlermeldung für den SQL-Agenten aufgezählt werden
+MAX_LISTED_VALUES = 12
+
+
+class _Token:
+    """Ein SQL-Token mit Position im Originaltext und Klammertiefe."""
+
+    def __init__(self, kind: str, text: str, start: int, depth: int):
+        self.kind = kind
+        self.text = text
+        self.start = start
+        self.depth = depth
+        # Bezeichner in [..] oder ".." sind nie Schlüsselwörter
+        self.quoted = kind == "identifier" and text[0] in '["'
+        self.value = text[1:-1] if self.quoted else text
+        self.keyword = text.upper() if kind == "identifier" and not self.quoted else None
+
+
+class _Source:
+    """Eine Tabelle oder abgeleitete Tabelle in einer FROM-Liste."""
+
+    def __init__(self, table: str | None, alias: str, join: str, single_row: bool = False):
+        self.table = table
+        self.alias = alias
+        self.join = join
+        self.single_row = single_row
+        self.condition: list[_Token] = []
+
+
+class CheckedQuery:
+    """Ergebnis der SQL-Prüfung: der (ggf. umgeschriebene) SQL-Code oder der Ablehnungsgrund."""
+
+    def __init__(
+        self,
+        sql: str,
+        error: str | None = None,
+        row_limit: int | None = None,
+        rewrites: list[str] | None = None,
+        unlimited_sql: str | None = None,
+    ):
+        self.sql = sql
+        self.error = error
+        # Vom Guard gesetztes Zeilenlimit; erreicht das Ergebnis es, ist es unvollständig
+        self.row_limit = row_limit
+        self.rewrites = rewrites or []
+        # Geprüfter SQL-Code ohne das Zeilenlimit des Guards (für den Export vollständiger Daten)
+        self.unlimited_sql = unlimited_sql if unlimited_sql is not None else sql
+
+
+def parse_dimension_values(context_sections: dict[str, str]) -> dict[str, list[str]]:
+    """
+    Liest die gültigen Filterwerte aus dem Datenbank-Kontext: Dimensionen (3.2) und Produktnamen (3.3).
+
+    :param context_sections: Die Kontextabschnitte aus dem kompilierten Prompt.
+    :return: Zuordnung Spaltenname -> gültige Werte.
+    """
+    dimension_values: dict[str, list[str]] = {}
+    for line in context_sections.get("3.2", "").splitlines():
+        match = DIMENSION_LINE.match(line)
+        if match:
+            values = [value.replace("''", "'") for value in SINGLE_QUOTED_VALUE.findall(match.group(2))]
+            dimension_values[match.group(1)] = values
+    for line in context_sections.get("3.3", "").splitlines():
+        match = CATALOG_LINE.match(line)
+        if match:
+            products = [product.replace('""', '"') for product in DOUBLE_QUOTED_VALUE.findall(match.group(2))]
+            dimension_values.setdefault("Material_Description", []).extend(products)
+    return dimension_values
+
+
+def _string_value(token: _Token) -> str:
+    """
+    Liefert den Inhalt eines String-Literals ('..' oder N'..').
+
+    :param token: Das String-Token.
+    :return: Der unmaskierte Inhalt.
+    """
+    return token.text[token.text.index("'") + 1:-1].replace("''", "'")
+
+
+def tokenize(sql_query: str) -> list[_Token]:
+    """
+    Zerlegt T-SQL in Tokens (ohne Kommentare und Leerraum) und merkt sich die Klammertiefe.
+
+    :param sql_query: Der SQL-Code.
+    :return: Die Tokens in Reihenfolge.
+    """
+    tokens = []
+    depth = 0
+    for match in TOKEN.finditer(sql_query):
+        kind = match.lastgroup
+        if kind in ("comment", "space"):
+            continue
+        if match.group() == ")":
+            depth -= 1
+        tokens.append(_Token(kind, match.group(), match.start(), depth))
+        if match.group() == "(":
+            depth += 1
+    return tokens
+
+
+def _matching_paren(tokens: list[_Token], index: int) -> int:
+    """
+    Sucht die schließende Klammer zur öffnenden Klammer an Position index.
+
+    :param tokens: Die Tokens.
+    :param index: Position der öffnenden Klammer.
+    :return: Position der schließenden Klammer (oder das Ende der Tokenliste).
+    """
+    depth = tokens[index].depth
+    for position in range(index + 1, len(tokens)):
+        if tokens[position].text == ")" and tokens[position].depth == depth:
+            return position
+    return len(tokens)
+
+
+def _is_aggregate_call(tokens: list[_Token], index: int) -> bool:
+    """
+    Prüft, ob an Position index eine Aggregatfunktion aufgerufen wird (Fensterfunktionen mit OVER zählen nicht).
+
+    :param tokens: Die Tokens.
+    :param index: Die Position des Funktionsnamens.
+    :return: True bei einem echten Aggregat.
+    """
+    if tokens[index].keyword not in AGGREGATE_FUNCTIONS or index + 1 >= len(tokens) or tokens[index + 1].text != "(":
+        return False
+    closing = _matching_paren(tokens, index + 1)
+    return not (closing + 1 < len(tokens) and tokens[closing + 1].keyword == "OVER")
+
+
+def _is_single_row_select(tokens: list[_Token], start: int, end: int) -> bool:
+    """
+    Prüft, ob eine Unterabfrage genau eine Zeile liefert (Aggregat ohne GROUP BY), z.B. eine Gesamtsumme.
+
+    :param tokens: Die Tokens.
+    :param start: Position der öffnenden Klammer der Unterabfrage.
+    :param end: Position der schließenden Klammer.
+    :return: True, wenn die Unterabfrage höchstens eine Zeile liefert.
+    """
+    depth = tokens[start].depth + 1
+    inner = [index for index in range(start + 1, end) if tokens[index].depth == depth]
+    if any(tokens[index].keyword in ("GROUP", *SET_OPERATORS) for index in inner):
+        return False
+    return any(_is_aggregate_call(tokens, index) for index in inner)
+
+
+class SqlGuard:
+    """
+    Statische Prüfung von generiertem T-SQL vor der Ausführung: nur einzelne SELECT-Anweisungen,
+    nur bekannte Tabellen und Spalten, keine kartesischen Produkte und ein Zeilenlimit für
+    nicht aggregierende Abfragen.
+    """
+
+    def __init__(
+        self,
+        table_columns: dict[str, list[str]] | None = None,
+        dimension_values: dict[str, list[str]] | None = None,
+        row_limit: int = SQL_GUARD_ROW_LIMIT,
+    ):
+        self.row_limit = row_limit
+        # Ohne generierten Kontext (database_context.json) ist kein vollständiges Schema bekannt
+        self.table_columns = (
+            {table.lower(): {column.lower() for column in columns} for table, columns in table_columns.items()}
+            if table_columns else None
+        )
+        self.known_columns = set().union(*self.table_columns.values()) if self.table_columns else set()
+        # Gültige Werte je Spalte; MSSQL vergleicht standardmäßig ohne Groß-/Kleinschreibung
+        self.dimension_values = {
+            column.lower(): (values, {value.casefold() for value in values})
+            for column, values in (dimension_values or {}).items()
+        }
+
+    def _parse_sources(self, tokens: list[_Token], index: int) -> tuple[list[_Source], int]:
+        """
+        Liest die FROM-Liste ab Position index (erstes Token nach FROM).
+
+        :param tokens: Die Tokens.
+        :param index: Die Startposition.
+        :return: Die Quellen der FROM-Liste und die Position nach ihrem Ende.
+        """
+        depth = tokens[index - 1].depth
+        sources: list[_Source] = []
+        join = "from"
+        while index < len(tokens) and tokens[index].depth >= depth:
+            token = tokens[index]
+            if token.depth > depth:
+                index += 1
+                continue
+            if token.keyword in CLAUSE_KEYWORDS or token.text in (")", ";"):
+                break
+
+            if token.text == "(":
+                closing = _matching_paren(tokens, index)
+                source = _Source(None, "", join, _is_single_row_select(tokens, index, closing))
+                index = closing + 1
+            elif token.kind == "identifier" and token.keyword not in NOT_AN_ALIAS:
+                # [Datenbank.][Schema.]Tabelle: der letzte Namensteil ist die Tabelle
+                name = token.value
+                while index + 2 < len(tokens) and tokens[index + 1].text == "." and tokens[index + 2].kind == "identifier":
+                    index += 2
+                    name = tokens[index].value
+                source = _Source(name, name, join)
+                index += 1
+            else:
+                index += 1
+                continue
+
+            if index < len(tokens) and tokens[index].keyword == "AS":
+                index += 1
+            if index < len(tokens) and tokens[index].kind == "identifier" and tokens[index].keyword not in NOT_AN_ALIAS:
+                source.alias = tokens[index].value
+                index += 1
+            # Tabellenhinweise wie WITH (NOLOCK) überspringen
+            if index + 1 < len(tokens) and tokens[index].keyword == "WITH" and tokens[index + 1].text == "(":
+                index = _matching_paren(tokens, index + 1) + 1
+            sources.append(source)
+
+            join = ""
+            while index < len(tokens) and tokens[index].depth == depth:
+                keyword = tokens[index].keyword
+                if tokens[index].text == ",":
+                    join = "comma"
+                elif keyword == "CROSS":
+                    join = "cross"
+                elif keyword == "APPLY":
+                    join = "apply"
+                elif keyword == "JOIN":
+                    join = join or "join"
+                elif keyword == "ON":
+                    index = self._read_condition(tokens, index + 1, source)
+                    continue
+                elif keyword not in JOIN_MODIFIERS:
+                    break
+                index += 1
+                if keyword in ("JOIN", "APPLY") or join == "comma":
+                    break
+            if not join:
+                break
+        return sources, index
+
+    @staticmethod
+    def _read_condition(tokens: list[_Token], index: int, source: _Source) -> int:
+        """
+        Liest die ON-Bedingung eines Joins bis zum nächsten Join oder Klauselende.
+
+        :param tokens: Die Tokens.
+        :param index: Die Position nach ON.
+        :param source: Die gejointe Quelle, an der die Bedingung gespeichert wird.
+        :return: Die Position nach der Bedingung.
+        """
+        depth = tokens[index - 1].depth
+        while index < len(tokens) and tokens[index].depth >= depth:
+            token = tokens[index]
+            if token.depth == depth and (
+                token.keyword in CLAUSE_KEYWORDS or token.keyword in JOIN_MODIFIERS
+                or token.keyword in ("JOIN", "APPLY") or token.text in (",", ")", ";")
+            ):
+                break
+            source.condition.append(token)
+            index += 1
+        return index
+
+    @staticmethod
+    def _where_tokens(tokens: list[_Token], index: int, depth: int) -> list[_Token]:
+        """
+        Liefert die Tokens der WHERE-Klausel, die direkt auf eine FROM-Liste folgt.
+
+        :param tokens: Die Tokens.
+        :param index: Die Position nach der FROM-Liste.
+        :param depth: Die Klammertiefe der Abfrage.
+        :return: Die Tokens der WHERE-Klausel (leer, wenn es keine gibt).
+        """
+        if index >= len(tokens) or tokens[index].keyword != "WHERE":
+            return []
+        where = []
+        for token in tokens[index + 1:]:
+            if token.depth < depth or (token.depth == depth and (token.keyword in CLAUSE_KEYWORDS or token.text == ";")):
+                break
+            where.append(token)
+        return where
+
+    @staticmethod
+    def _linked_aliases(condition: list[_Token], aliases: set[str]) -> list[set[str]]:
+        """
+        Ermittelt, welche Quellen eine Bedingung miteinander verknüpft (z.B. a.x = b.y).
+
+        :param condition: Die Tokens einer ON- oder WHERE-Bedingung.
+        :param aliases: Die Aliase (in Kleinbuchstaben) der aktuellen FROM-Liste.
+        :return: Je Vergleich die Menge der darin verknüpften Aliase.
+        """
+        links = []
+        # Die Bedingung an AND/OR in einzelne Prädikate zerlegen
+        predicate: list[_Token] = []
+        for token in [*condition, None]:
+            if token is None or token.keyword in ("AND", "OR"):
+                referenced = {
+                    predicate[index].value.lower()
+                    for index in range(len(predicate) - 2)
+                    if predicate[index].kind == "identifier" and predicate[index + 1].text == "."
+                    and predicate[index].value.lower() in aliases
+                }
+                has_unqualified_column = any(
+                    token_.kind == "identifier" and token_.keyword not in ("NOT", "NULL", "IS", "IN", "LIKE", "BETWEEN")
+                    and (index == 0 or predicate[index - 1].text != ".")
+                    and (index + 1 == len(predicate) or predicate[index + 1].text not in (".", "("))
+                    for index, token_ in enumerate(predicate)
+                )
+                if any(token_.text in COMPARISON_OPERATORS for token_ in predicate):
+                    links.append(referenced | ({"*"} if has_unqualified_column else set()))
+                predicate = []
+            else:
+                predicate.append(token)
+        return links
+
+    def _find_cartesian_join(self, sources: list[_Source], where: list[_Token]) -> tuple[str, str] | None:
+        """
+        Prüft, ob alle Quellen einer FROM-Liste über Join-Bedingungen verbunden sind.
+
+        :param sources: Die Quellen der FROM-Liste.
+        :param where: Die Tokens der zugehörigen WHERE-Klausel.
+        :return: Zwei nicht verbundene Quellen oder None.
+        """
+        aliases = {source.alias.lower() for source in sources if source.alias}
+        parent = {index: index for index in range(len(sources))}
+
+        def find(index: int) -> int:
+            while parent[index] != index:
+                index = parent[index]
+            return index
+
+        def union(first: int, second: int) -> None:
+            parent[find(first)] = find(second)
+
+        positions = {source.alias.lower(): index for index, source in enumerate(sources) if source.alias}
+        for index, source in enumerate(sources[1:], start=1):
+            # APPLY ist korreliert, einzeilige Unterabfragen (z.B. Gesamtsumme) vervielfachen nichts
+            if source.join == "apply" or source.single_row or sources[0].single_row and index == 1:
+                union(index, index - 1)
+            for linked in self._linked_aliases(source.condition, aliases):
+                if "*" in linked:
+                    # Unqualifizierte Spalten lassen sich keiner Quelle zuordnen -> Join gilt als verbunden
+                    union(index, index - 1)
+                linked_positions = [positions[alias] for alias in linked if alias in positions]
+                for other in linked_positions[1:]:
+                    union(linked_positions[0], other)
+        for linked in self._linked_aliases(where, aliases):
+            linked_positions = [positions[alias] for alias in linked if alias in positions]
+            for other in linked_positions[1:]:
+                union(linked_positions[0], other)
+
+        for index, source in enumerate(sources[1:], start=1):
+            if find(index) != find(0):
+                return sources[0].alias or "Unterabfrage", source.alias or "Unterabfrage"
+        return None
+
+    def _check_schema(self, tokens: list[_Token], all_sources: list[_Source]) -> str | None:
+        """
+        Prüft Tabellen und qualifizierte Spalten gegen das bekannte Schema.
+
+        :param tokens: Die Tokens.
+        :param all_sources: Alle Quellen aller FROM-Listen.
+        :return: Der Ablehnungsgrund oder None.
+        """
+        alias_tables: dict[str, set[str]] = {}
+        for source in all_sources:
+            if source.table is None:
+                continue
+            if source.table.lower() not in self.table_columns:
+                return f"Unbekannte Tabelle '{source.table}'."
+            alias_tables.setdefault(source.alias.lower(), set()).add(source.table.lower())
+            alias_tables.setdefault(source.table.lower(), set()).add(source.table.lower())
+
+        for index in range(len(tokens) - 2):
+            qualifier, dot, column = tokens[index], tokens[index + 1], tokens[index + 2]
+            if qualifier.kind != "identifier" or dot.text != "." or column.kind != "identifier":
+                continue
+            tables = alias_tables.get(qualifier.value.lower())
+            # Funktionsaufrufe (dbo.fn()) und Namen wie dbo.Tabelle sind keine Spaltenverweise
+            if not tables or (index + 3 < len(tokens) and tokens[index + 3].text in ("(", ".")):
+                continue
+            if index > 0 and tokens[index - 1].text == ".":
+                continue
+            if not any(column.value.lower() in self.table_columns[table] for table in tables):
+                return f"Unbekannte Spalte '{qualifier.value}.{column.value}'."
+        return None
+
+    @staticmethod
+    def _check_aliases(tokens: list[_Token], all_sources: list[_Source]) -> str | None:
+        """
+        Prüft, ob jeder Qualifizierer in alias.Spalte eine Quelle der Abfrage bezeichnet.
+
+        :param tokens: Die Tokens.
+        :param all_sources: Alle Quellen aller FROM-Listen.
+        :return: Der Ablehnungsgrund oder None.
+        """
+        table_names = {source.table.lower() for source in all_sources if source.table}
+        qualifiers = table_names | {source.alias.lower() for source in all_sources if source.alias}
+        for index in range(len(tokens) - 2):
+            qualifier, dot, name = tokens[index], tokens[index + 1], tokens[index + 2]
+            if qualifier.kind != "identifier" or dot.text != "." or name.kind != "identifier":
+                continue
+            if (index > 0 and tokens[index - 1].text == ".") or (index + 3 < len(tokens) and tokens[index + 3].text in ("(", ".")):
+                continue
+            # dbo.Tabelle in einer FROM-Liste ist kein Spaltenverweis
+            if name.value.lower() in table_names or qualifier.value.lower() in qualifiers:
+                continue
+            known = ", ".join(sorted(source.alias for source in all_sources if source.alias))
+            return f"Unbekannter Alias '{qualifier.value}' in '{qualifier.value}.{name.value}' (bekannt: {known})."
+        return None
+
+    def _column_references(self, tokens: list[_Token], start: int, end: int) -> list[tuple[str, str]]:
+        """
+        Sammelt Spaltenverweise außerhalb von Aggregaten, Fensterfunktionen und Unterabfragen.
+
+        :param tokens: Die Tokens.
+        :param start: Erste Position (inklusive).
+        :param end: Letzte Position (exklusive).
+        :return: Die Verweise als (Anzeigetext, Spaltenname in Kleinbuchstaben).
+        """
+        references = []
+        index = start
+        while index < end:
+            token = tokens[index]
+            if token.keyword in AGGREGATE_FUNCTIONS and index + 1 < end and tokens[index + 1].text == "(":
+                index = _matching_paren(tokens, index + 1) + 1
+                if index < end and tokens[index].keyword == "OVER":
+                    index = _matching_paren(tokens, index + 1) + 1
+                continue
+            if token.text == "(" and index + 1 < end and tokens[index + 1].keyword == "SELECT":
+                index = _matching_paren(tokens, index) + 1
+                continue
+            if token.kind == "identifier" and index + 2 < end and tokens[index + 1].text == "." and tokens[index + 2].kind == "identifier":
+                if index + 3 >= end or tokens[index + 3].text not in ("(", "."):
+                    references.append((f"{token.value}.{tokens[index + 2].value}", tokens[index + 2].value.lower()))
+                index += 3
+                continue
+            is_unqualified_column = (
+                token.kind == "identifier" and token.value.lower() in self.known_columns
+                and (index == start or tokens[index - 1].keyword != "AS")
+                and (index + 1 >= end or tokens[index + 1].text != "(")
+            )
+            if is_unqualified_column:
+                references.append((token.value, token.value.lower()))
+            index += 1
+        return references
+
+    def _check_group_by(self, tokens: list[_Token]) -> str | None:
+        """
+        Prüft jede SELECT-Liste: Werden Aggregate verwendet, muss jede andere Spalte in GROUP BY stehen.
+
+        :param tokens: Die Tokens.
+        :return: Der Ablehnungsgrund oder None.
+        """
+        for select_index, select_token in enumerate(tokens):
+            if select_token.keyword != "SELECT":
+                continue
+            depth = select_token.depth
+            from_index = group_index = None
+            end = len(tokens)
+            for index in range(select_index + 1, len(tokens)):
+                token = tokens[index]
+                if token.depth < depth or (token.depth == depth and token.keyword in SET_OPERATORS):
+                    end = index
+                    break
+                if token.depth != depth:
+                    continue
+                if token.keyword == "FROM" and from_index is None:
+                    from_index = index
+                elif token.keyword == "GROUP" and index + 1 < len(tokens) and tokens[index + 1].keyword == "BY":
+                    group_index = index
+            select_end = from_index if from_index is not None else end
+
+            items: list[tuple[int, int]] = []
+            item_start = select_index + 1
+            for index in range(select_index + 1, select_end + 1):
+                if index == select_end or (tokens[index].depth == depth and tokens[index].text == ","):
+                    items.append((item_start, index))
+                    item_start = index + 1
+            has_aggregate = any(
+                _is_aggregate_call(tokens, index) and not self._inside_subquery(tokens, select_index, index)
+                for index in range(select_index + 1, select_end)
+            )
+            if not has_aggregate and group_index is None:
+                continue
+
+            grouped: set[str] = set()
+            if group_index is not None:
+                group_end = next(
+                    (index for index in range(group_index + 2, end) if tokens[index].depth == depth and tokens[index].keyword in GROUP_BY_END),
+                    end,
+                )
+                grouped = {column for _, column in self._column_references(tokens, group_index + 2, group_end)}
+                grouped |= {token.value.lower() for token in tokens[group_index + 2:group_end] if token.kind == "identifier"}
+            for item_start, item_end in items:
+                for reference, column in self._column_references(tokens, item_start, item_end):
+                    if column not in grouped:
+                        return (
+                            f"Die Spalte '{reference}' steht in der SELECT-Liste, ist aber weder aggregiert "
+                            "noch in GROUP BY enthalten."
+                        )
+        return None
+
+    @staticmethod
+    def _inside_subquery(tokens: list[_Token], select_index: int, index: int) -> bool:
+        """
+        Prüft, ob Position index innerhalb einer Unterabfrage der SELECT-Liste an select_index liegt.
+
+        :param tokens: Die Tokens.
+        :param select_index: Position des äußeren SELECT.
+        :param index: Die zu prüfende Position.
+        :return: True, wenn zwischen beiden ein weiteres SELECT in tieferer Klammerebene beginnt.
+        """
+        depth = tokens[select_index].depth
+        return any(
+            tokens[position].keyword == "SELECT" and tokens[position].depth > depth
+            for position in range(select_index + 1, index)
+            if tokens[position].depth <= tokens[index].depth
+        )
+
+    def _check_filter_values(self, tokens: list[_Token]) -> str | None:
+        """
+        Prüft Filterwerte (Spalte = 'Wert', Spalte IN ('A', 'B')) gegen die gültigen Werte aus dem Datenbank-Kontext.
+
+        :param tokens: Die Tokens.
+        :return: Der Ablehnungsgrund oder None.
+        """
+        for index, token in enumerate(tokens):
+            if token.kind != "identifier" or token.value.lower() not in self.dimension_values:
+                continue
+            # Tabellen- oder Aliasnamen (vor einem Punkt) sind keine Spalten
+            if index + 1 < len(tokens) and tokens[index + 1].text == ".":
+                continue
+            values, valid = self.dimension_values[token.value.lower()]
+            position = index + 1
+            if position < len(tokens) and tokens[position].keyword == "NOT":
+                position += 1
+            if position < len(tokens) and tokens[position].text in ("=", "<>", "!="):
+                literals = tokens[position + 1:position + 2]
+            elif position < len(tokens) and tokens[position].keyword == "IN" and position + 1 < len(tokens) and tokens[position + 1].text == "(":
+                literals = tokens[position + 2:_matching_paren(tokens, position + 1)]
+            else:
+                continue
+
+            for literal in literals:
+                if literal.kind != "string":
+                    continue
+                value = _string_value(literal)
+                if value.casefold() not in valid:
+                    listed = ", ".join(f"'{valid_value}'" for valid_value in values[:MAX_LISTED_VALUES])
+                    more = " ..." if len(values) > MAX_LISTED_VALUES else ""
+                    return f"Ungültiger Filterwert '{value}' für '{token.value}'. Gültige Werte: {listed}{more}"
+        return None
+
+    def _limit_rows(self, sql_query: str, tokens: list[_Token]) -> tuple[str, int | None, str | None]:
+        """
+        Setzt bei nicht aggregierenden Abfragen ohne Limit ein TOP n und begrenzt zu große TOP-Werte.
+
+        :param sql_query: Der SQL-Code.
+        :param tokens: Die Tokens des SQL-Codes.
+        :return: Der ggf. umgeschriebene SQL-Code, das gesetzte Zeilenlimit und eine Beschreibung der Änderung.
+        """
+        position = 1
+        if position < len(tokens) and tokens[position].keyword in ("DISTINCT", "ALL"):
+            position += 1
+        if position >= len(tokens):
+            return sql_query, None, None
+
+        if tokens[position].keyword == "TOP":
+            value_index = position + 2 if position + 1 < len(tokens) and tokens[position + 1].text == "(" else position + 1
+            if value_index >= len(tokens) or tokens[value_index].kind != "number":
+                return sql_query, None, None
+            after_value = value_index + 2 if tokens[position + 1].text == "(" else value_index + 1
+            if after_value < len(tokens) and tokens[after_value].keyword == "PERCENT":
+                return sql_query, None, None
+            if float(tokens[value_index].text) <= self.row_limit:
+                return sql_query, None, None
+            value = tokens[value_index]
+            rewritten = sql_query[:value.start] + str(self.row_limit) + sql_query[value.start + len(value.text):]
+            return rewritten, self.row_limit, f"TOP {value.text} auf TOP {self.row_limit} begrenzt"
+
+        top_level = [token for token in tokens if token.depth == 0]
+        keywords = {token.keyword for token in top_level}
+        # Ohne FROM (z.B. Fehler-SQL), mit GROUP BY, OFFSET/FETCH oder Mengenoperatoren kein TOP
+        if "FROM" not in keywords or keywords & {"GROUP", "OFFSET", *SET_OPERATORS}:
+            return sql_query, None, None
+        from_index = next(index for index, token in enumerate(tokens) if token.depth == 0 and token.keyword == "FROM")
+        # Aggregate auch in Ausdrücken wie ROUND(SUM(x), 2) berücksichtigen
+        if any(_is_aggregate_call(tokens, index) for index in range(position, from_index)):
+            return sql_query, None, None
+
+        insert_at = tokens[position].start
+        rewritten = f"{sql_query[:insert_at]}TOP {self.row_limit} {sql_query[insert_at:]}"
+        return rewritten, self.row_limit, f"TOP {self.row_limit} ergänzt"
+
+    def check(self, sql_query: str) -> CheckedQuery:
+        """
+        Prüft generierten SQL-Code und schreibt ihn bei Bedarf um (Zeilenlimit).
+
+        :param sql_query: Der generierte SQL-Code.
+        :return: Das Prüfergebnis mit dem auszuführenden SQL-Code oder dem Ablehnungsgrund.
+        """
+        sql_query = sql_query.strip()
+        tokens = tokenize(sql_query)
+        while tokens and tokens[-1].text == ";":
+            sql_query = sql_query[:tokens[-1].start].rstrip()
+            tokens.pop()
+
+        if not tokens or tokens[0].keyword != "SELECT":
+            return CheckedQuery(sql_query, "Nur SELECT-Abfragen sind erlaubt.")
+        if any(token.text == ";" for token in tokens):
+            return CheckedQuery(sql_query, "Mehrere Anweisungen sind nicht erlaubt.")
+        if any(token.depth < 0 for token in tokens) or sum(token.text == "(" for token in tokens) != sum(token.text == ")" for token in tokens):
+            return CheckedQuery(sql_query, "Die Klammern sind nicht ausgeglichen.")
+        for index, token in enumerate(tokens):
+            if token.keyword in FORBIDDEN_KEYWORDS and (index == 0 or tokens[index - 1].text != "."):
+                return CheckedQuery(sql_query, f"Das Schlüsselwort '{token.keyword}' ist nicht erlaubt.")
+
+        all_sources: list[_Source] = []
+        for index, token in enumerate(tokens):
+            if token.keyword != "FROM" or index + 1 >= len(tokens):
+                continue
+            sources, end = self._parse_sources(tokens, index + 1)
+            all_sources += sources
+            if len(sources) > 1:
+                cartesian = self._find_cartesian_join(sources, self._where_tokens(tokens, end, token.depth))
+                if cartesian is not None:
+                    return CheckedQuery(
+                        sql_query, f"Kartesisches Produkt: zwischen '{cartesian[0]}' und '{cartesian[1]}' fehlt eine Join-Bedingung."
+                    )
+
+        alias_error = self._check_aliases(tokens, all_sources)
+        if alias_error is not None:
+            return CheckedQuery(sql_query, alias_error)
+        if self.table_columns is not None:
+            schema_error = self._check_schema(tokens, all_sources)
+            if schema_error is not None:
+                return CheckedQuery(sql_query, schema_error)
+        semantic_error = self._check_group_by(tokens) or self._check_filter_values(tokens)
+        if semantic_error is not None:
+            return CheckedQuery(sql_query, semantic_error)
+
+        limited_sql, row_limit, rewrite = self._limit_rows(sql_query, tokens)
+        return CheckedQuery(limited_sql, row_limit=row_limit, rewrites=[rewrite] if rewrite else [], unlimited_sql=sql_query)
@@ -0,0 +1,209 @@
+# statistics_engine.py
+import numpy as np
+import pandas as pd
+
+from result_encoder import drop_total_rows, format_number, get_numeric_columns
+
+MONTH_COLUMN = "Calendar_Month_ISO"
+PREFERRED_METRICS = ["Revenue_EUR", "Gesamtumsatz_EUR", "Umsatz_EUR", "Sales_Amount"]
+SHARE_COLUMNS = ["Product_Category", "Sales_Country", "Sales_Channel", "Global_Region", "Sales_Region", "Material_Description"]
+MAX_SHARE_GROUPS = 15
+ZSCORE_THRESHOLD = 3.0
+MAX_OUTLIERS = 10
+
+
+def _format_percent(value: float) -> str:
+    """
+    Formatiert einen Anteil oder eine Wachstumsrate als Prozentwert.
+
+    :param value: Der Wert als Dezimalzahl (0.125 = 12,5 %).
+    :return: Der Prozentwert als String oder "n/a" bei fehlenden Werten.
+    """
+    if pd.isna(value) or np.isinf(value):
+        return "n/a"
+    return f"{value * 100:.1f}%"
+
+
+def _numeric_frame(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Wandelt alle Kennzahl-Spalten (inklusive Decimal-Werten) in float64 um.
+
+    :param df: Das Datenbankergebnis.
+    :return: Ein DataFrame nur mit numerischen float64-Spalten.
+    """
+    numeric_columns = get_numeric_columns(df)
+    return df[numeric_columns].apply(pd.to_numeric, errors="coerce").astype("float64")
+
+
+def _main_metric(numeric_df: pd.DataFrame) -> str | None:
+    """
+    Bestimmt die wichtigste Kennzahl des Ergebnisses (bevorzugt Umsatz).
+
+    :param numeric_df: Die numerischen Spalten des Ergebnisses.
+    :return: Der Spaltenname der Hauptkennzahl oder None.
+    """
+    for column in PREFERRED_METRICS:
+        if column in numeric_df.columns:
+            return column
+    return numeric_df.columns[0] if len(numeric_df.columns) else None
+
+
+def describe_columns(numeric_df: pd.DataFrame) -> str:
+    """
+    Berechnet deskriptive Kennzahlen (Anzahl, Mittelwert, Median, Standardabweichung, Min, Max, IQR).
+
+    :param numeric_df: Die numerischen Spalten des Ergebnisses.
+    :return: Die Kennzahlen im CSV-Format.
+    """
+    quantiles = numeric_df.quantile([0.25, 0.5, 0.75])
+    description = pd.DataFrame({
+        "Spalte": numeric_df.columns,
+        "Anzahl": numeric_df.count().to_numpy(),
+        "Summe": numeric_df.sum().to_numpy(),
+        "Mittelwert": numeric_df.mean().to_numpy(),
+        "Median": quantiles.loc[0.5].to_numpy(),
+        "Std": numeric_df.std().to_numpy(),
+        "Min": numeric_df.min().to_numpy(),
+        "Max": numeric_df.max().to_numpy(),
+        "IQR": (quantiles.loc[0.75] - quantiles.loc[0.25]).to_numpy(),
+    })
+    for column in description.columns[1:]:
+        description[column] = description[column].map(format_number)
+    return description.to_csv(index=False)
+
+
+def monthly_growth(df: pd.DataFrame, numeric_df: pd.DataFrame, metric: str) -> str:
+    """
+    Aggregiert die Hauptkennzahl je Monat und berechnet Wachstum zum Vormonat (MoM) und Vorjahresmonat (YoY).
+
+    :param df: Das Datenbankergebnis (mit Spalte Calendar_Month_ISO im Format 'YYYY.MM').
+    :param numeric_df: Die numerischen Spalten des Ergebnisses.
+    :param metric: Die Hauptkennzahl.
+    :return: Die Monatsreihe mit Wachstumsraten im CSV-Format oder ein leerer String.
+    """
+    # Zeilen ohne gültigen Monat (z.B. ROLLUP-Gesamtzeilen) werden ignoriert
+    months = pd.to_datetime(df[MONTH_COLUMN].astype(str), format="%Y.%m", errors="coerce")
+    valid = months.notna().to_numpy()
+    if not valid.any():
+        return ""
+    periods = months[valid].dt.to_period("M")
+    monthly = numeric_df.loc[valid, metric].groupby(periods.to_numpy()).sum()
+    if len(monthly) < 2:
+        return ""
+
+    # Lücken auffüllen, damit shift(12) wirklich den Vorjahresmonat trifft
+    full_range = pd.period_range(monthly.index.min(), monthly.index.max(), freq="M")
+    monthly = monthly.reindex(full_range)
+    growth = pd.DataFrame({
+        "Monat": monthly.index.strftime("%Y.%m"),
+        metric: monthly.map(format_number).to_numpy(),
+        "MoM": (monthly / monthly.shift(1) - 1).map(_format_percent).to_numpy(),
+        "YoY": (monthly / monthly.shift(12) - 1).map(_format_percent).to_numpy(),
+    })
+    return growth.to_csv(index=False)
+
+
+def group_shares(df: pd.DataFrame, numeric_df: pd.DataFrame, metric: str) -> str:
+    """
+    Berechnet Summe und Anteil der Hauptkennzahl je Kategorie, Land, Kanal etc.
+
+    :param df: Das Datenbankergebnis.
+    :param numeric_df: Die numerischen Spalten des Ergebnisses.
+    :param metric: Die Hauptkennzahl.
+    :return: Die Anteile als Text mit einem CSV-Block je Dimension.
+    """
+    total = numeric_df[metric].sum()
+    sections = []
+    for column in SHARE_COLUMNS:
+        if column not in df.columns or df[column].nunique(dropna=True) < 2:
+            continue
+        totals = numeric_df[metric].groupby(df[column], dropna=True).sum().sort_values(ascending=False)
+        shares = pd.DataFrame({
+            column: totals.index[:MAX_SHARE_GROUPS],
+            metric: totals.iloc[:MAX_SHARE_GROUPS].map(format_number).to_numpy(),
+            "Anteil": (totals.iloc[:MAX_SHARE_GROUPS] / total).map(_format_percent).to_numpy() if total else "n/a",
+        })
+        sections.append(f"Anteile je {column}:\n{shares.to_csv(index=False)}")
+    return "\n".join(sections)
+
+
+def correlations(numeric_df: pd.DataFrame) -> str:
+    """
+    Berechnet die Pearson-Korrelationsmatrix der Kennzahlen.
+
+    :param numeric_df: Die numerischen Spalten des Ergebnisses.
+    :return: Die Korrelationsmatrix im CSV-Format oder ein leerer String bei weniger als zwei Kennzahlen.
+    """
+    usable = numeric_df.loc[:, numeric_df.nunique() > 1]
+    if usable.shape[1] < 2:
+        return ""
+    return usable.corr().round(2).to_csv()
+
+
+def zscore_outliers(df: pd.DataFrame, numeric_df: pd.DataFrame, metric: str) -> str:
+    """
+    Findet Zeilen, deren Hauptkennzahl mehr als ZSCORE_THRESHOLD Standardabweichungen vom Mittelwert abweicht.
+
+    :param df: Das Datenbankergebnis.
+    :param numeric_df: Die numerischen Spalten des Ergebnisses.
+    :param metric: Die Hauptkennzahl.
+    :return: Die auffälligsten Zeilen mit z-Score im CSV-Format oder ein leerer String.
+    """
+    values = numeric_df[metric].to_numpy()
+    std = np.nanstd(values)
+    if len(values) < 3 or not std:
+        return ""
+    z_scores = (values - np.nanmean(values)) / std
+    mask = np.abs(z_scores) > ZSCORE_THRESHOLD
+    if not mask.any():
+        return ""
+
+    outliers = df.loc[mask].copy()
+    outliers["z_score"] = np.round(z_scores[mask], 2)
+    outliers = outliers.reindex(outliers["z_score"].abs().sort_values(ascending=False).index).head(MAX_OUTLIERS)
+    return outliers.to_csv(index=False)
+
+
+def compute_statistics(df: pd.DataFrame) -> str:
+    """
+    Berechnet eine vollständige, exakte Statistik-Zusammenfassung für den Analyse-Agenten.
+
+    :param df: Das Ergebnis der Datenbankabfrage.
+    :return: Die Zusammenfassung als Text mit mehreren CSV-Blöcken.
+    """
+    # ROLLUP-Gesamt- und Zwischensummenzeilen würden Summen, Anteile und Ausreißer verfälschen
+    data_rows = drop_total_rows(df)
+    total_rows = len(df) - len(data_rows)
+    df = data_rows
+    numeric_df = _numeric_frame(df)
+    sections = [f"Zeilen gesamt: {len(df)}\nSpalten: {', '.join(map(str, df.columns))}\n"]
+    if total_rows:
+        sections[0] += f"Nicht berücksichtigte Gesamt-/Zwischensummenzeilen (ROLLUP): {total_rows}\n"
+
+    metric = _main_metric(numeric_df)
+    if metric is None:
+        sections.append("Keine numerischen Kennzahlen im Ergebnis enthalten.\n")
+        return "\n".join(sections)
+
+    sections.append(f"Deskriptive Statistik:\n{describe_columns(numeric_df)}")
+
+    if MONTH_COLUMN in df.columns:
+        growth = monthly_growth(df, numeric_df, metric)
+        if growth:
+            sections.append(f"Monatsverlauf von {metric} mit Wachstum zum Vormonat (MoM) und Vorjahresmonat (YoY):\n{growth}")
+
+    shares = group_shares(df, numeric_df, metric)
+    if shares:
+        sections.append(shares)
+
+    correlation_matrix = correlations(numeric_df)
+    if correlation_matrix:
+        sections.append(f"Korrelationsmatrix (Pearson):\n{correlation_matrix}")
+
+    outliers = zscore_outliers(df, numeric_df, metric)
+    if outliers:
+        sections.append(f"Ausreißer bei {metric} (|z| > {ZSCORE_THRESHOLD:g}):\n{outliers}")
+    else:
+        sections.append(f"Keine Ausreißer bei {metric} (|z| > {ZSCORE_THRESHOLD:g}) gefunden.\n")
+
+    return "\n".join(sections)
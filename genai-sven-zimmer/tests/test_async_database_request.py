@@ -0,0 +1,89 @@
+# tests/test_async_database_request.py
+import asyncio
+import time
+
+import pandas as pd
+import pytest
+from sqlalchemy import create_engine, event
+from sqlalchemy.pool import QueuePool
+
+import database_request
+
+QUERY_SECONDS = 0.3
+
+
+@pytest.fixture
+def sqlite_engine(tmp_path, monkeypatch):
+    """SQLite-Engine mit einer Funktion sleep_ms(), die eine langsame Abfrage simuliert."""
+    engine = create_engine(
+        f"sqlite:///{tmp_path / 'test.sqlite'}",
+        poolclass=QueuePool,
+        pool_size=database_request.DB_MAX_CONCURRENCY,
+        connect_args={"check_same_thread": False},
+    )
+
+    @event.listens_for(engine, "connect")
+    def _register_sleep(dbapi_connection, connection_record):
+        dbapi_connection.create_function("sleep_ms", 1, lambda ms: time.sleep(ms / 1000) or ms)
+
+    monkeypatch.setattr(database_request, "_db_engine", engine)
+    yield engine
+    engine.dispose()
+
+
+def test_concurrent_requests_overlap(sqlite_engine):
+    """Gleichzeitige Abfragen laufen parallel statt nacheinander."""
+    query_count = database_request.DB_MAX_CONCURRENCY
+
+    async def run_all():
+        # Unterschiedlicher SQL-Code, damit die Abfragen nicht gebündelt werden
+        return await asyncio.gather(*(
+            database_request.async_database_request(f"SELECT sleep_ms({QUERY_SECONDS * 1000:.0f}) AS waited, {index} AS query_id")
+            for index in range(query_count)
+        ))
+
+    started_at = time.perf_counter()
+    results = asyncio.run(run_all())
+    elapsed = time.perf_counter() - started_at
+
+    assert all(isinstance(result, pd.DataFrame) for result in results)
+    assert sorted(int(result["query_id"].iat[0]) for result in results) == list(range(query_count))
+    # Nacheinander wären es query_count * QUERY_SECONDS
+    assert elapsed < QUERY_SECONDS * query_count * 0.6
+
+
+def test_event_loop_stays_responsive(sqlite_engine):
+    """Während einer langsamen Abfrage laufen andere Tasks der Event-Loop weiter."""
+    async def run():
+        ticks = 0
+
+        async def ticker():
+            nonlocal ticks
+            while True:
+                await asyncio.sleep(0.01)
+                ticks += 1
+
+        ticker_task = asyncio.create_task(ticker())
+        result = await database_request.async_database_request(f"SELECT sleep_ms({QUERY_SECONDS * 1000:.0f}) AS waited, 'loop' AS name")
+        ticker_task.cancel()
+        return result, ticks
+
+    result, ticks = asyncio.run(run())
+    assert isinstance(result, pd.DataFrame)
+    assert ticks >= 10
+
+
+def test_timeout_keeps_slot_until_worker_finishes(sqlite_engine):
+    """Nach einem Timeout bleibt der Platz belegt, bis der Worker-Thread die Abfrage beendet hat."""
+    async def run():
+        result = await database_request.async_database_request(
+            f"SELECT sleep_ms({QUERY_SECONDS * 1000:.0f}) AS waited, 'timeout' AS name", timeout_seconds=0.05
+        )
+        active_after_timeout = database_request.db_limiter.active
+        await asyncio.sleep(QUERY_SECONDS + 0.2)
+        return result, active_after_timeout, database_request.db_limiter.active
+
+    result, active_after_timeout, active_after_worker = asyncio.run(run())
+    assert isinstance(result, str) and result.startswith("FEHLER")
+    assert active_after_timeout == 1
+    assert active_after_worker == 0
@@ -0,0 +1,70 @@
+# tests/test_local_replica.py
+import sqlite3
+import threading
+
+import pytest
+from sqlalchemy import create_engine, event
+
+import local_replica
+from local_replica import MONTHLY_TABLE, LocalReplica
+
+MONTHS = ["2025.04", "2025.05", "2025.06"]
+ROWS_PER_MONTH = 2000
+
+
+def _fill_source(file_path, revenue: float) -> None:
+    """Schreibt DataSet_Monthly_Sales und Dim_Product mit festem Umsatz je Zeile in die Quelldatenbank."""
+    with sqlite3.connect(file_path) as connection:
+        connection.execute(f"DROP TABLE IF EXISTS {MONTHLY_TABLE}")
+        connection.execute(f"CREATE TABLE {MONTHLY_TABLE} (Calendar_Month_ISO TEXT, Material_Number INTEGER, Revenue_EUR REAL)")
+        connection.executemany(
+            f"INSERT INTO {MONTHLY_TABLE} VALUES (?, ?, ?)",
+            [(month, index, revenue) for month in MONTHS for index in range(ROWS_PER_MONTH)],
+        )
+        connection.execute("CREATE TABLE IF NOT EXISTS Dim_Product (Material_Number INTEGER, Product_Category TEXT)")
+    connection.close()
+
+
+@pytest.fixture
+def source(tmp_path):
+    file_path = tmp_path / "source.sqlite"
+    _fill_source(file_path, 1.0)
+    engine = create_engine("sqlite://")
+
+    @event.listens_for(engine, "connect")
+    def _attach_source(dbapi_connection, connection_record):
+        dbapi_connection.execute("ATTACH DATABASE ? AS dbo", (str(file_path),))
+
+    yield file_path, engine
+    engine.dispose()
+
+
+def test_incremental_refresh_is_atomic_for_readers(source, tmp_path, monkeypatch):
+    """Während der Aktualisierung sieht eine Abfrage den alten oder den neuen Monat, nie einen halb geladenen."""
+    source_path, engine = source
+    monkeypatch.setattr(local_replica, "REPLICA_FETCH_CHUNK_ROWS", 100)
+    replica = LocalReplica(str(tmp_path / "replica.sqlite"))
+    replica.refresh(engine, "2025-06-30")
+
+    sum_query = f"SELECT SUM(Revenue_EUR) AS total FROM dbo.{MONTHLY_TABLE} WHERE Calendar_Month_ISO = '2025.06'"
+    assert replica.query(sum_query)["total"].iat[0] == ROWS_PER_MONTH
+
+    _fill_source(source_path, 2.0)
+    observed_totals = set()
+    refresh_done = threading.Event()
+
+    def read_while_refreshing():
+        while not refresh_done.is_set():
+            observed_totals.add(float(replica.query(sum_query)["total"].iat[0]))
+
+    reader = threading.Thread(target=read_while_refreshing)
+    reader.start()
+    try:
+        replica.refresh(engine, "2025-07-01")
+    finally:
+        refresh_done.set()
+        reader.join()
+
+    assert observed_totals <= {ROWS_PER_MONTH * 1.0, ROWS_PER_MONTH * 2.0}
+    assert replica.query(sum_query)["total"].iat[0] == ROWS_PER_MONTH * 2.0
+    assert {"Dim_Product", MONTHLY_TABLE} <= replica.mirrored_tables()
@@ -0,0 +1,23 @@
+# tests/test_result_encoder.py
+import pandas as pd
+
+from result_encoder import encode_result
+
+PRODUCTS = 400
+
+
+def test_summary_excludes_rollup_total_row():
+    """Die Gesamtzeile eines großen ROLLUP-Ergebnisses verdoppelt weder Summe noch Maximum und bildet keine eigene Gruppe."""
+    df = pd.DataFrame({
+        "Material_Description": [f"Produkt {index:03d}" for index in range(PRODUCTS)] + ["Gesamt"],
+        "Product_Category": ["Mountain Bikes", "Road Bikes"] * (PRODUCTS // 2) + ["Gesamt"],
+        "Revenue_EUR": [10.0] * PRODUCTS + [10.0 * PRODUCTS],
+    })
+
+    encoded = encode_result(df, token_budget=500)
+
+    assert encoded.startswith("ZUSAMMENFASSUNG")
+    aggregates = encoded.split("Aggregate je Kennzahl:\n", 1)[1].split("\n\n", 1)[0].splitlines()
+    assert aggregates == ["Spalte,Summe,Min,Max,Mittelwert", "Revenue_EUR,4000,10,10,10"]
+    group_totals = encoded.split("Summen je Product_Category:\n", 1)[1].split("\n\n", 1)[0].splitlines()
+    assert group_totals[1:] == ["Mountain Bikes,2000", "Road Bikes,2000"]
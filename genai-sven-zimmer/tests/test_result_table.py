@@ -0,0 +1,56 @@
+# tests/test_result_table.py
+import csv
+
+import pandas as pd
+import pytest
+from sqlalchemy import create_engine, event, text
+
+import result_table
+from session_state import SessionResults
+from sql_guard import SqlGuard
+
+TABLE_ROWS = 25
+ROW_LIMIT = 10
+
+
+@pytest.fixture
+def sqlite_engine(tmp_path, monkeypatch):
+    """SQLite-Engine mit der Tabelle dbo.DataSet_Monthly_Sales (TABLE_ROWS Zeilen) als Export-Quelle."""
+    engine = create_engine(f"sqlite:///{tmp_path / 'main.sqlite'}")
+
+    @event.listens_for(engine, "connect")
+    def _attach_dbo(dbapi_connection, connection_record):
+        dbapi_connection.execute("ATTACH DATABASE ? AS dbo", (str(tmp_path / "dbo.sqlite"),))
+
+    with engine.begin() as connection:
+        connection.execute(text("CREATE TABLE dbo.DataSet_Monthly_Sales (Sales_Country TEXT, Revenue_EUR REAL)"))
+        connection.execute(
+            text("INSERT INTO dbo.DataSet_Monthly_Sales VALUES (:country, :revenue)"),
+            [{"country": f"Land {index}", "revenue": float(index)} for index in range(TABLE_ROWS)],
+        )
+    monkeypatch.setattr(result_table, "get_db_engine", lambda: engine)
+    monkeypatch.setattr(result_table, "EXPORT_DIR", str(tmp_path / "exports"))
+    yield engine
+    engine.dispose()
+
+
+def test_export_of_guard_limited_result_is_complete(sqlite_engine):
+    """Ein durch das Zeilenlimit der SQL-Prüfung gekürztes Ergebnis wird ohne Limit vollständig exportiert."""
+    checked = SqlGuard(row_limit=ROW_LIMIT).check(
+        "SELECT dms.Sales_Country, dms.Revenue_EUR FROM dbo.DataSet_Monthly_Sales AS dms"
+    )
+    assert checked.error is None and checked.row_limit == ROW_LIMIT
+    assert f"TOP {ROW_LIMIT}" in checked.sql and "TOP" not in checked.unlimited_sql
+
+    with sqlite_engine.connect() as connection:
+        # SQLite kennt kein TOP: das Limit des Guards wie der Server anwenden
+        frame = pd.read_sql(text(checked.unlimited_sql), connection).head(ROW_LIMIT)
+    frame.attrs["truncated"] = True
+    entry = SessionResults().add("Umsatz je Land", checked.sql, frame, checked.unlimited_sql)
+
+    file_path = result_table.export_result(entry, "csv")
+    assert not file_path.startswith("FEHLER"), file_path
+    with open(file_path, newline="", encoding="utf-8") as file:
+        rows = list(csv.reader(file))
+    assert rows[0] == ["Sales_Country", "Revenue_EUR"]
+    assert len(rows) - 1 == TABLE_ROWS
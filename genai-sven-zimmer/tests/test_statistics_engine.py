@@ -0,0 +1,44 @@
+# tests/test_statistics_engine.py
+import pandas as pd
+
+from statistics_engine import compute_statistics
+
+MONTHS = [f"2024.{month:02d}" for month in range(1, 13)]
+MONTHLY_REVENUE = [100.0, 110.0, 95.0, 105.0, 120.0, 98.0, 102.0, 115.0, 99.0, 108.0, 111.0, 97.0]
+
+
+def _section(statistics: str, title: str) -> list[str]:
+    """Liefert die Zeilen eines Abschnitts der Statistik-Zusammenfassung (ohne Überschrift)."""
+    lines = statistics.split(f"{title}:\n", 1)[1].split("\n\n", 1)[0]
+    return lines.strip().splitlines()
+
+
+def test_rollup_total_row_is_not_counted_as_data():
+    """Die Gesamtzeile 'Gesamt 2024' verdoppelt weder die Summe noch erscheint sie als Ausreißer."""
+    total = sum(MONTHLY_REVENUE)
+    df = pd.DataFrame({"Calendar_Month_ISO": MONTHS + ["Gesamt 2024"], "Revenue_EUR": MONTHLY_REVENUE + [total]})
+
+    statistics = compute_statistics(df)
+
+    header, row = _section(statistics, "Deskriptive Statistik")
+    description = dict(zip(header.split(","), row.split(",")))
+    assert float(description["Summe"]) == total
+    assert int(description["Anzahl"]) == len(MONTHS)
+    assert "Gesamt 2024" not in statistics.split("Ausreißer", 1)[-1]
+    assert "Keine Ausreißer" in statistics
+
+
+def test_rollup_total_row_does_not_skew_shares():
+    """Eine Gesamtzeile (als Text oder NULL) erhält keinen Anteil und halbiert die übrigen Anteile nicht."""
+    for total_label in ["Gesamt", None]:
+        df = pd.DataFrame({
+            "Product_Category": pd.array(["Mountain Bikes", "Road Bikes", "Accessories", total_label], dtype="string[pyarrow]"),
+            "Revenue_EUR": [50.0, 30.0, 20.0, 100.0],
+        })
+
+        statistics = compute_statistics(df)
+
+        shares = _section(statistics, "Anteile je Product_Category")[1:]
+        assert shares == ["Mountain Bikes,50,50.0%", "Road Bikes,30,30.0%", "Accessories,20,20.0%"]
+        header, row = _section(statistics, "Deskriptive Statistik")
+        assert dict(zip(header.split(","), row.split(",")))["Summe"] == "100"
@@ -0,0 +1,199 @@
+# tracing.py
+import contextvars
+import json
+import os
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from typing import Callable, Iterator
+
+TRACE_LOG_SPANS = os.getenv("TRACE_LOG_SPANS", "true").lower() in ("1", "true", "yes")
+LATENCY_BUCKETS_SECONDS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+# Zähler, die jede Stufe optional setzt und die als Prometheus-Counter summiert werden
+COUNTED_ATTRIBUTES = {
+    "rows": "Verarbeitete Zeilen je Stufe.",
+    "payload_bytes": "Verarbeitete Nutzdaten in Bytes je Stufe.",
+    "tokens": "Geschätzte Tokens je Stufe.",
+}
+
+_trace_id: contextvars.ContextVar[str | None] = contextvars.ContextVar("trace_id", default=None)
+
+
+class Span:
+    """Eine gemessene Pipeline-Stufe mit Dauer, Status und frei wählbaren Attributen."""
+
+    def __init__(self, stage: str, attributes: dict):
+        self.stage = stage
+        self.attributes = dict(attributes)
+        self.status = "ok"
+        self.started_at = time.perf_counter()
+        self.duration_seconds = 0.0
+
+    def set(self, **attributes) -> None:
+        """
+        Ergänzt oder überschreibt Attribute der Stufe (z.B. rows, payload_bytes, tokens).
+
+        :param attributes: Die Attribute als Schlüsselwortargumente.
+        """
+        self.attributes.update(attributes)
+
+
+class Histogram:
+    """Kumulatives Latenz-Histogramm im Prometheus-Format, getrennt nach Label-Kombination."""
+
+    def __init__(self, buckets: tuple[float, ...] = LATENCY_BUCKETS_SECONDS):
+        self.buckets = buckets
+        self._series: dict[tuple, dict] = {}
+
+    def observe(self, labels: tuple, value: float) -> None:
+        """
+        Erfasst einen Messwert (Aufrufer hält den Lock der Registry).
+
+        :param labels: Die Label-Werte als sortiertes Tupel von (Name, Wert).
+        :param value: Der Messwert in Sekunden.
+        """
+        series = self._series.setdefault(labels, {"counts": [0] * len(self.buckets), "sum": 0.0, "count": 0})
+        for index, bound in enumerate(self.buckets):
+            if value <= bound:
+                series["counts"][index] += 1
+        series["sum"] += value
+        series["count"] += 1
+
+    def render(self, name: str) -> list[str]:
+        """
+        Erzeugt die Zeilen des Histogramms im Prometheus-Textformat.
+
+        :param name: Der Metrikname.
+        :return: Die Zeilen mit Buckets, Summe und Anzahl je Label-Kombination.
+        """
+        lines = []
+        for labels, series in sorted(self._series.items()):
+            label_text = ",".join(f'{key}="{value}"' for key, value in labels)
+            for bound, count in zip(self.buckets, series["counts"]):
+                lines.append(f'{name}_bucket{{{label_text},le="{bound:g}"}} {count}')
+            lines.append(f'{name}_bucket{{{label_text},le="+Inf"}} {series["count"]}')
+            lines.append(f"{name}_sum{{{label_text}}} {series['sum']:.6f}")
+            lines.append(f"{name}_count{{{label_text}}} {series['count']}")
+        return lines
+
+
+class MetricsRegistry:
+    """Prozessinterne Sammlung der Stufen-Histogramme, Zähler und Gauges."""
+
+    def __init__(self):
+        self.durations = Histogram()
+        self.counters: dict[str, dict[tuple, float]] = {name: {} for name in COUNTED_ATTRIBUTES}
+        self.gauges: dict[str, tuple[str, Callable[[], float]]] = {}
+        self._lock = threading.Lock()
+
+    def record_span(self, span: Span) -> None:
+        """
+        Übernimmt eine abgeschlossene Stufe in Histogramm und Zähler.
+
+        :param span: Die beendete Stufe.
+        """
+        labels = (("stage", span.stage), ("status", span.status))
+        with self._lock:
+            self.durations.observe(labels, span.duration_seconds)
+            for name in COUNTED_ATTRIBUTES:
+                value = span.attributes.get(name)
+                if isinstance(value, (int, float)):
+                    stage_labels = (("stage", span.stage),)
+                    self.counters[name][stage_labels] = self.counters[name].get(stage_labels, 0) + value
+
+    def observe_duration(self, stage: str, seconds: float, status: str = "ok") -> None:
+        """
+        Erfasst eine Dauer ohne eigene Stufe (z.B. die Zeit bis zum ersten Token innerhalb einer Stufe).
+
+        :param stage: Der Name der Messung.
+        :param seconds: Die Dauer in Sekunden.
+        :param status: Der Status-Label-Wert.
+        """
+        with self._lock:
+            self.durations.observe((("stage", stage), ("status", status)), seconds)
+
+    def register_gauge(self, name: str, description: str, reader: Callable[[], float]) -> None:
+        """
+        Registriert einen Gauge, dessen Wert beim Abruf von /metrics gelesen wird.
+
+        :param name: Der Metrikname.
+        :param description: Die Beschreibung für # HELP.
+        :param reader: Funktion, die den aktuellen Wert liefert.
+        """
+        self.gauges[name] = (description, reader)
+
+    def render(self) -> str:
+        """
+        Erzeugt alle Metriken im Prometheus-Textformat.
+
+        :return: Der Inhalt für die /metrics-Route.
+        """
+        with self._lock:
+            lines = [
+                "# HELP genai_stage_duration_seconds Dauer der Pipeline-Stufen in Sekunden.",
+                "# TYPE genai_stage_duration_seconds histogram",
+                *self.durations.render("genai_stage_duration_seconds"),
+            ]
+            for name, description in COUNTED_ATTRIBUTES.items():
+                metric = f"genai_stage_{name}_total"
+                lines += [f"# HELP {metric} {description}", f"# TYPE {metric} counter"]
+                for labels, value in sorted(self.counters[name].items()):
+                    label_text = ",".join(f'{key}="{value_}"' for key, value_ in labels)
+                    lines.append(f"{metric}{{{label_text}}} {value:g}")
+
+        for name, (description, reader) in sorted(self.gauges.items()):
+            try:
+                value = float(reader())
+            except Exception:
+                continue
+            lines += [f"# HELP {name} {description}", f"# TYPE {name} gauge", f"{name} {value:g}"]
+        return "\n".join(lines) + "\n"
+
+
+metrics = MetricsRegistry()
+
+
+def new_trace() -> str:
+    """
+    Beginnt einen neuen Trace für eine Benutzeranfrage; alle folgenden Stufen im selben Kontext gehören dazu.
+
+    :return: Die Trace-ID.
+    """
+    trace_id = uuid.uuid4().hex[:12]
+    _trace_id.set(trace_id)
+    return trace_id
+
+
+@contextmanager
+def span(stage: str, **attributes) -> Iterator[Span]:
+    """
+    Misst eine Pipeline-Stufe. Dauer und Attribute fließen in die Metriken und werden
+    (bei TRACE_LOG_SPANS) als eine JSON-Zeile protokolliert.
+
+    :param stage: Der Name der Stufe (z.B. "db_execution").
+    :param attributes: Start-Attribute der Stufe.
+    :return: Die laufende Stufe, an der weitere Attribute gesetzt werden können.
+    """
+    current_span = Span(stage, attributes)
+    try:
+        yield current_span
+    except GeneratorExit:
+        # Abgebrochener Stream (z.B. neue Anfrage im UI), kein Fehler der Stufe
+        current_span.status = "cancelled"
+        raise
+    except BaseException as e:
+        current_span.status = "error"
+        current_span.set(error=type(e).__name__)
+        raise
+    finally:
+        current_span.duration_seconds = time.perf_counter() - current_span.started_at
+        metrics.record_span(current_span)
+        if TRACE_LOG_SPANS:
+            print(json.dumps({
+                "trace_id": _trace_id.get(),
+                "stage": current_span.stage,
+                "status": current_span.status,
+                "duration_ms": round(current_span.duration_seconds * 1000, 1),
+                **current_span.attributes,
+            }, ensure_ascii=False, default=str))